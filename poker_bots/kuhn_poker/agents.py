@@ -1,4 +1,6 @@
+import json
 import random
+import numpy as np
 
 class Agent:
     def act(self, state):
@@ -25,3 +27,36 @@ class HeuristicAgent(Agent):
         if card == 0: return 0
         return random.choice([0, 1])
 
+class TabularPolicyAgent(Agent):
+    """
+    Serves a strategy exported by KuhnCFRTrainer.export_strategy.
+    The table is compiled into a dense (num_infosets, 2) array indexed by
+        infoset_id = card * len(HISTORY_IDS) + HISTORY_IDS[history]
+    so acting is one array lookup and one draw. Missing infosets play uniformly.
+    """
+    # Env history strings ('0' = PASS, '1' = BET) at every decision point
+    HISTORY_IDS = {'': 0, '0': 1, '1': 2, '01': 3}
+    NUM_CARDS = 3
+
+    def __init__(self, strategy_table):
+        self.table = np.full((self.NUM_CARDS * len(self.HISTORY_IDS), 2), 0.5)
+        for key, probs in strategy_table.items():
+            # Trainer keys use cards 1-3 and 'p'/'b', the env uses 0-2 and '0'/'1'
+            card = int(key[0]) - 1
+            history = key[1:].replace('p', '0').replace('b', '1')
+            if history in self.HISTORY_IDS and 0 <= card < self.NUM_CARDS:
+                self.table[self.infoset_id(card, history)] = probs
+        self.bet_probs = self.table[:, 1] / self.table.sum(axis=1)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def infoset_id(self, card, history):
+        return card * len(self.HISTORY_IDS) + self.HISTORY_IDS[history]
+
+    def act(self, state):
+        card, history = state
+        return 1 if random.random() < self.bet_probs[self.infoset_id(card, history)] else 0
+
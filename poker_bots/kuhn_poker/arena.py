@@ -1,5 +1,9 @@
 from kuhn_poker_env import KuhnPokerEnv
-from agents import RandomAgent, HeuristicAgent
+from agents import RandomAgent, HeuristicAgent, TabularPolicyAgent
+import itertools
+import math
+import os
+import random
 
 def play_match(agent0, agent1, num_hands=1000):
     env = KuhnPokerEnv()
@@ -29,6 +33,87 @@ def play_match(agent0, agent1, num_hands=1000):
                 
     return scores
 
+def summarize(samples, z=1.96):
+    """
+    Mean, standard error and normal-approximation confidence interval of per-hand samples.
+    Same helper in kuhn_poker/arena.py and leduc_poker/arena.py (the arenas run as scripts
+    from their own directories, so they can't share a module): change both together.
+    """
+    n = len(samples)
+    mean = sum(samples) / n if n > 0 else 0.0
+    var = sum((x - mean) ** 2 for x in samples) / (n - 1) if n > 1 else 0.0
+    stderr = math.sqrt(var / n) if n > 1 else 0.0
+    return {'mean': mean, 'stderr': stderr, 'ci95': (mean - z * stderr, mean + z * stderr), 'n': n}
+
+def checkdown_value(hands):
+    """
+    Seat-0 value of a deal if both players check: the higher card wins the ante.
+    """
+    return 1 if hands[0] > hands[1] else -1
+
+def _expected_deal_value(value_fn):
+    deals = list(itertools.permutations([0, 1, 2], 2))
+    return sum(value_fn({0: c0, 1: c1}) for c0, c1 in deals) / len(deals)
+
+def play_hand(env, agents, deck=None, value_fn=None):
+    """
+    Plays one hand. agents: {seat: agent}.
+    Returns (payoffs, luck), luck = V(deal) - E[V(deal)] from seat 0's point of view.
+    The deal is Kuhn's only chance event, so payoff - luck is an unbiased,
+    lower-variance estimate (AIVAT-style chance correction).
+    """
+    state = env.reset(deck)
+    luck = 0.0
+    if value_fn is not None:
+        luck = value_fn(env.hands) - _expected_deal_value(value_fn)
+
+    current_player = 0
+    done = False
+    while not done:
+        action = agents[current_player].act(state)
+        state, payoffs, done = env.step(action)
+        current_player = 1 - current_player
+    return payoffs, luck
+
+def evaluate_match(agent0, agent1, num_deals=1000, duplicate=True, value_fn=checkdown_value, seed=None):
+    """
+    Variance-reduced estimate of agent0's winnings per hand against agent1.
+    - duplicate: every seeded deal is replayed with the seats swapped.
+    - value_fn: control variate on the deal; None disables it.
+    Returns {'adjusted': summary, 'raw': summary, 'hands': int}.
+    """
+    rng = random.Random(seed)
+    env = KuhnPokerEnv()
+    raw, adjusted = [], []
+    hands = 0
+
+    for _ in range(num_deals):
+        deck = rng.sample([0, 1, 2], 3)
+
+        payoffs, luck = play_hand(env, {0: agent0, 1: agent1}, deck, value_fn)
+        r = payoffs[0]
+        a = payoffs[0] - luck
+        hands += 1
+
+        if duplicate:
+            payoffs, luck = play_hand(env, {0: agent1, 1: agent0}, deck, value_fn)
+            r = (r + payoffs[1]) / 2.0
+            a = (a + payoffs[1] + luck) / 2.0
+            hands += 1
+
+        raw.append(r)
+        adjusted.append(a)
+
+    return {'adjusted': summarize(adjusted), 'raw': summarize(raw), 'hands': hands}
+
+def print_evaluation(result):
+    # Kept identical to the other arena's, like summarize()
+    for name in ('raw', 'adjusted'):
+        s = result[name]
+        print(f"  {name:>8}: {s['mean']:+.3f} chips/hand "
+              f"(95% CI {s['ci95'][0]:+.3f} .. {s['ci95'][1]:+.3f}, stderr {s['stderr']:.3f})")
+    print(f"  hands played: {result['hands']}")
+
 if __name__ == "__main__":
     bot_random = RandomAgent()
     bot_heuristic = HeuristicAgent()
@@ -42,4 +127,14 @@ if __name__ == "__main__":
     print("\nRunning Heuristic vs Random...")
     res = play_match(bot_heuristic, bot_random, 10000)
     print(f"Result: {res}")
-    print("Heuristic bot should be winning significantly.")
\ No newline at end of file
+    print("Heuristic bot should be winning significantly.")
+
+    # 3. Variance-reduced evaluation: duplicate deals + control variate
+    print("\nHeuristic vs Random, duplicate + control variate (5000 deals)...")
+    print_evaluation(evaluate_match(bot_heuristic, bot_random, 5000, seed=0))
+
+    # 4. Trained CFR strategy served from its table (python kuhn_CFR.py writes it)
+    if os.path.exists("kuhn_strategy.json"):
+        bot_cfr = TabularPolicyAgent.from_file("kuhn_strategy.json")
+        print("\nCFR table vs Heuristic, duplicate + control variate (5000 deals)...")
+        print_evaluation(evaluate_match(bot_cfr, bot_heuristic, 5000, seed=0))
@@ -1,3 +1,4 @@
+import json
 import numpy as np
 import random as rand
 PASS, BET = 0, 1
@@ -84,6 +85,16 @@ class KuhnCFRTrainer():
 
         print("\n" + "=" * 80)
 
+    def export_strategy(self, path):
+        """
+        Writes the average strategy as JSON {infoset: [p_pass, p_bet]}, infoset = card + history
+        (e.g. "2pb"). Load it with agents.TabularPolicyAgent.from_file.
+        """
+        table = {key: node.get_avg_strategy() for key, node in infoset_map.items()}
+        with open(path, 'w') as f:
+            json.dump(table, f, indent=1, sort_keys=True)
+        return table
+
     def cfr(self, cards, history, p0, p1):
         plays = len(history)
         player = plays % 2
@@ -144,3 +155,5 @@ if __name__ == "__main__":
     iterations = 100_000
     trainer = KuhnCFRTrainer(iterations)
     trainer.train()
+    trainer.export_strategy("kuhn_strategy.json")
+    print("Strategy table written to kuhn_strategy.json")
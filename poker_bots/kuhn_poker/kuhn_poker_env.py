@@ -11,8 +11,14 @@ class KuhnPokerEnv:
         self.deck = [0, 1, 2] # J, Q, K
         self.reset()
         
-    def reset(self):
-        random.shuffle(self.deck)
+    def reset(self, deck=None):
+        """
+        deck: optional dealt order [P0 card, P1 card, unused] to replay a seeded deal.
+        """
+        if deck is not None:
+            self.deck = list(deck)
+        else:
+            random.shuffle(self.deck)
         self.hands = {0: self.deck[0], 1: self.deck[1]}
         self.history = [] # List of actions (0 or 1)
         self.player_turn = 0
@@ -1,64 +1,181 @@
+import json
 import random
+import numpy as np
+
+from rebel.game import DEFAULT_CONFIG
+
+NUM_ACTIONS = 3 # Fold, Check/Call, Bet/Raise
+
+
+def mask_probs(probs, legal_actions):
+    """
+    Zeroes illegal actions and renormalizes.
+    Same distribution the old "retry until legal" loop produced.
+    Falls back to uniform over legal actions if no legal action has mass.
+    """
+    out = np.zeros(NUM_ACTIONS)
+    for a in legal_actions:
+        out[a] = probs[a]
+    s = out.sum()
+    if s <= 0:
+        out[list(legal_actions)] = 1.0
+        s = len(legal_actions)
+    return out / s
+
 
 class Agent:
-    def act(self, state):
+    def act_probs(self, state, legal_actions):
         """
         state: dict {
             'card': (rank, suit),
             'board': (rank, suit) or None,
+            'board_cards': [(rank, suit)] dealt so far (longer in multi-round variants),
             'history': [actions],
             'pot': float,
             'round': int
         }
-        Returns: 0 (FOLD), 1 (CHECK/CALL), 2 (BET/RAISE)
+        legal_actions: list of legal actions (subset of 0, 1, 2)
+        Returns: array (3,) of probabilities over 0 (FOLD), 1 (CHECK/CALL), 2 (BET/RAISE).
+        Illegal actions must get zero probability.
         """
         raise NotImplementedError
 
+    def act_probs_batch(self, states, legal_actions_list):
+        """
+        Batched version used by the vectorized arena. Returns array (N, 3).
+        Override for agents that can evaluate many states at once (tables, networks).
+        """
+        return np.stack([self.act_probs(s, l) for s, l in zip(states, legal_actions_list)])
+
+    def act(self, state, legal_actions=(0, 1, 2)):
+        """
+        Samples a single action from act_probs.
+        Returns: 0 (FOLD), 1 (CHECK/CALL), 2 (BET/RAISE)
+        """
+        probs = self.act_probs(state, legal_actions)
+        return random.choices(range(NUM_ACTIONS), weights=probs)[0]
+
 class RandomAgent(Agent):
     def __init__(self, env_ref=None):
-        self.env = env_ref # Reference to env to check legal actions if needed
-        
-    def act(self, state):
-        # In a real scenario, we should ask the env for legal actions
-        # But for this simple interface, we'll assume the agent knows or tries
-        # For robustness, let's assume we can access legal actions from the env if provided
-        # Or just return a random action and hope it's legal (bad practice but simple start)
-        # Ideally, we pass legal_actions into act() or have state include it.
-        
-        # Let's assume the agent just picks 1 or 2 mostly, 0 sometimes.
-        # But we need to know what is legal.
-        # A proper Agent interface usually gets (state, legal_actions)
-        # Let's update this later. For now, we will update Arena to pass legal actions?
-        # Or simpler: RandomAgent just guesses.
-        
-        return random.choice([0, 1, 2])
+        self.env = env_ref # Kept for backwards compatibility, legality now comes from the caller
+
+    def act_probs(self, state, legal_actions):
+        # Uniform over legal actions only
+        return mask_probs(np.ones(NUM_ACTIONS), legal_actions)
+
+    def act_probs_batch(self, states, legal_actions_list):
+        probs = np.zeros((len(states), NUM_ACTIONS))
+        for i, legal in enumerate(legal_actions_list):
+            probs[i, legal] = 1.0 / len(legal)
+        return probs
 
 class HeuristicAgent(Agent):
     """
     Simple rule-based Leduc agent:
-    - If Pair (Card matches Board): Always Raise (2)
+    - If Pair (Card matches Board): Always Raise (2), call if raising is capped
     - If High Card (King): Call (1) or Raise (2)
     - If Low Card (Jack): Check/Fold (0) or Call (1)
     """
-    def act(self, state):
+    def act_probs(self, state, legal_actions):
         card_rank = state['card'][0]
         board = state['board']
-        
+
         # Round 2: We have a board card
         if board is not None:
             board_rank = board[0]
             if card_rank == board_rank:
                 # We have a pair! Raise!
-                return 2
-        
+                if 2 in legal_actions:
+                    return mask_probs([0.0, 0.0, 1.0], legal_actions)
+                return mask_probs([0.0, 1.0, 0.0], legal_actions)
+
         # Round 1 or no pair
         if card_rank == 2: # King
-            return random.choice([1, 2]) # Aggressive
+            return mask_probs([0.0, 0.5, 0.5], legal_actions) # Aggressive
         elif card_rank == 1: # Queen
-            return 1 # Passive
+            return mask_probs([0.0, 1.0, 0.0], legal_actions) # Passive
         else: # Jack
-            # If facing a bet (how do we know? History), fold.
-            # Simplified: Random Check or Fold
-            return random.choice([0, 1])
+            # Random Check or Fold (fold becomes a check when there is no bet to face)
+            return mask_probs([0.5, 0.5, 0.0], legal_actions)
+
+def enumerate_round_histories(max_raises=2):
+    """
+    All decision points inside one betting round, as env history tuples
+    (checks and bets only: a Call or Check-Check ends the round).
+    """
+    histories = []
+    frontier = [()]
+    while frontier:
+        h = frontier.pop(0)
+        histories.append(h)
+        if h.count(2) < max_raises:
+            frontier.append(h + (2,))
+        if len(h) == 0:
+            frontier.append(h + (1,))
+    return histories
+
+class TabularPolicyAgent(Agent):
+    """
+    Serves an exported CFR strategy (see cfr_trainer.export_strategy).
+    The table is compiled into a dense (num_infosets, 3) array indexed by
+        infoset_id = (rank * num_board_slots + board_slot) * num_full_histories + history_id
+    where board_slot is 0 preflop and board_rank + 1 postflop (base num_ranks + 1 digits,
+    one per board card, in multi-round variants), and history_id has one base
+    num_histories digit per round (the id of that round's action sequence), so the
+    earlier rounds' actions are part of the infoset. Acting is an array lookup plus one draw.
+    Missing infosets play uniformly.
+    The config must match the one the strategy was trained with.
+    """
+    def __init__(self, strategy_table, config=DEFAULT_CONFIG):
+        self.config = config
+        self.num_ranks = config.num_ranks
+        self.history_ids = {h: i for i, h in enumerate(enumerate_round_histories(config.raise_cap))}
+        self.num_histories = len(self.history_ids)
+        self.num_full_histories = self.num_histories ** config.num_rounds
+        self.num_board_slots = (self.num_ranks + 1) ** config.num_board_cards
+        num_infosets = self.num_ranks * self.num_board_slots * self.num_full_histories
+        self.table = np.full((num_infosets, NUM_ACTIONS), 1.0 / NUM_ACTIONS)
+
+        for key, probs in strategy_table.items():
+            card, board, history = key.split('|')
+            board_ranks = [] if board == 'x' else [int(b) for b in board.split(',')]
+            rounds = [tuple(int(a) for a in h) for h in history.split('/')]
+            # One action list per round played so far (tables from before the '/' keys don't load)
+            if len(rounds) != len(board_ranks) + 1 or any(h not in self.history_ids for h in rounds):
+                continue
+            self.table[self._infoset_id(int(card), board_ranks, rounds[:-1], rounds[-1])] = probs
+
+    @classmethod
+    def from_file(cls, path, config=DEFAULT_CONFIG):
+        with open(path) as f:
+            return cls(json.load(f), config)
+
+    def _infoset_id(self, rank, board_ranks, past_history, history):
+        board_slot = 0
+        for i, b in enumerate(board_ranks):
+            board_slot += (b + 1) * (self.num_ranks + 1) ** i
+        history_id = 0
+        for i, h in enumerate(list(past_history) + [history]):
+            history_id += self.history_ids[tuple(h)] * self.num_histories ** i
+        return (rank * self.num_board_slots + board_slot) * self.num_full_histories + history_id
+
+    def state_id(self, state):
+        if 'board_cards' in state:
+            board_ranks = [c[0] for c in state['board_cards']]
+        else:
+            board_ranks = [] if state['board'] is None else [state['board'][0]]
+        return self._infoset_id(state['card'][0], board_ranks, state.get('past_history', []), tuple(state['history']))
 
+    def act_probs(self, state, legal_actions):
+        return mask_probs(self.table[self.state_id(state)], legal_actions)
 
+    def act_probs_batch(self, states, legal_actions_list):
+        ids = np.array([self.state_id(s) for s in states])
+        legal = np.zeros((len(states), NUM_ACTIONS))
+        for i, l in enumerate(legal_actions_list):
+            legal[i, l] = 1.0
+        probs = self.table[ids] * legal
+        sums = probs.sum(axis=1, keepdims=True)
+        # Rows with no legal mass fall back to uniform over legal actions
+        probs = np.where(sums > 0, probs / np.maximum(sums, 1e-12), legal / legal.sum(axis=1, keepdims=True))
+        return probs
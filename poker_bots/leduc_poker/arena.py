@@ -1,56 +1,246 @@
 from leduc_env import LeducHoldemEnv
-from agents import RandomAgent, HeuristicAgent
+from agents import RandomAgent, HeuristicAgent, TabularPolicyAgent, NUM_ACTIONS
+import math
+import numpy as np
 import random
+import copy
+import os
 
 def play_match(agent0, agent1, num_hands=1000):
     env = LeducHoldemEnv()
     scores = {0: 0, 1: 0}
-    
+    agents = {0: agent0, 1: agent1}
+
     for _ in range(num_hands):
         state = env.reset()
         done = False
-        
+
         # In Leduc/HeadsUp, active_player might switch round to round,
         # but our env handles active_player internally.
-        
+
         while not done:
             current_player = env.active_player
             legal_actions = env.get_legal_actions()
-            
-            # Get action from agent
-            if current_player == 0:
-                # Hack: Just try until legal for RandomAgent
-                # Real agents should know legal actions.
-                # Let's wrap this
-                action = -1
-                while action not in legal_actions:
-                    action = agent0.act(state)
-            else:
-                action = -1
-                while action not in legal_actions:
-                    action = agent1.act(state)
-                
+
+            # Agents return a distribution over legal actions, so no retrying
+            probs = agents[current_player].act_probs(state, legal_actions)
+            action = random.choices(range(NUM_ACTIONS), weights=probs)[0]
+
             state, payoffs, done = env.step(action)
-            
+
             if done:
                 scores[0] += payoffs[0]
                 scores[1] += payoffs[1]
-                
+
+    return scores
+
+def play_match_batched(agent0, agent1, num_hands=1000, batch_size=256, seed=None):
+    """
+    Plays num_hands in lockstep, batch_size tables at a time.
+    Each step, every table waiting on the same player is sent to that agent
+    in one act_probs_batch call, and actions are sampled for all of them at once.
+    Returns the same scores dict as play_match.
+    """
+    rng = np.random.default_rng(seed)
+    agents = {0: agent0, 1: agent1}
+    scores = {0: 0, 1: 0}
+
+    remaining = num_hands
+    while remaining > 0:
+        n = min(batch_size, remaining)
+        remaining -= n
+        envs = [LeducHoldemEnv() for _ in range(n)]
+        states = [env.get_state(env.active_player) for env in envs]
+        live = list(range(n))
+
+        while live:
+            for player in (0, 1):
+                idx = [i for i in live if envs[i].active_player == player]
+                if not idx:
+                    continue
+                legal = [envs[i].get_legal_actions() for i in idx]
+                probs = agents[player].act_probs_batch([states[i] for i in idx], legal)
+
+                # Vectorized sampling: first action whose cumulative prob exceeds u
+                cum = np.cumsum(probs, axis=1)
+                u = rng.random(len(idx)) * cum[:, -1]
+                actions = (cum <= u[:, None]).sum(axis=1)
+
+                for i, a in zip(idx, actions):
+                    state, payoffs, done = envs[i].step(int(a))
+                    if done:
+                        scores[0] += payoffs[0]
+                        scores[1] += payoffs[1]
+                    else:
+                        states[i] = state
+            live = [i for i in live if not envs[i].done]
+
     return scores
 
+def summarize(samples, z=1.96):
+    """
+    Mean, standard error and normal-approximation confidence interval of per-hand samples.
+    Same helper in kuhn_poker/arena.py and leduc_poker/arena.py (the arenas run as scripts
+    from their own directories, so they can't share a module): change both together.
+    """
+    n = len(samples)
+    mean = sum(samples) / n if n > 0 else 0.0
+    var = sum((x - mean) ** 2 for x in samples) / (n - 1) if n > 1 else 0.0
+    stderr = math.sqrt(var / n) if n > 1 else 0.0
+    return {'mean': mean, 'stderr': stderr, 'ci95': (mean - z * stderr, mean + z * stderr), 'n': n}
+
+def _showdown_sign(rank0, rank1, board_rank):
+    # +1 if seat 0 wins, -1 if seat 1 wins, 0 on a tie (same rules as LeducHoldemEnv._showdown)
+    pair0 = rank0 == board_rank
+    pair1 = rank1 == board_rank
+    if pair0 != pair1:
+        return 1 if pair0 else -1
+    if pair0 or rank0 == rank1:
+        return 0
+    return 1 if rank0 > rank1 else -1
+
+def checkdown_value(hands, board, bets):
+    """
+    Seat-0 value if both players checked down from here, with any pending bet called.
+    hands: {0: (rank, suit), 1: (rank, suit)}
+    board: (rank, suit) or None (averaged over the cards left in the deck)
+    """
+    if board is not None:
+        return _showdown_sign(hands[0][0], hands[1][0], board[0]) * max(bets[0], bets[1])
+    boards = _live_cards(hands.values())
+    return sum(checkdown_value(hands, b, bets) for b in boards) / len(boards)
+
+def _live_cards(dead):
+    dead = set(dead)
+    return [c for c in LeducHoldemEnv().raw_deck if c not in dead]
+
+_deal_expectations = {}
+
+def _expected_deal_value(value_fn, bets):
+    # E[V] over every (P0, P1) deal, used as the baseline for the deal correction
+    key = (value_fn, bets[0], bets[1])
+    if key not in _deal_expectations:
+        deck = LeducHoldemEnv().raw_deck
+        vals = [value_fn({0: c0, 1: c1}, None, bets)
+                for c0 in deck for c1 in deck if c0 != c1]
+        _deal_expectations[key] = sum(vals) / len(vals)
+    return _deal_expectations[key]
+
+def _action_value(env, action, value_fn):
+    # Seat-0 value right after `action`, before any board card it triggers is dealt
+    sim = copy.deepcopy(env)
+    _, payoffs, done = sim.step(action)
+    if done:
+        return payoffs[0]
+    board = sim.board_card if env.round == 1 else None
+    return value_fn(sim.hands, board, sim.bets)
+
+def play_hand(env, agents, deck=None, value_fn=None):
+    """
+    Plays one hand. agents: {seat: agent}.
+    Returns (payoffs, luck) where luck is the seat-0 AIVAT-style control-variate term:
+    - chance events (deal, board): V(outcome) - E[V(outcome)]
+    - decisions: V(action taken) - sum_a pi(a) V(a), using the acting agent's own act_probs
+    Every term has zero mean, so payoff - luck is unbiased for any value_fn,
+    while most of the card and sampling luck cancels.
+    """
+    state = env.reset(deck)
+    luck = 0.0
+    if value_fn is not None:
+        bets = dict(env.bets)
+        luck += value_fn(env.hands, None, bets) - _expected_deal_value(value_fn, bets)
+
+    done = False
+    while not done:
+        current_player = env.active_player
+        legal_actions = env.get_legal_actions()
+        probs = agents[current_player].act_probs(state, legal_actions)
+        action = random.choices(range(NUM_ACTIONS), weights=probs)[0]
+
+        if value_fn is not None:
+            values = {a: _action_value(env, a, value_fn) for a in legal_actions if probs[a] > 0}
+            luck += values[action] - sum(probs[a] * v for a, v in values.items())
+
+        round_before = env.round
+        state, payoffs, done = env.step(action)
+
+        if not done and env.round != round_before and value_fn is not None:
+            # Board card was just dealt
+            bets = dict(env.bets)
+            boards = _live_cards(env.hands.values())
+            expected = sum(value_fn(env.hands, b, bets) for b in boards) / len(boards)
+            luck += value_fn(env.hands, env.board_card, bets) - expected
+
+    return payoffs, luck
+
+def evaluate_match(agent0, agent1, num_deals=1000, duplicate=True, value_fn=checkdown_value, seed=None):
+    """
+    Variance-reduced estimate of agent0's winnings per hand against agent1.
+    - duplicate: every seeded deal is also replayed with the seats swapped,
+      so both agents get the same cards in the same seats.
+    - value_fn: control variate (see play_hand); None disables it.
+    Returns {'adjusted': summary, 'raw': summary, 'hands': int}, where raw uses
+    the same hands without the control variate.
+    """
+    rng = random.Random(seed)
+    env = LeducHoldemEnv()
+    raw, adjusted = [], []
+    hands = 0
+
+    for _ in range(num_deals):
+        deck = rng.sample(env.raw_deck, len(env.raw_deck))
+
+        payoffs, luck = play_hand(env, {0: agent0, 1: agent1}, deck, value_fn)
+        r = payoffs[0]
+        a = payoffs[0] - luck
+        hands += 1
+
+        if duplicate:
+            payoffs, luck = play_hand(env, {0: agent1, 1: agent0}, deck, value_fn)
+            r = (r + payoffs[1]) / 2.0
+            a = (a + payoffs[1] + luck) / 2.0
+            hands += 1
+
+        raw.append(r)
+        adjusted.append(a)
+
+    return {'adjusted': summarize(adjusted), 'raw': summarize(raw), 'hands': hands}
+
+def print_evaluation(result):
+    # Kept identical to the other arena's, like summarize()
+    for name in ('raw', 'adjusted'):
+        s = result[name]
+        print(f"  {name:>8}: {s['mean']:+.3f} chips/hand "
+              f"(95% CI {s['ci95'][0]:+.3f} .. {s['ci95'][1]:+.3f}, stderr {s['stderr']:.3f})")
+    print(f"  hands played: {result['hands']}")
+
 if __name__ == "__main__":
     bot_random = RandomAgent()
     bot_heuristic = HeuristicAgent()
-    
+
     # 1. Random vs Random
     print("Running Random vs Random (1000 hands)...")
     res = play_match(bot_random, bot_random, 1000)
     print(f"Result: {res}")
-    
+
     # 2. Heuristic vs Random
     print("\nRunning Heuristic vs Random (1000 hands)...")
     res = play_match(bot_heuristic, bot_random, 1000)
     print(f"Result: {res}")
     print("Heuristic bot should win easily.")
 
+    # 3. Same matchup, batched across tables
+    print("\nRunning Heuristic vs Random, batched (10000 hands)...")
+    res = play_match_batched(bot_heuristic, bot_random, 10000)
+    print(f"Result: {res}")
+
+    # 4. Variance-reduced evaluation: duplicate deals + control variate
+    print("\nHeuristic vs Random, duplicate + control variate (2000 deals)...")
+    print_evaluation(evaluate_match(bot_heuristic, bot_random, 2000, seed=0))
 
+    # 5. Trained CFR strategy served from its table (python cfr_trainer.py writes it)
+    if os.path.exists("leduc_strategy.json"):
+        bot_cfr = TabularPolicyAgent.from_file("leduc_strategy.json")
+        print("\nCFR table vs Heuristic, batched + variance-reduced (2000 deals)...")
+        print(f"Result: {play_match_batched(bot_cfr, bot_heuristic, 10000)}")
+        print_evaluation(evaluate_match(bot_cfr, bot_heuristic, 2000, seed=0))
@@ -1,8 +1,21 @@
+import json
 import random
 from collections import defaultdict
 
+from rebel.game import LeducRules, DEFAULT_CONFIG
+
 NUM_ACTIONS = 3 # Fold, Check/Call, Bet/Raise
 
+def info_set_key(card, board_ranks, past_history, history):
+    """
+    Infoset key "card|board|history": board ranks comma-separated ('x' preflop), and the
+    whole hand's actions with a '/' between rounds, e.g. "2|0|12/2". Earlier rounds have to
+    be in it: they set the pot, and leaving them out merges spots (imperfect recall).
+    """
+    board = ','.join(str(b) for b in board_ranks) or 'x'
+    history_str = '/'.join(''.join(str(a) for a in h) for h in list(past_history) + [history])
+    return f"{card}|{board}|{history_str}"
+
 class Node:
     def __init__(self, info_set):
         self.info_set = info_set
@@ -10,17 +23,22 @@ class Node:
         self.strategy_sum = [0.0] * NUM_ACTIONS
         self.strategy = [0.0] * NUM_ACTIONS
 
-    def get_strategy(self, realization_weight):
+    def get_strategy(self, realization_weight, legal_actions=None):
+        # Illegal actions (e.g. Fold when not facing a bet) always get zero probability
+        legal = legal_actions if legal_actions is not None else range(NUM_ACTIONS)
         normalizing_sum = 0
         for a in range(NUM_ACTIONS):
-            self.strategy[a] = self.regret_sum[a] if self.regret_sum[a] > 0 else 0
+            if a in legal:
+                self.strategy[a] = self.regret_sum[a] if self.regret_sum[a] > 0 else 0
+            else:
+                self.strategy[a] = 0.0
             normalizing_sum += self.strategy[a]
         
         for a in range(NUM_ACTIONS):
             if normalizing_sum > 0:
                 self.strategy[a] /= normalizing_sum
-            else:
-                self.strategy[a] = 1.0 / NUM_ACTIONS
+            elif a in legal:
+                self.strategy[a] = 1.0 / len(legal)
             self.strategy_sum[a] += realization_weight * self.strategy[a]
             
         return self.strategy
@@ -46,9 +64,7 @@ class LeducCFRTrainer:
         Key must capture all relevant info: Card Rank, Round, History, Board (if round 1)
         """
         card = state['card'][0] # Only rank matters
-        board = state['board'][0] if state['board'] else 'x'
-        history_str = "".join(str(a) for a in state['history'])
-        return f"{card}|{board}|{history_str}"
+        return info_set_key(card, [c[0] for c in state['board_cards']], state['past_history'], state['history'])
 
     def train(self, iterations):
         util = 0.0
@@ -84,25 +100,111 @@ class LeducCFRTrainer:
 # but manages the traversal itself. This is standard for solvers.
 
 class StandaloneLeducCFR:
-    def __init__(self):
+    def __init__(self, config=DEFAULT_CONFIG):
+        self.config = config
         self.node_map = {}
-        # Cards: 0=J, 1=Q, 2=K. Two of each.
-        self.deck = [0, 0, 1, 1, 2, 2]
+        # Only ranks matter. Default: 0=J, 1=Q, 2=K. Two of each.
+        self.deck = [r for r, _ in config.deck()]
 
     def train(self, iterations):
+        util = 0.0
+        num_dealt = 2 + self.config.num_board_cards
+        ante = self.config.ante
         for i in range(iterations):
             random.shuffle(self.deck)
-            # deck[0]=P0, deck[1]=P1, deck[2]=Board
-            self.cfr(history="", cards=self.deck[:3], p0=1.0, p1=1.0)
+            # deck[0]=P0, deck[1]=P1, deck[2:]=Board
+            util += self.cfr(cards=self.deck[:num_dealt], round_=0, history=[],
+                             bets=[ante, ante], raises=0, p0=1.0, p1=1.0, past=())
+        return util / max(1, iterations)
 
-    def cfr(self, history, cards, p0, p1):
-        # We need to reconstruct the game state from history string
-        # History format: 'r0r1' where r0 is preflop actions, r1 is postflop
-        # This is getting complex to parse.
-        
-        # SIMPLIFICATION:
-        # Use the provided Gym Environment for EVALUATION only.
-        # Use a custom lightweight recursion for TRAINING.
-        return 0
+    def get_info_set(self, cards, round_, history, player, past=()):
+        # Same key as LeducCFRTrainer.get_info_set, so tables line up with env states.
+        # Multi-round variants list every visible board rank: "card|b1,b2|h0/h1/h2"
+        return info_set_key(cards[player], cards[2:2 + round_], past, history)
+
+    def cfr(self, cards, round_, history, bets, raises, p0, p1, past=()):
+        """
+        Chance-sampled CFR that follows LeducHoldemEnv's rules:
+        P0 starts every round, Check-Check or a Call ends it, raises capped per round,
+        fixed bet size per round (config; 2 preflop and 4 postflop by default). history holds the current round's checks/bets,
+        like env.get_state()['history'], and past the earlier rounds' (env 'past_history').
+        Returns the utility for player 0.
+        """
+        player = len(history) % 2
+        opponent = 1 - player
+        diff = bets[opponent] - bets[player]
+
+        legal = [0, 1] if diff > 0 else [1]
+        if raises < self.config.raise_cap:
+            legal.append(2)
+
+        info_set = self.get_info_set(cards, round_, history, player, past)
+        node = self.node_map.get(info_set)
+        if node is None:
+            node = Node(info_set)
+            self.node_map[info_set] = node
+
+        strategy = node.get_strategy(p0 if player == 0 else p1, legal)
+
+        utils = [0.0] * NUM_ACTIONS
+        node_util = 0.0
+        for a in legal:
+            if a == 0:
+                # Folder loses what they put in
+                utils[a] = -bets[0] if player == 0 else bets[1]
+            elif a == 1:
+                new_bets = bets.copy()
+                if diff > 0 or (len(history) > 0 and history[-1] == 1):
+                    # Call or Check-Check ends the round
+                    new_bets[player] += diff
+                    utils[a] = self._end_round(cards, round_, past + (tuple(history),), new_bets,
+                                               p0, p1, player, strategy[a])
+                else:
+                    utils[a] = self._recurse(cards, round_, history + [1], new_bets, raises,
+                                             p0, p1, player, strategy[a], past)
+            else:
+                new_bets = bets.copy()
+                new_bets[player] += diff + self.config.bet_size(round_)
+                utils[a] = self._recurse(cards, round_, history + [2], new_bets, raises + 1,
+                                         p0, p1, player, strategy[a], past)
+            node_util += strategy[a] * utils[a]
+
+        # Regrets are in the acting player's utility, weighted by the opponent's reach
+        sign = 1.0 if player == 0 else -1.0
+        opp_reach = p1 if player == 0 else p0
+        for a in legal:
+            node.regret_sum[a] += sign * (utils[a] - node_util) * opp_reach
+
+        return node_util
+
+    def _recurse(self, cards, round_, history, bets, raises, p0, p1, player, prob, past):
+        if player == 0:
+            return self.cfr(cards, round_, history, bets, raises, p0 * prob, p1, past)
+        return self.cfr(cards, round_, history, bets, raises, p0, p1 * prob, past)
+
+    def _end_round(self, cards, round_, past, bets, p0, p1, player, prob):
+        # past: every finished round's history, this one included
+        if round_ < self.config.num_rounds - 1:
+            return self._recurse(cards, round_ + 1, [], bets, 0, p0, p1, player, prob, past)
+        # Showdown: pair with the board beats high card
+        winner = LeducRules.get_showdown_winner(cards[0], cards[1], cards[2:])
+        if winner == -1:
+            return 0.0
+        return bets[1] if winner == 0 else -bets[0]
 
+def export_strategy(node_map, path):
+    """
+    Writes the average strategy of every infoset as JSON {info_set: [p_fold, p_call, p_raise]}.
+    Load it with agents.TabularPolicyAgent.from_file.
+    """
+    table = {key: node.get_average_strategy() for key, node in node_map.items()}
+    with open(path, 'w') as f:
+        json.dump(table, f, indent=1, sort_keys=True)
+    return table
 
+if __name__ == "__main__":
+    trainer = StandaloneLeducCFR()
+    util = trainer.train(100_000)
+    print(f"Average game value (P0): {util:.4f}, infosets: {len(trainer.node_map)}")
+    export_strategy(trainer.node_map, "leduc_strategy.json")
+    print("Strategy table written to leduc_strategy.json")
@@ -2,6 +2,8 @@
 import random
 from enum import IntEnum
 
+from rebel.game import LeducRules, DEFAULT_CONFIG
+
 
 class Rank(IntEnum):
     JACK = 0
@@ -10,27 +12,39 @@ class Rank(IntEnum):
 
 
 class LeducHoldemEnv:
-    def __init__(self):
-        # Deck: 2 suits of J, Q, K (Total 6 cards)
-        self.raw_deck = [(r, s) for r in range(3) for s in range(2)]
+    def __init__(self, config=DEFAULT_CONFIG):
+        # Game size (ranks, suits, raise cap, bet sizes, rounds) comes from the shared LeducConfig.
+        # Default deck: 2 suits of J, Q, K (Total 6 cards)
+        self.config = config
+        self.raw_deck = config.deck()
         self.reset()
 
-    def reset(self):
-        self.deck = self.raw_deck.copy()
-        random.shuffle(self.deck)
+    def reset(self, deck=None):
+        """
+        deck: optional pre-shuffled deck (list of (rank, suit)) to replay a seeded deal.
+        deck[0] -> P0, deck[1] -> P1, deck[2:] -> Board (one card per round after the first)
+        """
+        if deck is not None:
+            self.deck = list(deck)
+        else:
+            self.deck = self.raw_deck.copy()
+            random.shuffle(self.deck)
 
         self.hands = {0: self.deck[0], 1: self.deck[1]}
-        self.board_card = self.deck[2]  # The "Flop"
+        self.board_cards = self.deck[2:2 + self.config.num_board_cards]
+        self.board_card = self.board_cards[0]  # The "Flop"
 
         # Game State
         self.history = []     # List of actions in current round
-        self.round = 0        # 0 = Preflop, 1 = Postflop
+        self.past_history = []  # Finished rounds' action lists
+        self.round = 0        # 0 = Preflop, 1 = Postflop (more rounds in bigger variants)
         self.active_player = 0
         self.done = False
 
         # Money
-        self.pot = 2.0        # Ante 1.0 each
-        self.bets = {0: 1.0, 1: 1.0}  # Total wagered by each player
+        ante = self.config.ante
+        self.pot = 2 * ante   # Ante 1.0 each by default
+        self.bets = {0: ante, 1: ante}  # Total wagered by each player
 
         # Round Management
         # In Leduc, limit is usually 2 bets/raises per round per player
@@ -42,15 +56,19 @@ class LeducHoldemEnv:
         """
         Returns: (MyCard, BoardCard, Round, HistoryList)
         BoardCard is None if Round 0
+        board_cards lists every board card dealt so far (just [BoardCard] in standard Leduc)
+        past_history lists the action lists of the rounds already played
         """
-        board = self.board_card if self.round == 1 else None
+        board = self.board_card if self.round >= 1 else None
         # We stringify the history for easier lookup in CFR/Tables
         # But keep it as a list for the Agent
         return {
             'card': self.hands[player_id],
             'board': board,
+            'board_cards': self.board_cards[:self.round],
             'round': self.round,
             'history': self.history.copy(),
+            'past_history': [h.copy() for h in self.past_history],
             'pot': self.pot
         }
 
@@ -74,7 +92,7 @@ class LeducHoldemEnv:
         can_check = (diff == 0)
 
         # Can we raise? (Leduc usually caps at 2 raises per round)
-        can_raise = (self.raises_in_round < 2)
+        can_raise = (self.raises_in_round < self.config.raise_cap)
 
         legal = []
 
@@ -138,7 +156,7 @@ class LeducHoldemEnv:
                     return self.get_state(self.active_player), {0: 0, 1: 0}, False
 
         elif action == 2:  # BET / RAISE
-            amount = 2.0 if self.round == 0 else 4.0  # Fixed Limit: 2 pre, 4 post
+            amount = self.config.bet_size(self.round)  # Fixed Limit: 2 pre, 4 post by default
 
             # If raising, we match opponent first then add amount?
             # Fixed limit: Raises are always incremental.
@@ -156,16 +174,17 @@ class LeducHoldemEnv:
             self.active_player = opponent
             return self.get_state(self.active_player), {0: 0, 1: 0}, False
 
-        # If round ended in the logic above
+        # If round ended in the logic above (showdown payoffs are set by _end_round)
         if self.done:
-            return None, reward, True
+            return None, self.final_payoffs, True
 
         return self.get_state(self.active_player), {0: 0, 1: 0}, False
 
     def _end_round(self):
-        if self.round == 0:
-            # Go to round 1
-            self.round = 1
+        if self.round < self.config.num_rounds - 1:
+            # Go to the next round (next board card becomes visible)
+            self.past_history.append(self.history)
+            self.round += 1
             self.history = []  # Reset history for new round? Or keep full?
             # Usually better to reset local round history for simplicity, but keep global?
             # Let's reset action list for the new round but state keeps context
@@ -186,33 +205,14 @@ class LeducHoldemEnv:
             pass
 
     def _showdown(self):
-        # Rank: Pair > High Card
+        # Rank: Pair > High Card (more board pairs win first in multi-round variants)
         r0 = self.hands[0][0]
         r1 = self.hands[1][0]
-        board = self.board_card[0]
-
-        # Check pairs
-        pair0 = (r0 == board)
-        pair1 = (r1 == board)
-
-        winner = -1
-        if pair0 and not pair1:
-            winner = 0
-        elif pair1 and not pair0:
-            winner = 1
-        elif pair0 and pair1:
-            # Tie (both pair board? distinct cards? impossible in leduc with 1 board card if hands distinct)
-            winner = -1
-        # Actually with 1 board card, if both pair, they must have same rank.
-        # But deck has 2 of each rank. So P0=Kh, P1=Ks, Board=Kd. Both have pair. Tie.
-        else:
-            # High card
-            if r0 > r1:
-                winner = 0
-            elif r1 > r0:
-                winner = 1
-            else:
-                winner = -1
+        board_ranks = [c[0] for c in self.board_cards]
+
+        # Both players pairing the one board card means they hold the same rank: tie.
+        # P0=Kh, P1=Ks, Board=Kd. Both have pair. Tie.
+        winner = LeducRules.get_showdown_winner(r0, r1, board_ranks)
 
         rewards = {0: 0, 1: 0}
         total_pot = self.bets[0] + self.bets[1]
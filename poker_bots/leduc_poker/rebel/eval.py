@@ -1,10 +1,11 @@
 import torch
 import numpy as np
 import random
-from .game import LeducRules, GameConstants
+from .game import LeducRules, DEFAULT_CONFIG
 from .features import get_features
+from .isomorphism import deal_board
 
-def evaluate(agent_model, num_games=100, device='cpu'):
+def evaluate(agent_model, num_games=100, device='cpu', config=DEFAULT_CONFIG):
     """
     Evaluates ReBeL agent vs Random Agent.
     ReBeL is P0 half time, P1 half time.
@@ -12,29 +13,30 @@ def evaluate(agent_model, num_games=100, device='cpu'):
     """
     from .search import CFRSolver
     
-    solver = CFRSolver(agent_model, iterations=50, device=device) # Fewer iterations for speed
+    solver = CFRSolver(agent_model, iterations=50, device=device, config=config) # Fewer iterations for speed
     total_payoff = 0
     
     for g in range(num_games):
         rebel_p = g % 2 # Alternate
         
         # Init Game
-        deck = [(r, s) for r in range(3) for s in range(2)]
+        deck = config.deck()
         random.shuffle(deck)
         hand_p0 = deck[0]
         hand_p1 = deck[1]
         board = deck[2]
         
-        c0 = hand_p0[0] * 2 + hand_p0[1]
-        c1 = hand_p1[0] * 2 + hand_p1[1]
+        c0 = hand_p0[0] * config.num_suits + hand_p0[1]
+        c1 = hand_p1[0] * config.num_suits + hand_p1[1]
         b_rank = board[0]
         
         history = []
-        bets = {0: 1.0, 1: 1.0}
+        bets = {0: config.ante, 1: config.ante}
         board_state = None
         
-        r0 = np.ones(6) / 6.0
-        r1 = np.ones(6) / 6.0
+        # Rank-level public ranges (see isomorphism.py)
+        r0 = np.ones(config.num_ranks) / config.num_ranks
+        r1 = np.ones(config.num_ranks) / config.num_ranks
         
         while True:
             # Round Check
@@ -42,16 +44,13 @@ def evaluate(agent_model, num_games=100, device='cpu'):
                 if board_state is None:
                     board_state = b_rank
                     history = []
-                    b_idx = board[0] * 2 + board[1]
-                    r0[b_idx] = 0
-                    r1[b_idx] = 0
-                    if r0.sum() > 0: r0 /= r0.sum()
-                    if r1.sum() > 0: r1 /= r1.sum()
+                    r0 = deal_board(r0, b_rank, config)
+                    r1 = deal_board(r1, b_rank, config)
                     continue
                 else:
                     # Showdown
                     # Calculate payoff
-                    winner = LeducRules.get_winner(c0, c1, b_rank)
+                    winner = LeducRules.get_winner(c0, c1, b_rank, config)
                     payoffs = LeducRules.get_payoffs_from_bets(bets, winner)
                     total_payoff += payoffs[rebel_p]
                     break
@@ -65,7 +64,7 @@ def evaluate(agent_model, num_games=100, device='cpu'):
                 
             active = len(history) % 2
             raises = history.count(2)
-            valid = LeducRules.get_legal_actions(history, raises)
+            valid = LeducRules.get_legal_actions(history, raises, config)
             
             if active == rebel_p:
                 # ReBeL acts
@@ -75,11 +74,11 @@ def evaluate(agent_model, num_games=100, device='cpu'):
                 
                 avg_strat, _ = solver.solve(history, board_state, bets, t_r0, t_r1)
                 
-                my_card = c0 if active == 0 else c1
+                my_rank = (c0 if active == 0 else c1) // config.num_suits
                 probs = []
                 actions = list(avg_strat.keys())
                 for a in actions:
-                    probs.append(avg_strat[a][my_card])
+                    probs.append(avg_strat[a][my_rank])
                 
                 if sum(probs) < 1e-9:
                     action = random.choice(actions)
@@ -120,7 +119,7 @@ def evaluate(agent_model, num_games=100, device='cpu'):
                 if diff > 0: bets[active] += diff
             elif action == 2:
                 diff = bets[opponent] - bets[active]
-                amount = 4.0 if board_state is not None else 2.0
+                amount = config.bet_size(1 if board_state is not None else 0)
                 bets[active] += diff + amount
             
             history.append(action)
@@ -1,11 +1,16 @@
 import torch
 import torch.nn.functional as F
+from .game import DEFAULT_CONFIG
 
-def get_features(range_p0, range_p1, board_rank, history, pot):
+def feature_dim(config=DEFAULT_CONFIG):
+    # ranges + board one-hot (None + ranks) + pot + history one-hots
+    return 2 * config.num_ranks + (config.num_ranks + 1) + 1 + config.history_len * 3
+
+def get_features(range_p0, range_p1, board_rank, history, pot, config=DEFAULT_CONFIG):
     """
     Construct input tensor for Value Network.
-    range_p0: tensor (6,)
-    range_p1: tensor (6,)
+    range_p0: tensor (num_ranks,) rank-level range (mass per rank, suits collapsed)
+    range_p1: tensor (num_ranks,)
     board_rank: int or None
     history: list of ints (actions)
     pot: float
@@ -20,7 +25,7 @@ def get_features(range_p0, range_p1, board_rank, history, pot):
     # One-hot encoding of board. 
     # If None (Round 1), maybe use [1, 0, 0, 0]
     # If J, Q, K (Round 2), use [0, 1, 0, 0], [0, 0, 1, 0], etc.
-    board_vec = torch.zeros(4)
+    board_vec = torch.zeros(config.num_ranks + 1)
     if board_rank is None:
         board_vec[0] = 1.0
     else:
@@ -37,7 +42,7 @@ def get_features(range_p0, range_p1, board_rank, history, pot):
     # Max actions per round is small. Total actions ~10.
     # Let's map actions 0, 1, 2 to one-hot vectors.
     # Pad to length 10.
-    MAX_LEN = 10
+    MAX_LEN = config.history_len
     hist_vec = torch.zeros(MAX_LEN * 3)
     for i, a in enumerate(history[-MAX_LEN:]):
         # Action a is 0, 1, 2
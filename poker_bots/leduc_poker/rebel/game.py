@@ -1,5 +1,66 @@
 import copy
 
+class LeducConfig:
+    """
+    Single definition of a (possibly enlarged) Leduc-style game, shared by the env,
+    LeducRules, the CFR solvers and the features. Defaults are standard Leduc Hold'em.
+
+    num_ranks, num_suits: the deck is every (rank, suit); card index = rank * num_suits + suit
+    raise_cap: max bets/raises per betting round
+    bet_sizes: fixed-limit bet size of each round (one entry per round)
+    num_rounds: betting rounds (at least 2, Leduc always has a board); one public board card
+        is dealt before every round after the first
+    ante: chips each player puts in before the deal
+    """
+    def __init__(self, num_ranks=3, num_suits=2, raise_cap=2, bet_sizes=(2.0, 4.0), num_rounds=2, ante=1.0):
+        if num_rounds < 2:
+            raise ValueError(f"Need at least 2 rounds (one board card), got {num_rounds}")
+        if len(bet_sizes) != num_rounds:
+            raise ValueError(f"Need one bet size per round, got {len(bet_sizes)} for {num_rounds} rounds")
+        if num_ranks * num_suits < 2 + (num_rounds - 1):
+            raise ValueError("Deck too small to deal both hands and the board")
+        self.num_ranks = num_ranks
+        self.num_suits = num_suits
+        self.raise_cap = raise_cap
+        self.bet_sizes = tuple(float(b) for b in bet_sizes)
+        self.num_rounds = num_rounds
+        self.ante = float(ante)
+
+    @property
+    def num_cards(self):
+        return self.num_ranks * self.num_suits
+
+    @property
+    def num_board_cards(self):
+        return self.num_rounds - 1
+
+    @property
+    def history_len(self):
+        # Value-net history slots: every action of every round (check + raise_cap bets + call),
+        # never fewer than the 10 slots standard Leduc has always used
+        return max(10, self.num_rounds * (self.raise_cap + 2))
+
+    def deck(self):
+        return [(r, s) for r in range(self.num_ranks) for s in range(self.num_suits)]
+
+    def bet_size(self, round_):
+        return self.bet_sizes[round_]
+
+    def _key(self):
+        return (self.num_ranks, self.num_suits, self.raise_cap, self.bet_sizes, self.num_rounds, self.ante)
+
+    def __eq__(self, other):
+        return isinstance(other, LeducConfig) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return (f"LeducConfig(ranks={self.num_ranks}, suits={self.num_suits}, raise_cap={self.raise_cap}, "
+                f"bet_sizes={self.bet_sizes}, rounds={self.num_rounds})")
+
+DEFAULT_CONFIG = LeducConfig()
+
 class GameConstants:
     FOLD = 0
     CHECK_CALL = 1
@@ -17,7 +78,7 @@ class GameConstants:
 
 class LeducRules:
     @staticmethod
-    def get_legal_actions(history, raises_in_round):
+    def get_legal_actions(history, raises_in_round, config=DEFAULT_CONFIG):
         """
         Returns list of legal actions given the sequence of actions in the current round.
         history: list of integers (0, 1, 2)
@@ -25,20 +86,20 @@ class LeducRules:
         """
         acts = history
         if len(acts) == 0:
-            return [1, 2] # Check, Bet
+            return [1, 2] if config.raise_cap > 0 else [1] # Check, Bet
             
         last_action = acts[-1]
         
         if last_action == 2: # BET/RAISE
             # Facing a bet.
-            can_raise = raises_in_round < 2
+            can_raise = raises_in_round < config.raise_cap
             if can_raise:
                 return [0, 1, 2]
             else:
                 return [0, 1]
                 
         if last_action == 1: # CHECK
-            return [1, 2]
+            return [1, 2] if config.raise_cap > 0 else [1]
             
         return []
 
@@ -83,24 +144,41 @@ class LeducRules:
         return rewards
 
     @staticmethod
-    def get_winner(hand_p0, hand_p1, board_rank):
+    def get_winner(hand_p0, hand_p1, board_rank, config=DEFAULT_CONFIG):
         """
-        hand_p0, hand_p1: int 0-5
-        board_rank: int 0-2 or None
+        hand_p0, hand_p1: card index (rank * num_suits + suit)
+        board_rank: int or None
         """
-        # Rank: Pair > High Card
-        r0 = hand_p0 // 2
-        r1 = hand_p1 // 2
-        
-        if board_rank is not None:
-            pair0 = (r0 == board_rank)
-            pair1 = (r1 == board_rank)
-            
-            if pair0 and not pair1: return 0
-            if pair1 and not pair0: return 1
-            if pair0 and pair1: return -1 # Tie
-            
-        # High card
-        if r0 > r1: return 0
-        if r1 > r0: return 1
+        return LeducRules.get_rank_winner(hand_p0 // config.num_suits,
+                                          hand_p1 // config.num_suits,
+                                          board_rank)
+
+    @staticmethod
+    def get_rank_winner(r0, r1, board_rank):
+        """
+        r0, r1: ranks (suits never matter in Leduc)
+        board_rank: int or None (single board card)
+        """
+        board_ranks = [] if board_rank is None else [board_rank]
+        return LeducRules.get_showdown_winner(r0, r1, board_ranks)
+
+    @staticmethod
+    def hand_strength(rank, board_ranks):
+        """
+        (number of board cards paired, rank), compared lexicographically.
+        With one board card: Pair > High Card, as in standard Leduc.
+        """
+        return (sum(1 for b in board_ranks if b == rank), rank)
+
+    @staticmethod
+    def get_showdown_winner(r0, r1, board_ranks):
+        """
+        r0, r1: ranks
+        board_ranks: list of board ranks dealt so far (multi-round variants)
+        Returns 0, 1 or -1 (tie)
+        """
+        s0 = LeducRules.hand_strength(r0, board_ranks)
+        s1 = LeducRules.hand_strength(r1, board_ranks)
+        if s0 > s1: return 0
+        if s1 > s0: return 1
         return -1
@@ -0,0 +1,96 @@
+import numpy as np
+from .game import DEFAULT_CONFIG
+
+# Leduc payoffs only depend on rank, so the search works on rank-level ranges:
+# r[k] = total reach mass of all live cards of rank k.
+# Card index convention (same as LeducRules.get_winner): card = rank * num_suits + suit.
+
+
+def card_rank(card, config=DEFAULT_CONFIG):
+    return card // config.num_suits
+
+
+def rank_counts(board_rank=None, config=DEFAULT_CONFIG):
+    """
+    Number of live cards of each rank once the board card (if any) is removed.
+    Returns float array (num_ranks,)
+    """
+    counts = np.full(config.num_ranks, float(config.num_suits))
+    if board_rank is not None:
+        counts[board_rank] -= 1
+    return counts
+
+
+def blocking_weights(board_rank=None, config=DEFAULT_CONFIG):
+    """
+    W[i, j] = fraction of the opponent's rank-j mass that is still possible when I hold rank i.
+    The mass of a rank is spread evenly over its live cards, and my own card removes one of
+    them when i == j. With 2 suits and a paired board this is 0 for the blocked rank.
+    """
+    counts = rank_counts(board_rank, config)
+    live = counts[None, :] - np.eye(config.num_ranks)
+    w = np.zeros_like(live)
+    np.divide(live, counts[None, :], out=w, where=counts[None, :] > 0)
+    return np.maximum(w, 0.0)
+
+
+def board_probs(board_rank, config=DEFAULT_CONFIG):
+    """
+    P(board = board_rank | my rank) for every rank, before the board is dealt.
+    Only my own card is removed from the deck (same approximation the leaf evaluation always used).
+    """
+    counts = rank_counts(None, config)
+    hits = counts[board_rank] - (np.arange(config.num_ranks) == board_rank)
+    return hits / (config.num_cards - 1)
+
+
+def deal_board(rank_range, board_rank, config=DEFAULT_CONFIG):
+    """
+    Removes one card of board_rank from a (pre-board) rank range and renormalizes.
+    Replaces zeroing the board card index in the 6-card representation.
+    """
+    counts = rank_counts(None, config)
+    r = np.array(rank_range, dtype=float)
+    r[board_rank] *= (counts[board_rank] - 1) / counts[board_rank]
+    s = r.sum()
+    if s > 1e-9:
+        r /= s
+    return r
+
+
+def cards_to_ranks(card_range, config=DEFAULT_CONFIG):
+    """
+    (num_cards,) per-card vector -> (num_ranks,) rank mass.
+    """
+    card_range = np.asarray(card_range, dtype=float)
+    return card_range.reshape(config.num_ranks, config.num_suits).sum(axis=1)
+
+
+def ranks_to_cards(rank_range, board_card=None, config=DEFAULT_CONFIG):
+    """
+    (num_ranks,) rank mass -> (num_cards,) per-card vector.
+    Mass is split evenly over the live suits and the board card gets zero.
+    Inverse of cards_to_ranks for suit-symmetric ranges.
+    """
+    board_rank = card_rank(board_card, config) if board_card is not None else None
+    counts = rank_counts(board_rank, config)
+    per_card = np.zeros(config.num_ranks)
+    np.divide(rank_range, counts, out=per_card, where=counts > 0)
+    out = np.repeat(per_card, config.num_suits)
+    if board_card is not None:
+        out[board_card] = 0.0
+    return out
+
+
+def ranks_to_card_values(rank_values, config=DEFAULT_CONFIG):
+    """
+    Per-rank values (or strategy probabilities) -> per-card. Every card of a rank shares them.
+    """
+    return np.repeat(np.asarray(rank_values), config.num_suits)
+
+
+def strategy_to_cards(strategy, config=DEFAULT_CONFIG):
+    """
+    Maps a search strategy {action: (num_ranks,)} to {action: (num_cards,)}.
+    """
+    return {a: ranks_to_card_values(p, config) for a, p in strategy.items()}
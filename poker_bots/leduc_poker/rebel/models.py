@@ -1,21 +1,26 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+from .game import DEFAULT_CONFIG
+from .features import feature_dim
 
 class ValueNetwork(nn.Module):
-    def __init__(self, input_dim=47, hidden_dim=128):
+    def __init__(self, input_dim=None, hidden_dim=128, config=DEFAULT_CONFIG):
         """
         Input Features:
-        - P0 Range (6)
-        - P1 Range (6)
-        - Board State (4: None, J, Q, K)
+        - P0 Range (num_ranks, one mass per rank)
+        - P1 Range (num_ranks)
+        - Board State (num_ranks + 1: None, J, Q, K, ...)
         - Pot Size (1)
-        - History Embedding (30: 10 actions * 3 types)
+        - History Embedding (config.history_len actions * 3 types)
+        Standard Leduc: 3 + 3 + 4 + 1 + 30 = 41
         """
         super(ValueNetwork, self).__init__()
+        if input_dim is None:
+            input_dim = feature_dim(config)
         self.fc1 = nn.Linear(input_dim, hidden_dim)
         self.fc2 = nn.Linear(hidden_dim, hidden_dim)
-        self.fc3 = nn.Linear(hidden_dim, 12) # Value vector for P0 (6) and P1 (6)
+        self.fc3 = nn.Linear(hidden_dim, 2 * config.num_ranks) # Value per rank for P0 and P1
         
     def forward(self, x):
         x = F.relu(self.fc1(x))
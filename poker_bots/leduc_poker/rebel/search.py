@@ -1,28 +1,34 @@
 import torch
 import numpy as np
-from .game import LeducRules, GameConstants
+from .game import LeducRules, GameConstants, DEFAULT_CONFIG
 from .features import get_features
+from .isomorphism import blocking_weights, board_probs
 
 class Node:
-    def __init__(self, history, board_rank, player_to_act, valid_actions):
+    def __init__(self, history, board_rank, player_to_act, valid_actions, num_ranks=GameConstants.NUM_RANKS):
         self.history = history
         self.board_rank = board_rank
         self.player_to_act = player_to_act
         self.valid_actions = valid_actions
         
-        self.regret_sum = {a: np.zeros(GameConstants.NUM_CARDS) for a in valid_actions}
-        self.strategy_sum = {a: np.zeros(GameConstants.NUM_CARDS) for a in valid_actions}
-        self.strategy = {a: np.zeros(GameConstants.NUM_CARDS) for a in valid_actions}
+        # Rank-level (suit-isomorphic) vectors: one entry per rank, not per card
+        self.regret_sum = {a: np.zeros(num_ranks) for a in valid_actions}
+        self.strategy_sum = {a: np.zeros(num_ranks) for a in valid_actions}
+        self.strategy = {a: np.zeros(num_ranks) for a in valid_actions}
         
         self.children = {} 
         self.is_terminal = False
         self.is_leaf = False 
 
 class CFRSolver:
-    def __init__(self, value_net, iterations=100, device='cpu'):
+    def __init__(self, value_net, iterations=100, device='cpu', config=DEFAULT_CONFIG):
+        if config.num_rounds != 2:
+            # Subgames end at the first round boundary, with a single board rank below it
+            raise ValueError("CFRSolver supports two-round variants only")
         self.value_net = value_net
         self.iterations = iterations
         self.device = device
+        self.config = config
         self.nodes = {} 
         
     def _get_node(self, history, board_rank, bets):
@@ -33,7 +39,7 @@ class CFRSolver:
             
             # Check fold
             if len(history) > 0 and history[-1] == 0:
-                node = Node(history, board_rank, -1, [])
+                node = Node(history, board_rank, -1, [], self.config.num_ranks)
                 node.is_terminal = True
                 self.nodes[key] = node
                 return node
@@ -41,11 +47,11 @@ class CFRSolver:
             if is_term_round:
                 if board_rank is not None:
                     # Round 2 end -> Showdown
-                    node = Node(history, board_rank, -1, [])
+                    node = Node(history, board_rank, -1, [], self.config.num_ranks)
                     node.is_terminal = True
                 else:
                     # Round 1 end -> Leaf
-                    node = Node(history, board_rank, -1, [])
+                    node = Node(history, board_rank, -1, [], self.config.num_ranks)
                     node.is_leaf = True
                 
                 self.nodes[key] = node
@@ -53,14 +59,19 @@ class CFRSolver:
             
             active = len(history) % 2
             raises = history.count(2)
-            valid = LeducRules.get_legal_actions(history, raises)
+            valid = LeducRules.get_legal_actions(history, raises, self.config)
             
-            node = Node(history, board_rank, active, valid)
+            node = Node(history, board_rank, active, valid, self.config.num_ranks)
             self.nodes[key] = node
             
         return self.nodes[key]
 
     def solve(self, history, board_rank, bets, range_p0, range_p1):
+        """
+        range_p0, range_p1: rank-level ranges (num_ranks,), see isomorphism.py
+        Returns per-rank average strategy at the root and per-rank values.
+        Use isomorphism.strategy_to_cards to get per-card strategies.
+        """
         self.nodes = {} 
         r0 = range_p0.cpu().numpy()
         r1 = range_p1.cpu().numpy()
@@ -85,7 +96,7 @@ class CFRSolver:
             return self._get_value_net_payoffs(history, board_rank, bets, r0, r1)
             
         # Regret Matching
-        sum_pos_regret = np.zeros(6)
+        sum_pos_regret = np.zeros(self.config.num_ranks)
         for a in node.valid_actions:
             pos_r = np.maximum(node.regret_sum[a], 0)
             node.strategy[a] = pos_r
@@ -115,7 +126,7 @@ class CFRSolver:
                 if diff > 0: new_bets[active] += diff
             elif a == 2: # Bet/Raise
                 diff = new_bets[opponent] - new_bets[active]
-                amount = 4.0 if board_rank is not None else 2.0
+                amount = self.config.bet_size(1 if board_rank is not None else 0)
                 new_bets[active] += diff + amount
                 
             if node.player_to_act == 0:
@@ -126,7 +137,7 @@ class CFRSolver:
                 ev = self._cfr(new_hist, board_rank, new_bets, r0, next_r1)
             ev_actions[a] = ev
             
-        node_ev = {0: np.zeros(6), 1: np.zeros(6)}
+        node_ev = {0: np.zeros(self.config.num_ranks), 1: np.zeros(self.config.num_ranks)}
         for a in node.valid_actions:
             strat_a = node.strategy[a]
             for p in [0, 1]:
@@ -172,7 +183,7 @@ class CFRSolver:
                 if diff > 0: new_bets[active] += diff
             elif a == 2:
                 diff = new_bets[opponent] - new_bets[active]
-                amount = 4.0 if board_rank is not None else 2.0
+                amount = self.config.bet_size(1 if board_rank is not None else 0)
                 new_bets[active] += diff + amount
                 
             if node.player_to_act == 0:
@@ -183,7 +194,7 @@ class CFRSolver:
                 ev = self._compute_ev(new_hist, board_rank, new_bets, r0, next_r1, strategy_map)
             ev_actions[a] = ev
             
-        node_ev = {0: np.zeros(6), 1: np.zeros(6)}
+        node_ev = {0: np.zeros(self.config.num_ranks), 1: np.zeros(self.config.num_ranks)}
         for a in node.valid_actions:
             strat_a = avg_strat[a]
             for p in [0, 1]:
@@ -191,44 +202,35 @@ class CFRSolver:
         return node_ev
 
     def _get_terminal_payoffs(self, history, board_rank, bets, r0, r1):
+        n = self.config.num_ranks
         if history[-1] == 0: # Fold
             loser = (len(history) - 1) % 2
             winner = 1 - loser
             rew = LeducRules.get_payoffs_from_bets(bets, winner, folded=True)
-            return {0: np.full(6, rew[0]), 1: np.full(6, rew[1])}
+            return {0: np.full(n, rew[0]), 1: np.full(n, rew[1])}
             
         # Showdown
-        payoffs_0 = np.zeros(6)
-        payoffs_1 = np.zeros(6)
-        
-        # P0
-        for c0 in range(6):
-            ev = 0
-            for c1 in range(6):
-                if c0 == c1: continue
-                # We need unnormalized r1? 
-                # Yes, CFR handles reaches. 
-                # If we are at terminal, we sum Payoff * r_opp[c_opp].
-                rew = LeducRules.get_payoffs_from_bets(bets, LeducRules.get_winner(c0, c1, board_rank))
-                ev += r1[c1] * rew[0]
-            payoffs_0[c0] = ev
-            
-        # P1
-        for c1 in range(6):
-            ev = 0
-            for c0 in range(6):
-                if c0 == c1: continue
-                rew = LeducRules.get_payoffs_from_bets(bets, LeducRules.get_winner(c0, c1, board_rank))
-                ev += r0[c0] * rew[1]
-            payoffs_1[c1] = ev
-            
+        # u[p][i, j] = payoff to player p when P0 holds rank i and P1 holds rank j
+        u0 = np.zeros((n, n))
+        u1 = np.zeros((n, n))
+        for i in range(n):
+            for j in range(n):
+                rew = LeducRules.get_payoffs_from_bets(bets, LeducRules.get_rank_winner(i, j, board_rank))
+                u0[i, j] = rew[0]
+                u1[i, j] = rew[1]
+                
+        # Blocking: my card removes one copy of its rank from the opponent's range
+        # (and the board card is already out of both ranges).
+        w = blocking_weights(board_rank, self.config)
+        payoffs_0 = (w * u0) @ r1
+        payoffs_1 = (w * u1.T) @ r0
         return {0: payoffs_0, 1: payoffs_1}
 
     def _get_value_net_payoffs(self, history, board_rank, bets, r0, r1):
         # End of Round 1.
         pot = bets[0] + bets[1]
         inputs = []
-        boards = [0, 1, 2]
+        boards = list(range(self.config.num_ranks))
         
         # Normalize ranges for NN
         # r0, r1 are proportional to reach.
@@ -241,39 +243,26 @@ class CFRSolver:
             ft = get_features(
                 torch.tensor(nr0, dtype=torch.float32),
                 torch.tensor(nr1, dtype=torch.float32),
-                b_rank, [], pot
+                b_rank, [], pot, self.config
             ).to(self.device)
             inputs.append(ft)
             
         inputs = torch.stack(inputs)
         with torch.no_grad():
-            # values shape (3, 12)
+            # values shape (num_ranks, 2 * num_ranks)
             values_pred = self.value_net(inputs).cpu().numpy()
             
         # Aggregate
-        # val[p][card] = sum_b P(b | card) * V_pred(b, card)
-        
-        vals_0 = np.zeros(6)
-        vals_1 = np.zeros(6)
+        # val[p][rank] = sum_b P(b | rank) * V_pred(b, rank)
+        n = self.config.num_ranks
+        vals_0 = np.zeros(n)
+        vals_1 = np.zeros(n)
         
         for i_b, b_rank in enumerate(boards):
-            v_p0 = values_pred[i_b, 0:6]
-            v_p1 = values_pred[i_b, 6:12]
-            
-            # P(Board=b | MyCard=c)
-            # 5 unknown cards.
-            # If b matches c rank: 1 match left. Prob = 1/5.
-            # If b differs c rank: 2 matches left. Prob = 2/5.
-            
-            for c in range(6):
-                rank_c = c // 2
-                if rank_c == b_rank:
-                    prob = 1.0 / 5.0
-                else:
-                    prob = 2.0 / 5.0
-                
-                vals_0[c] += prob * v_p0[c]
-                vals_1[c] += prob * v_p1[c]
+            # P(Board=b | MyRank=c): num_cards - 1 unknown cards, one fewer of my own rank.
+            prob = board_probs(b_rank, self.config)
+            vals_0 += prob * values_pred[i_b, 0:n]
+            vals_1 += prob * values_pred[i_b, n:2 * n]
                 
         return {0: vals_0, 1: vals_1}
 
@@ -281,12 +270,12 @@ class CFRSolver:
         avg_strat = {}
         for a in node.valid_actions:
             s_sum = node.strategy_sum[a]
-            sum_s = np.zeros(6)
+            sum_s = np.zeros(self.config.num_ranks)
             for a2 in node.valid_actions:
                 sum_s += node.strategy_sum[a2]
             
             mask = (sum_s > 1e-9)
-            prob = np.zeros(6)
+            prob = np.zeros(self.config.num_ranks)
             prob[mask] = s_sum[mask] / sum_s[mask]
             prob[~mask] = 1.0 / len(node.valid_actions)
             avg_strat[a] = prob
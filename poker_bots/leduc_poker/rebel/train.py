@@ -3,10 +3,11 @@ import torch.optim as optim
 import numpy as np
 import random
 from collections import deque
-from .game import GameConstants, LeducRules
+from .game import LeducRules, DEFAULT_CONFIG
 from .models import ValueNetwork
 from .search import CFRSolver
 from .features import get_features
+from .isomorphism import deal_board
 
 class ReplayBuffer:
     def __init__(self, capacity=10000):
@@ -24,15 +25,16 @@ class ReplayBuffer:
         return len(self.buffer)
 
 class ReBeLTrainer:
-    def __init__(self, device='cpu'):
+    def __init__(self, device='cpu', config=DEFAULT_CONFIG):
         self.device = device
-        self.value_net = ValueNetwork().to(device)
-        self.target_net = ValueNetwork().to(device) # For stability? Optional.
+        self.config = config
+        self.value_net = ValueNetwork(config=config).to(device)
+        self.target_net = ValueNetwork(config=config).to(device) # For stability? Optional.
         self.target_net.load_state_dict(self.value_net.state_dict())
         
         self.optimizer = optim.Adam(self.value_net.parameters(), lr=1e-3)
         self.buffer = ReplayBuffer()
-        self.solver = CFRSolver(self.target_net, iterations=100, device=device) # Use target net for search
+        self.solver = CFRSolver(self.target_net, iterations=100, device=device, config=config) # Use target net for search
         
     def generate_data(self, num_games=1):
         self.value_net.eval()
@@ -41,27 +43,28 @@ class ReBeLTrainer:
             
     def _play_one_game(self):
         # Initialize
-        deck = [(r, s) for r in range(3) for s in range(2)]
+        deck = self.config.deck()
         random.shuffle(deck)
         hand_p0 = deck[0] # (rank, suit)
         hand_p1 = deck[1]
         board = deck[2]
         
-        # Indices
-        c0 = hand_p0[0] * 2 + hand_p0[1]
-        c1 = hand_p1[0] * 2 + hand_p1[1]
-        b_rank = board[0] # Just rank for now
+        # Only ranks matter: search and features work on rank-level ranges
+        c0 = hand_p0[0]
+        c1 = hand_p1[0]
+        b_rank = board[0]
         
         # Initial State
         history = []
-        bets = {0: 1.0, 1: 1.0}
+        bets = {0: self.config.ante, 1: self.config.ante}
         board_state = None
         
-        # Initial Beliefs (Uniform over 6 cards)
+        # Initial Beliefs (Uniform over ranks)
+        n = self.config.num_ranks
         # But wait, P1 knows P0 doesn't have c1? No, private info.
         # Public belief is Uniform.
-        r0 = np.ones(6) / 6.0
-        r1 = np.ones(6) / 6.0
+        r0 = np.ones(n) / n
+        r1 = np.ones(n) / n
         
         # Play until terminal
         while True:
@@ -75,15 +78,9 @@ class ReBeLTrainer:
                     # Raises reset
                     
                     # Update beliefs for board card
-                    # Zero out the board card index
-                    # Which specific card is the board?
-                    # The 'board' variable holds it.
-                    b_idx = board[0] * 2 + board[1]
-                    r0[b_idx] = 0
-                    r1[b_idx] = 0
-                    # Renormalize
-                    r0 /= r0.sum()
-                    r1 /= r1.sum()
+                    # One card of the board rank leaves both ranges (suit is irrelevant)
+                    r0 = deal_board(r0, b_rank, self.config)
+                    r1 = deal_board(r1, b_rank, self.config)
                     
                     # Continue loop (Round 2 start)
                     continue
@@ -112,11 +109,11 @@ class ReBeLTrainer:
             # Store Data
             # Store features and VALUES.
             # Which values? The search returns EV for both players.
-            # V0 is vector (6,), V1 is vector (6,).
-            # Concatenate to (12,).
+            # V0 and V1 are vectors (num_ranks,) (one value per rank).
+            # Concatenate to (2 * num_ranks,).
             val_vec = np.concatenate([values[0], values[1]])
             
-            ft = get_features(t_r0, t_r1, board_state, history, pot)
+            ft = get_features(t_r0, t_r1, board_state, history, pot, self.config)
             self.buffer.push(ft.cpu(), torch.tensor(val_vec, dtype=torch.float32))
             
             # Sample Action
@@ -124,7 +121,7 @@ class ReBeLTrainer:
             my_card = c0 if active == 0 else c1
             my_strat = avg_strat # map action -> vector
             
-            # Get probs for my card
+            # Get probs for my card's rank
             probs = []
             actions = list(my_strat.keys())
             for a in actions:
@@ -153,7 +150,7 @@ class ReBeLTrainer:
                 if diff > 0: bets[active] += diff
             elif a == 2:
                 diff = bets[opponent] - bets[active]
-                amount = 4.0 if board_state is not None else 2.0
+                amount = self.config.bet_size(1 if board_state is not None else 0)
                 bets[active] += diff + amount
                 
             history.append(a)
@@ -0,0 +1,84 @@
+import time
+import tracemalloc
+
+from rebel.game import LeducConfig
+from cfr_trainer import StandaloneLeducCFR
+
+# Same engine, growing game. Standard Leduc first, then bigger decks, deeper betting
+# and more rounds, so we can see which parts stop scaling before going to NLHE sizes.
+VARIANTS = [
+    ("leduc 3x2", LeducConfig()),
+    ("6 ranks x 2", LeducConfig(num_ranks=6)),
+    ("13 ranks x 4", LeducConfig(num_ranks=13, num_suits=4)),
+    ("raise cap 3", LeducConfig(raise_cap=3)),
+    ("raise cap 4", LeducConfig(raise_cap=4)),
+    ("3 rounds", LeducConfig(num_rounds=3, bet_sizes=(2.0, 4.0, 4.0))),
+    ("13x4, 3 rounds, cap 3", LeducConfig(num_ranks=13, num_suits=4, raise_cap=3,
+                                          num_rounds=3, bet_sizes=(2.0, 4.0, 4.0))),
+]
+
+def bench_cfr(config, iterations=2000):
+    """
+    Chance-sampled CFR (cfr_trainer.StandaloneLeducCFR) on one variant.
+    Returns iterations/sec, infosets touched and peak traced memory in MB.
+    """
+    trainer = StandaloneLeducCFR(config)
+    start = time.perf_counter()
+    trainer.train(iterations)
+    elapsed = time.perf_counter() - start
+
+    # Memory is traced on a second run: tracemalloc slows python code down a lot,
+    # so it can't share the timed run
+    tracemalloc.start()
+    traced = StandaloneLeducCFR(config)
+    traced.train(iterations)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'iters_per_sec': iterations / elapsed,
+        'infosets': len(trainer.node_map),
+        'peak_mb': peak / 1e6,
+    }
+
+def bench_subgame(config, iterations=50, repeats=3):
+    """
+    ReBeL subgame solve (rebel.search.CFRSolver) from the root with an untrained value net.
+    Only two-round variants: the solver stops at the first round boundary.
+    Returns average seconds per solve, CFR iterations/sec and the number of subgame nodes.
+    """
+    import torch
+    from rebel.models import ValueNetwork
+    from rebel.search import CFRSolver
+
+    net = ValueNetwork(config=config)
+    net.eval()
+    solver = CFRSolver(net, iterations=iterations, config=config)
+    n = config.num_ranks
+    r = torch.ones(n) / n
+    bets = {0: config.ante, 1: config.ante}
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        solver.solve([], None, bets, r, r)
+    per_solve = (time.perf_counter() - start) / repeats
+    return {
+        'sec_per_solve': per_solve,
+        'iters_per_sec': iterations / per_solve,
+        'nodes': len(solver.nodes),
+    }
+
+def run(iterations=2000):
+    print(f"CFR scaling ({iterations} chance-sampled iterations per variant)")
+    print(f"{'variant':<24}{'iters/s':>10}{'infosets':>10}{'peak MB':>10}{'solve ms':>10}{'nodes':>8}")
+    for name, config in VARIANTS:
+        res = bench_cfr(config, iterations)
+        line = f"{name:<24}{res['iters_per_sec']:>10.0f}{res['infosets']:>10}{res['peak_mb']:>10.2f}"
+        if config.num_rounds == 2:
+            sub = bench_subgame(config)
+            line += f"{sub['sec_per_solve'] * 1000:>10.1f}{sub['nodes']:>8}"
+        else:
+            line += f"{'-':>10}{'-':>8}"
+        print(line)
+
+if __name__ == "__main__":
+    run()
@@ -1 +0,0 @@
-l
\ No newline at end of file
@@ -0,0 +1,202 @@
+NUM_STREETS = 4
+SMALL_BLIND = 50
+BIG_BLIND = 100
+STACK_SIZE = 20000
+
+# Abstract action ids, same mapping ReBeLAgent always used for its history
+ABSTRACT_ACTIONS = {'f': 0, 'k': 1, 'c': 1, 'b': 2}
+
+
+class ActionParser:
+    """
+    Incremental parser for one hand's Slumbot action string (grammar in sample_api.py).
+
+    Slumbot sends the whole action string every time, but it only ever grows during a hand,
+    so update() consumes just the suffix it hasn't seen yet. A string that doesn't extend
+    the consumed prefix (new hand) resets the parser and starts over.
+
+    Besides the fields parse_action always returned, it keeps exact chip counts:
+    contrib / street_contrib / stacks are indexed by position (0 = BB, 1 = SB), and
+    history is the abstract action sequence for the whole hand (0 fold, 1 check/call, 2 bet).
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.action = ''
+        self.st = 0
+        self.pos = 1 # SB acts first preflop
+        self.street_last_bet_to = BIG_BLIND
+        self.total_last_bet_to = BIG_BLIND
+        self.last_bet_size = BIG_BLIND - SMALL_BLIND
+        self.last_bettor = 0 # BB "bet" the big blind
+        self.check_or_call_ends_street = False
+        self.expect_slash = False # a pre-river street just ended, '/' may follow
+        self.done = False
+        self.error = None
+
+        self.contrib = [BIG_BLIND, SMALL_BLIND]
+        self.street_contrib = [BIG_BLIND, SMALL_BLIND]
+        self.history = []
+        self.actions = [] # (pos, street, char, street bet-to for 'b' else None)
+        self.allin_street = None # street where an all-in got called
+
+    def copy(self):
+        other = ActionParser.__new__(ActionParser)
+        other.__dict__.update(self.__dict__)
+        other.contrib = list(self.contrib)
+        other.street_contrib = list(self.street_contrib)
+        other.history = list(self.history)
+        other.actions = list(self.actions)
+        return other
+
+    @property
+    def pot(self):
+        return self.contrib[0] + self.contrib[1]
+
+    @property
+    def stacks(self):
+        return [STACK_SIZE - self.contrib[0], STACK_SIZE - self.contrib[1]]
+
+    @property
+    def last_action(self):
+        return self.actions[-1] if self.actions else None
+
+    def update(self, action):
+        """
+        Feeds the full action string seen so far. Returns the actions consumed by this call
+        (same tuples as self.actions), so callers can react to just the new ones.
+        """
+        if not action.startswith(self.action):
+            self.reset()
+        start = len(self.actions)
+        suffix = action[len(self.action):]
+        self.action = action
+        if self.error is None:
+            self._consume(suffix)
+        return self.actions[start:]
+
+    def state(self):
+        """
+        Same dict SlumbotClient.parse_action returns ({'error': ...} on a bad string),
+        plus pot, stacks, contributions and the abstract history.
+        """
+        if self.error is not None:
+            return {'error': self.error}
+        return {
+            'st': self.st,
+            'pos': self.pos,
+            'street_last_bet_to': self.street_last_bet_to,
+            'total_last_bet_to': self.total_last_bet_to,
+            'last_bet_size': self.last_bet_size,
+            'last_bettor': self.last_bettor,
+            'pot': self.pot,
+            'contrib': list(self.contrib),
+            'stacks': self.stacks,
+            'history': list(self.history),
+            'last_action': self.last_action,
+        }
+
+    def _fail(self, msg):
+        self.error = msg
+
+    def _end_street(self):
+        if self.st == NUM_STREETS - 1:
+            self.pos = -1 # Reached showdown
+            self.done = True
+        else:
+            self.pos = 0 # BB acts first postflop
+            self.st += 1
+            self.expect_slash = True
+            self.street_contrib = [0, 0]
+        self.street_last_bet_to = 0
+        self.check_or_call_ends_street = False
+
+    def _consume(self, chars):
+        i = 0
+        sz = len(chars)
+        while i < sz:
+            c = chars[i]
+            i += 1
+            if self.expect_slash:
+                self.expect_slash = False
+                if c == '/':
+                    continue
+                return self._fail('Missing slash')
+            if self.done:
+                # Only the trailing slashes of an all-in runout may follow the end of the hand
+                if c == '/' and self.allin_street is not None:
+                    continue
+                return self._fail('Extra chars')
+            if self.st >= NUM_STREETS:
+                return self._fail('Unexpected error')
+
+            actor = self.pos
+            if c == 'k':
+                if self.last_bet_size > 0:
+                    return self._fail('Illegal check')
+                self._record(actor, c, None)
+                if self.check_or_call_ends_street:
+                    self._end_street()
+                else:
+                    self.pos = (self.pos + 1) % 2
+                    self.check_or_call_ends_street = True
+            elif c == 'c':
+                if self.last_bet_size == 0:
+                    return self._fail('Illegal call')
+                self.contrib[actor] = self.total_last_bet_to
+                self.street_contrib[actor] = self.street_last_bet_to
+                self._record(actor, c, None)
+                if self.total_last_bet_to == STACK_SIZE:
+                    # All in call: the board runs out, remaining streets have no action
+                    self.allin_street = self.st
+                    self.st = NUM_STREETS - 1
+                    self.pos = -1
+                    self.last_bet_size = 0
+                    self.done = True
+                    continue
+                if self.check_or_call_ends_street:
+                    self._end_street()
+                else:
+                    self.pos = (self.pos + 1) % 2
+                    self.check_or_call_ends_street = True
+                self.last_bet_size = 0
+                self.last_bettor = -1
+            elif c == 'f':
+                if self.last_bet_size == 0:
+                    return self._fail('Illegal fold')
+                self._record(actor, c, None)
+                self.pos = -1
+                self.done = True
+            elif c == 'b':
+                j = i
+                while i < sz and '0' <= chars[i] <= '9':
+                    i += 1
+                if i == j:
+                    return self._fail('Missing bet size')
+                new_street_last_bet_to = int(chars[j:i])
+                new_last_bet_size = new_street_last_bet_to - self.street_last_bet_to
+
+                # Same bet validation as sample_api.ParseAction: a raise must be at least
+                # the last bet (and at least a big blind), unless it is all-in
+                remaining = STACK_SIZE - self.total_last_bet_to
+                min_bet_size = max(self.last_bet_size, BIG_BLIND)
+                if min_bet_size > remaining: min_bet_size = remaining
+                if new_last_bet_size < min_bet_size: return self._fail('Bet too small')
+                if new_last_bet_size > remaining: return self._fail('Bet too big')
+
+                self.last_bet_size = new_last_bet_size
+                self.street_last_bet_to = new_street_last_bet_to
+                self.total_last_bet_to += new_last_bet_size
+                self.contrib[actor] = self.total_last_bet_to
+                self.street_contrib[actor] = new_street_last_bet_to
+                self._record(actor, c, new_street_last_bet_to)
+                self.last_bettor = actor
+                self.pos = (self.pos + 1) % 2
+                self.check_or_call_ends_street = True
+            else:
+                return self._fail('Unexpected char')
+
+    def _record(self, actor, c, amount):
+        self.history.append(ABSTRACT_ACTIONS[c])
+        self.actions.append((actor, self.st, c, amount))
@@ -0,0 +1,76 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from .client import SlumbotClient, HTTPTransport
+
+
+class AsyncRateLimiter:
+    """
+    Token bucket shared by every session: at most `rate` requests per second overall,
+    with bursts of up to `burst` requests. rate=None disables limiting.
+    """
+    def __init__(self, rate=None, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._last = None
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate is None:
+            return
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            while True:
+                now = loop.time()
+                if self._last is not None:
+                    self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+
+class AsyncSlumbotClient:
+    """
+    asyncio version of SlumbotClient: same login / new_hand / act calls, responses and errors.
+    One instance is one session (its own token and its own pooled HTTPTransport).
+
+    The blocking SlumbotClient calls run in a thread executor, so this needs no extra
+    HTTP dependency; requests holds no GIL while waiting on the socket, so K sessions
+    really do have K requests in flight.
+    """
+    def __init__(self, transport=None, rate_limiter=None, executor=None):
+        self.client = SlumbotClient(transport=transport if transport is not None else HTTPTransport())
+        self.rate_limiter = rate_limiter if rate_limiter is not None else AsyncRateLimiter()
+        self.executor = executor
+
+    @property
+    def token(self):
+        return self.client.token
+
+    @property
+    def transport(self):
+        return self.client.transport
+
+    async def _call(self, fn, *args):
+        await self.rate_limiter.acquire()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, fn, *args)
+
+    async def login(self, username, password):
+        return await self._call(self.client.login, username, password)
+
+    async def new_hand(self):
+        return await self._call(self.client.new_hand)
+
+    async def act(self, action_str):
+        return await self._call(self.client.act, action_str)
+
+    parse_action = staticmethod(SlumbotClient.parse_action)
+
+
+def make_network_executor(sessions):
+    # One thread per session is enough: a session never has two requests in flight
+    return ThreadPoolExecutor(max_workers=max(1, sessions), thread_name_prefix="slumbot-net")
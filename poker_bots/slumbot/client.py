@@ -1,21 +1,125 @@
-import requests
+import random
 import sys
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .action_parser import ActionParser, NUM_STREETS, SMALL_BLIND, BIG_BLIND, STACK_SIZE
 
 HOST = 'slumbot.com'
-NUM_STREETS = 4
-SMALL_BLIND = 50
-BIG_BLIND = 100
-STACK_SIZE = 20000
+
+
+def latency_summary(latencies, retries=0):
+    """
+    Count, mean and percentiles in milliseconds of request latencies in seconds
+    (shared by every transport's latency_summary()).
+    """
+    if not latencies:
+        return {'count': 0}
+    lat = sorted(latencies)
+    n = len(lat)
+    pct = lambda q: lat[min(n - 1, int(q * n))] * 1000.0
+    return {
+        'count': n,
+        'retries': retries,
+        'mean_ms': sum(lat) / n * 1000.0,
+        'p50_ms': pct(0.50),
+        'p90_ms': pct(0.90),
+        'p99_ms': pct(0.99),
+        'max_ms': lat[-1] * 1000.0,
+    }
+
+
+class HTTPTransport:
+    """
+    Keep-alive transport for the Slumbot API.
+    - One pooled requests.Session, so consecutive calls reuse the TCP/TLS connection
+    - (connect, read) timeouts on every call
+    - Bounded retries with exponential backoff + full jitter on connection errors,
+      timeouts, 429 and 5xx. Retry-After is honoured when the server sends it.
+    - Round-trip latency of every successful request is kept for latency_summary()
+
+    act is not idempotent: if the server already applied the action and only the reply
+    got lost, resending it would desync the hand. So non-idempotent calls only retry
+    when the request can't have been processed (connect failures, 429, 503).
+    """
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+    SAFE_RETRY_STATUS = (429, 503)
+
+    def __init__(self, host=HOST, timeout=(5.0, 30.0), max_retries=3, backoff=0.5, max_backoff=8.0,
+                 pool_size=4, latency_window=100000, scheme='https'):
+        self.base_url = f'{scheme}://{host}/slumbot/api'
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.session = requests.Session()
+        # Retries are done here (with jitter and the idempotency rule), not by urllib3
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.latencies = deque(maxlen=latency_window) # seconds
+        self.num_requests = 0
+        self.num_retries = 0
+
+    def post(self, endpoint, data, idempotent=True):
+        """
+        POSTs json data to /slumbot/api/<endpoint>. Returns the requests.Response
+        (the last one if every retry got a retryable status).
+        Raises the last requests exception if every attempt failed to connect.
+        """
+        url = f'{self.base_url}/{endpoint}'
+        retry_status = self.RETRY_STATUS if idempotent else self.SAFE_RETRY_STATUS
+        for attempt in range(self.max_retries + 1):
+            last = attempt == self.max_retries
+            start = time.perf_counter()
+            try:
+                response = self.session.post(url, json=data, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # Only a failed connect is known not to have reached the server
+                if last or not (idempotent or isinstance(e, requests.ConnectTimeout)):
+                    raise
+                self._sleep(attempt, None)
+                continue
+
+            self.num_requests += 1
+            self.latencies.append(time.perf_counter() - start)
+            if response.status_code not in retry_status or last:
+                return response
+            self._sleep(attempt, response)
+
+    def _sleep(self, attempt, response):
+        self.num_retries += 1
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        time.sleep(delay)
+
+    def latency_summary(self):
+        """
+        Round-trip latency stats in milliseconds over the recorded requests.
+        """
+        return latency_summary(self.latencies, self.num_retries)
+
+    def close(self):
+        self.session.close()
 
 class SlumbotClient:
-    def __init__(self, username=None, password=None):
+    def __init__(self, username=None, password=None, transport=None):
+        # Each client gets its own pooled session unless a transport is passed in
+        self.transport = transport if transport is not None else HTTPTransport()
         self.token = None
         if username and password:
             self.login(username, password)
 
     def login(self, username, password):
         data = {"username": username, "password": password}
-        response = requests.post(f'https://{HOST}/slumbot/api/login', json=data)
+        response = self.transport.post('login', data)
         if response.status_code != 200:
             raise Exception(f"Login failed: {response.status_code} {response.text}")
         
@@ -31,7 +135,7 @@ class SlumbotClient:
         if self.token:
             data['token'] = self.token
             
-        response = requests.post(f'https://{HOST}/slumbot/api/new_hand', json=data)
+        response = self.transport.post('new_hand', data)
         if response.status_code != 200:
             raise Exception(f"NewHand failed: {response.status_code} {response.text}")
             
@@ -50,7 +154,7 @@ class SlumbotClient:
             raise Exception("No token available for Act")
             
         data = {'token': self.token, 'incr': action_str}
-        response = requests.post(f'https://{HOST}/slumbot/api/act', json=data)
+        response = self.transport.post('act', data, idempotent=False)
         if response.status_code != 200:
             raise Exception(f"Act failed: {response.status_code} {response.text}")
             
@@ -67,124 +171,10 @@ class SlumbotClient:
     def parse_action(action):
         """
         Parses the action string from Slumbot.
-        Returns state dict.
+        Returns state dict ({'error': ...} if the string is illegal).
+        One-shot wrapper around ActionParser; keep an ActionParser per hand and call
+        update() to avoid re-scanning the whole string at every decision.
         """
-        st = 0
-        street_last_bet_to = BIG_BLIND
-        total_last_bet_to = BIG_BLIND
-        last_bet_size = BIG_BLIND - SMALL_BLIND
-        last_bettor = 0 # 0=BB (pos 0), 1=SB (pos 1). Wait.
-        # "A client_pos of 0 indicates that you are the big blind ... 1 indicates you are the small blind."
-        # Preflop: SB(1) posts 50, BB(0) posts 100.
-        # First to act Preflop is SB(1).
-        # Wait, usually SB acts first Heads Up.
-        # Slumbot Doc: "0 indicates ... Big Blind (second to act preflop)". 
-        # So SB is 1. SB acts first.
-        # last_bettor = 0 means BB posted 100.
-        
-        sz = len(action)
-        pos = 1 # SB starts
-        
-        if sz == 0:
-            return {
-                'st': st,
-                'pos': pos,
-                'street_last_bet_to': street_last_bet_to,
-                'total_last_bet_to': total_last_bet_to,
-                'last_bet_size': last_bet_size,
-                'last_bettor': last_bettor,
-            }
-
-        check_or_call_ends_street = False
-        i = 0
-        while i < sz:
-            if st >= NUM_STREETS:
-                return {'error': 'Unexpected error'}
-            c = action[i]
-            i += 1
-            if c == 'k':
-                if last_bet_size > 0:
-                    return {'error': 'Illegal check'}
-                if check_or_call_ends_street:
-                    if st < NUM_STREETS - 1 and i < sz:
-                        if action[i] != '/': return {'error': 'Missing slash'}
-                        i += 1
-                    if st == NUM_STREETS - 1: pos = -1
-                    else:
-                        pos = 0 # Postflop, BB(0) acts first?
-                        # "first to act postflop" is BB(0).
-                        st += 1
-                    street_last_bet_to = 0
-                    check_or_call_ends_street = False
-                else:
-                    pos = (pos + 1) % 2
-                    check_or_call_ends_street = True
-            elif c == 'c':
-                if last_bet_size == 0: return {'error': 'Illegal call'}
-                if total_last_bet_to == STACK_SIZE:
-                    # All in call
-                    if i != sz:
-                        # Skip remaining slashes
-                        while i < sz:
-                            if action[i] == '/': i+=1
-                            else: return {'error': 'Extra chars'}
-                    st = NUM_STREETS - 1
-                    pos = -1
-                    last_bet_size = 0
-                    return {
-                        'st': st, 'pos': pos, 
-                        'street_last_bet_to': street_last_bet_to,
-                        'total_last_bet_to': total_last_bet_to,
-                        'last_bet_size': last_bet_size,
-                        'last_bettor': last_bettor
-                    }
-                
-                if check_or_call_ends_street:
-                    if st < NUM_STREETS - 1 and i < sz:
-                        if action[i] != '/': return {'error': 'Missing slash'}
-                        i += 1
-                    if st == NUM_STREETS - 1: pos = -1
-                    else:
-                        pos = 0
-                        st += 1
-                    street_last_bet_to = 0
-                    check_or_call_ends_street = False
-                else:
-                    pos = (pos + 1) % 2
-                    check_or_call_ends_street = True
-                last_bet_size = 0
-                last_bettor = -1
-            elif c == 'f':
-                pos = -1
-                return {
-                    'st': st, 'pos': pos, 
-                    'street_last_bet_to': street_last_bet_to,
-                    'total_last_bet_to': total_last_bet_to,
-                    'last_bet_size': last_bet_size,
-                    'last_bettor': last_bettor
-                }
-            elif c == 'b':
-                j = i
-                while i < sz and action[i] >= '0' and action[i] <= '9': i += 1
-                if i == j: return {'error': 'Missing bet size'}
-                new_street_last_bet_to = int(action[j:i])
-                new_last_bet_size = new_street_last_bet_to - street_last_bet_to
-                
-                last_bet_size = new_last_bet_size
-                street_last_bet_to = new_street_last_bet_to
-                total_last_bet_to += last_bet_size
-                last_bettor = pos
-                pos = (pos + 1) % 2
-                check_or_call_ends_street = True
-            else:
-                return {'error': 'Unexpected char'}
-
-        return {
-            'st': st,
-            'pos': pos,
-            'street_last_bet_to': street_last_bet_to,
-            'total_last_bet_to': total_last_bet_to,
-            'last_bet_size': last_bet_size,
-            'last_bettor': last_bettor,
-        }
-
+        parser = ActionParser()
+        parser.update(action)
+        return parser.state()
@@ -1,87 +1,384 @@
 import argparse
+import asyncio
+import itertools
+import math
+import random
 import statistics
 import time
-from typing import Tuple, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, Dict, Any, List, Optional
 
-from .client import SlumbotClient
+from treys import Card, Evaluator
+
+from .client import SlumbotClient, HTTPTransport, STACK_SIZE
+from .action_parser import ActionParser
+from .async_client import AsyncSlumbotClient, AsyncRateLimiter, make_network_executor
+from .local_server import LocalSlumbotServer, LocalTransport
 from .agent import RandomAgent
-from .rebel_agent import ReBeLAgent
+from .rebel_agent import ReBeLAgent, summarize_decisions
+from .rebel.cache import SubgameCache
+from .history import HandHistoryWriter, Decision
+
 
+_evaluator = Evaluator()
+BOARD_CARDS_BY_STREET = [0, 3, 4, 5]
 
-def play_hand(client: SlumbotClient, agent, verbose: bool = False) -> Tuple[int, Dict[str, Any]]:
+
+def allin_street(action_str: str) -> Optional[int]:
     """
-    Plays a single hand vs Slumbot with the provided agent.
-    Returns (winnings, stats).
+    Street (0-3) on which an all-in bet was called, or None if the hand never went all-in.
     """
-    if hasattr(agent, "reset_hand"):
-        agent.reset_hand()
+    parser = ActionParser()
+    parser.update(action_str)
+    return parser.allin_street
 
-    r = client.new_hand()
-    stats = {"showdown": False, "folded_early": False}
 
-    while True:
-        if "winnings" in r:
-            winnings = r["winnings"]
-            board = r.get("board", [])
-            stats["showdown"] = len(board) == 5
-            stats["final_board_len"] = len(board)
-            return winnings, stats
+def allin_adjusted_winnings(r: Dict[str, Any], hole_cards: List[str], samples: int = 2000,
+                            rng: Optional[random.Random] = None) -> float:
+    """
+    Control variate for the runout: a hand that was all-in before the river is scored by
+    its expected value over the board cards still to come instead of the realized result.
+    The correction (realized - expected) has zero mean, so the estimate stays unbiased.
+    Needs the opponent's cards ('bot_hole_cards' in the final response); otherwise the
+    raw winnings are returned.
+    """
+    winnings = r['winnings']
+    bot_cards = r.get('bot_hole_cards')
+    board = r.get('board') or []
+    if not bot_cards or not hole_cards or len(board) != 5:
+        return winnings
+    street = allin_street(r.get('action', ''))
+    if street is None or street == 3:
+        return winnings
 
-        action_str = r.get("action", "")
-        hole_cards = r.get("hole_cards")
-        board = r.get("board")
+    rng = rng or random.Random(0)
+    known = [Card.new(c) for c in board[:BOARD_CARDS_BY_STREET[street]]]
+    mine = [Card.new(c) for c in hole_cards]
+    theirs = [Card.new(c) for c in bot_cards]
+    dead = set(known + mine + theirs)
+    deck = [Card.new(r_ + s_) for r_ in '23456789TJQKA' for s_ in 'shdc']
+    deck = [c for c in deck if c not in dead]
 
-        if verbose:
-            print(f"Board: {board}, Hole: {hole_cards}, Action: {action_str}")
+    missing = 5 - len(known)
+    if math.comb(len(deck), missing) <= samples:
+        runouts = itertools.combinations(deck, missing)
+    else:
+        runouts = (rng.sample(deck, missing) for _ in range(samples))
+
+    total = 0.0
+    n = 0
+    for runout in runouts:
+        full = known + list(runout)
+        s0 = _evaluator.evaluate(full, mine)
+        s1 = _evaluator.evaluate(full, theirs)
+        total += 1.0 if s0 < s1 else (-1.0 if s1 < s0 else 0.0)
+        n += 1
+    return STACK_SIZE * total / n
+
+
+def confidence_interval(samples: List[float], z: float = 1.96) -> Tuple[float, float, float]:
+    """
+    Returns (mean, lower, upper) of a normal-approximation confidence interval.
+    Same estimate as summarize() in the kuhn / leduc arenas (sample stdev / sqrt(n)).
+    """
+    n = len(samples)
+    if n == 0:
+        return 0.0, 0.0, 0.0
+    mean = sum(samples) / n
+    stderr = statistics.stdev(samples) / math.sqrt(n) if n > 1 else 0.0
+    return mean, mean - z * stderr, mean + z * stderr
+
+
+def agent_iterations(agent) -> int:
+    # Search iterations of the agent's last decision (0 for agents that don't log them)
+    log = getattr(agent, "decision_log", None)
+    return log[-1][1] if log else 0
 
-        state = client.parse_action(action_str)
+
+class HandTracker:
+    """
+    Per-hand bookkeeping shared by play_hand and play_hand_async, which only differ in how
+    they call the client and the agent: the parser (shared with the agent through the
+    state), the state handed to the agent at each decision, the decision log and the
+    final stats / hand-history record.
+    """
+    def __init__(self, agent, recorder: Optional[HandHistoryWriter] = None):
+        if hasattr(agent, "reset_hand"):
+            agent.reset_hand()
+        self.agent = agent
+        self.recorder = recorder
+        self.parser = ActionParser() # one per hand
+        self.hole_cards = None
+        self.decisions = []
+
+    def decision(self, r: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str], List[str]]:
+        """
+        (state, hole_cards, board) for agent.get_action from a non-terminal response.
+        """
+        action_str = r.get("action", "")
+        self.hole_cards = r.get("hole_cards")
+        self.parser.update(action_str)
+        state = self.parser.state()
         if "error" in state:
             raise RuntimeError(f"Error parsing action: {state['error']}")
 
-        # Attach full action string for belief/history use
+        # Attach full action string and the parser for belief/history use
         state["action_full"] = action_str
+        state["parser"] = self.parser
+        state["client_pos"] = r.get("client_pos")
+        return state, self.hole_cards, r.get("board")
+
+    def acted(self, state: Dict[str, Any], action: str, latency: float):
+        self.decisions.append(Decision(len(state["action_full"]), state["st"], latency * 1000.0,
+                                       agent_iterations(self.agent), action))
+
+    def finish(self, r: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """
+        (winnings, stats) from the terminal response; appends the hand to the recorder.
+        """
+        board = r.get("board") or []
+        hole_cards = r.get("hole_cards") or self.hole_cards
+        stats = {"showdown": len(board) == 5, "folded_early": False, "final_board_len": len(board),
+                 "adjusted_winnings": allin_adjusted_winnings(r, hole_cards)}
+        if self.recorder is not None:
+            self.recorder.record(r["winnings"], stats["adjusted_winnings"], r.get("client_pos", 0), hole_cards,
+                                 r.get("bot_hole_cards"), board, r.get("action", ""), self.decisions)
+        return r["winnings"], stats
+
 
+def play_hand(client: SlumbotClient, agent, verbose: bool = False, recorder: Optional[HandHistoryWriter] = None
+              ) -> Tuple[int, Dict[str, Any]]:
+    """
+    Plays a single hand vs Slumbot with the provided agent.
+    Returns (winnings, stats). recorder: HandHistoryWriter to log the finished hand to.
+    """
+    hand = HandTracker(agent, recorder)
+    r = client.new_hand()
+    while "winnings" not in r:
+        state, hole_cards, board = hand.decision(r)
+        if verbose:
+            print(f"Board: {board}, Hole: {hole_cards}, Action: {state['action_full']}")
+
+        start = time.perf_counter()
         my_action = agent.get_action(state, hole_cards, board)
+        hand.acted(state, my_action, time.perf_counter() - start)
         if verbose:
             print(f"Agent Action: {my_action}")
 
         r = client.act(my_action)
+    return hand.finish(r)
+
+
+async def play_hand_async(client: AsyncSlumbotClient, agent, agent_executor,
+                          recorder: Optional[HandHistoryWriter] = None) -> Tuple[int, Dict[str, Any]]:
+    """
+    Same as play_hand over an AsyncSlumbotClient. The agent decides in agent_executor,
+    so a slow search never stalls the other sessions' network traffic.
+    """
+    loop = asyncio.get_running_loop()
+    hand = HandTracker(agent, recorder)
+    r = await client.new_hand()
+    while "winnings" not in r:
+        state, hole_cards, board = hand.decision(r)
+        # Latency includes the wait for a free agent thread, like the server sees it
+        start = time.perf_counter()
+        my_action = await loop.run_in_executor(agent_executor, agent.get_action, state, hole_cards, board)
+        hand.acted(state, my_action, time.perf_counter() - start)
+        r = await client.act(my_action)
+    return hand.finish(r)
+
+
+def make_agent(agent_name: str, agent_kwargs: Optional[Dict[str, Any]] = None):
+    # agent_kwargs go to ReBeLAgent (cfr_iterations, time_budget, ...)
+    return ReBeLAgent(**(agent_kwargs or {})) if agent_name == "rebel" else RandomAgent()
+
+
+def print_decisions(agents):
+    """
+    Per-decision search latency and iterations, over all of the agents' logs.
+    """
+    logs = [a.decision_log for a in agents if hasattr(a, "decision_log")]
+    d = summarize_decisions(itertools.chain(*logs))
+    if d['count'] == 0:
+        return
+    print(f"Decisions:         {d['count']} (iterations mean {d['mean_iterations']:.1f}, min {d['min_iterations']})")
+    print(f"Decision ms:       mean {d['mean_ms']:.1f}, p50 {d['p50_ms']:.1f}, "
+          f"p90 {d['p90_ms']:.1f}, p99 {d['p99_ms']:.1f}, max {d['max_ms']:.1f}")
+    # Agents may share one cache
+    caches = {id(a.cache): a.cache for a in agents if getattr(a, "cache", None) is not None}
+    for c in caches.values():
+        st = c.stats()
+        print(f"Subgame cache:     {st['hits']} hits / {st['hits'] + st['misses']} lookups "
+              f"({100.0 * st['hit_rate']:.1f}%), {st['size']} entries, {st['evictions']} evicted")
 
 
-def evaluate(agent_name: str, hands: int, username: str = None, password: str = None, verbose: bool = False):
-    client = SlumbotClient(username, password)
-    agent = ReBeLAgent() if agent_name == "rebel" else RandomAgent()
+def print_latency(transport: HTTPTransport):
+    lat = transport.latency_summary()
+    if lat['count'] == 0:
+        return
+    print(f"Requests:          {lat['count']} ({lat['retries']} retries)")
+    print(f"Latency ms:        mean {lat['mean_ms']:.1f}, p50 {lat['p50_ms']:.1f}, "
+          f"p90 {lat['p90_ms']:.1f}, p99 {lat['p99_ms']:.1f}, max {lat['max_ms']:.1f}")
+
+
+def evaluate(agent_name: str, hands: int, username: str = None, password: str = None, verbose: bool = False,
+             timeout: float = 30.0, retries: int = 3, max_consecutive_errors: int = 5, transport=None,
+             delay: float = 0.05, agent_kwargs: Optional[Dict[str, Any]] = None,
+             recorder: Optional[HandHistoryWriter] = None):
+    """
+    A hand that still fails after the transport's retries is skipped and the run goes on;
+    only max_consecutive_errors failures in a row (server down, bad token) stop it.
+    transport: defaults to slumbot.com over HTTPTransport; pass a LocalTransport to play
+    the local server (and delay=0, there is no API to be nice to).
+    recorder: HandHistoryWriter every finished hand is appended to (history.py).
+    """
+    if transport is None:
+        transport = HTTPTransport(timeout=(5.0, timeout), max_retries=retries)
+    client = SlumbotClient(username, password, transport=transport)
+    agent = make_agent(agent_name, agent_kwargs)
+    start = time.perf_counter()
 
     winnings_list = []
+    adjusted_list = []
     showdowns = 0
     folds_before_river = 0
+    errors = 0
+    consecutive_errors = 0
 
     for i in range(hands):
         if verbose:
             print(f"\n--- Hand {i+1} ---")
         try:
-            winnings, stats = play_hand(client, agent, verbose=verbose)
+            winnings, stats = play_hand(client, agent, verbose=verbose, recorder=recorder)
             winnings_list.append(winnings)
+            adjusted_list.append(stats["adjusted_winnings"])
             showdowns += 1 if stats.get("showdown") else 0
             folds_before_river += 1 if not stats.get("showdown") else 0
+            consecutive_errors = 0
         except Exception as e:
+            # The abandoned hand is dropped; the next new_hand starts a fresh one
+            errors += 1
+            consecutive_errors += 1
             print(f"Error in hand {i+1}: {e}")
-            break
+            if consecutive_errors >= max_consecutive_errors:
+                print(f"Stopping after {consecutive_errors} consecutive errors")
+                break
         # Be nice to the API
-        time.sleep(0.05)
+        if delay > 0:
+            time.sleep(delay)
+
+    print_summary(winnings_list, adjusted_list, showdowns, folds_before_river, errors, time.perf_counter() - start)
+    print_latency(transport)
+    print_decisions([agent])
+    transport.close()
+
+
+async def _run_session(session_id: int, client: AsyncSlumbotClient, agent, agent_executor, next_hand,
+                       results: List[Tuple[int, Dict[str, Any]]], counters: Dict[str, int],
+                       max_consecutive_errors: int, verbose: bool, recorder: Optional[HandHistoryWriter] = None):
+    consecutive_errors = 0
+    while next_hand():
+        try:
+            winnings, stats = await play_hand_async(client, agent, agent_executor, recorder)
+            results.append((winnings, stats))
+            consecutive_errors = 0
+            if verbose:
+                print(f"[session {session_id}] hand {len(results)}: {winnings}")
+        except Exception as e:
+            counters["errors"] += 1
+            consecutive_errors += 1
+            print(f"[session {session_id}] Error in hand: {e}")
+            if consecutive_errors >= max_consecutive_errors:
+                print(f"[session {session_id}] Stopping after {consecutive_errors} consecutive errors")
+                return
+
+
+async def evaluate_concurrent_async(agent_name: str, hands: int, sessions: int = 4, rate_limit: Optional[float] = 20.0,
+                                    username: str = None, password: str = None, verbose: bool = False,
+                                    timeout: float = 30.0, retries: int = 3, max_consecutive_errors: int = 5,
+                                    agent_workers: int = None, agent_kwargs: Optional[Dict[str, Any]] = None,
+                                    recorder: Optional[HandHistoryWriter] = None, transport_factory=None):
+    """
+    Plays `hands` hands over `sessions` independent Slumbot sessions (separate tokens) at once.
+    rate_limit caps requests/sec across all sessions (None = unlimited).
+    Each session has its own agent, since agents keep per-hand state (beliefs).
+    recorder: one HandHistoryWriter shared by all sessions (it's thread-safe).
+    transport_factory: makes each session's transport; default HTTPTransport to slumbot.com
+    (timeout / retries only apply to that), e.g. lambda: LocalTransport(server) for the local server.
+    """
+    limiter = AsyncRateLimiter(rate_limit, burst=sessions)
+    net_executor = make_network_executor(sessions)
+    agent_executor = ThreadPoolExecutor(max_workers=agent_workers or sessions, thread_name_prefix="agent")
+
+    if transport_factory is None:
+        transport_factory = lambda: HTTPTransport(timeout=(5.0, timeout), max_retries=retries)
+    clients = [AsyncSlumbotClient(transport_factory(), rate_limiter=limiter, executor=net_executor)
+               for _ in range(sessions)]
+    if username and password:
+        await asyncio.gather(*(c.login(username, password) for c in clients))
+    agents = [make_agent(agent_name, agent_kwargs) for _ in range(sessions)]
+
+    # Hands are handed out one at a time, so fast sessions pick up the slack of slow ones
+    remaining = [hands]
+    def next_hand():
+        if remaining[0] <= 0:
+            return False
+        remaining[0] -= 1
+        return True
+
+    results = []
+    counters = {"errors": 0}
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(
+            _run_session(i, c, a, agent_executor, next_hand, results, counters, max_consecutive_errors, verbose,
+                         recorder)
+            for i, (c, a) in enumerate(zip(clients, agents))
+        ))
+    finally:
+        elapsed = time.perf_counter() - start
+        net_executor.shutdown(wait=False)
+        agent_executor.shutdown(wait=False)
 
+    winnings_list = [w for w, _ in results]
+    adjusted_list = [st["adjusted_winnings"] for _, st in results]
+    showdowns = sum(1 for _, st in results if st.get("showdown"))
+    print_summary(winnings_list, adjusted_list, showdowns, len(results) - showdowns, counters["errors"], elapsed)
+    limit = f"rate limit {rate_limit:g} req/s" if rate_limit else "no rate limit"
+    print(f"Sessions:          {sessions} ({limit})")
+    for i, c in enumerate(clients):
+        lat = c.transport.latency_summary()
+        if lat['count'] > 0:
+            print(f"  session {i}: {lat['count']} requests, p50 {lat['p50_ms']:.1f} ms, p99 {lat['p99_ms']:.1f} ms")
+        c.transport.close()
+    print_decisions(agents)
+    return results
+
+
+def evaluate_concurrent(agent_name: str, hands: int, sessions: int = 4, rate_limit: Optional[float] = 20.0, **kwargs):
+    return asyncio.run(evaluate_concurrent_async(agent_name, hands, sessions, rate_limit, **kwargs))
+
+
+def print_summary(winnings_list: List[float], adjusted_list: List[float], showdowns: int, folds_before_river: int,
+                  errors: int, elapsed: float):
     total = sum(winnings_list)
     hands_played = len(winnings_list)
     bb100 = (total / 100.0) / (hands_played / 100.0) if hands_played > 0 else 0.0
     stdev = statistics.pstdev(winnings_list) if len(winnings_list) > 1 else 0.0
+    # Chips per hand == bb/100 with a 100-chip big blind
+    _, raw_lo, raw_hi = confidence_interval(winnings_list)
+    adj_mean, adj_lo, adj_hi = confidence_interval(adjusted_list)
 
     print("\n=== Evaluation Summary ===")
     print(f"Hands played:      {hands_played}")
     print(f"Total winnings:    {total}")
-    print(f"Avg bb/100:        {bb100:.2f}")
+    print(f"Avg bb/100:        {bb100:.2f}  (95% CI {raw_lo:.2f} .. {raw_hi:.2f})")
+    print(f"All-in adj bb/100: {adj_mean:.2f}  (95% CI {adj_lo:.2f} .. {adj_hi:.2f})")
     print(f"Std dev (chips):   {stdev:.1f}")
     print(f"Showdowns:         {showdowns}")
     print(f"Folds pre-river:   {folds_before_river}")
+    print(f"Hands with errors: {errors}")
+    print(f"Hands/sec:         {hands_played / elapsed if elapsed > 0 else 0.0:.2f}")
 
 
 def main():
@@ -91,9 +388,68 @@ def main():
     parser.add_argument("--hands", type=int, default=50, help="Number of hands to play")
     parser.add_argument("--agent", type=str, default="rebel", choices=["rebel", "random"])
     parser.add_argument("--verbose", action="store_true", help="Print per-hand details")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Read timeout per request (seconds, slumbot.com only)")
+    parser.add_argument("--retries", type=int, default=3, help="Retries per request on transient failures (slumbot.com only)")
+    parser.add_argument("--max-errors", type=int, default=5, help="Stop after this many failed hands in a row")
+    parser.add_argument("--sessions", type=int, default=1, help="Concurrent Slumbot sessions (asyncio)")
+    parser.add_argument("--rate-limit", type=float, default=20.0, help="Max requests/sec over all sessions (0 = unlimited)")
+    parser.add_argument("--local", action="store_true",
+                        help="Play the in-process local server (random opponent) instead of slumbot.com; "
+                             "--sessions and --rate-limit work the same")
+    parser.add_argument("--seed", type=int, default=None, help="Deal seed for --local")
+    parser.add_argument("--time-budget", type=float, default=None, help="ReBeL search budget per decision (ms, anytime)")
+    parser.add_argument("--cfr-iterations", type=int, default=None,
+                        help="ReBeL CFR iterations per decision (default 50; a cap of 100000 with --time-budget)")
+    parser.add_argument("--cache", type=str, default=None,
+                        help="ReBeL subgame cache file: loaded at start, saved at the end")
+    parser.add_argument("--history", type=str, default=None,
+                        help="Append every hand to this hand history log (replay it with history.py)")
     args = parser.parse_args()
 
-    evaluate(agent_name=args.agent, hands=args.hands, username=args.username, password=args.password, verbose=args.verbose)
+    agent_kwargs = {"verbose": args.verbose}
+    if args.time_budget is not None:
+        agent_kwargs["time_budget"] = args.time_budget / 1000.0
+        agent_kwargs["cfr_iterations"] = 100000
+    if args.cfr_iterations is not None:
+        agent_kwargs["cfr_iterations"] = args.cfr_iterations
+    if args.cache is not None:
+        # One cache shared by every session's agent
+        agent_kwargs["cache"] = SubgameCache(path=args.cache)
+    recorder = HandHistoryWriter(args.history) if args.history is not None else None
+
+    try:
+        run(args, agent_kwargs, recorder)
+    finally:
+        if args.cache is not None:
+            agent_kwargs["cache"].save()
+        if recorder is not None:
+            print(f"Hand history:      {recorder.hands} hands appended to {recorder.path}")
+            recorder.close()
+
+
+def run(args, agent_kwargs, recorder=None):
+    if args.local:
+        server = LocalSlumbotServer(seed=args.seed)
+        if args.sessions > 1:
+            evaluate_concurrent(agent_name=args.agent, hands=args.hands, sessions=args.sessions,
+                                rate_limit=args.rate_limit or None, verbose=args.verbose,
+                                max_consecutive_errors=args.max_errors, agent_kwargs=agent_kwargs,
+                                recorder=recorder, transport_factory=lambda: LocalTransport(server))
+        else:
+            evaluate(agent_name=args.agent, hands=args.hands, verbose=args.verbose,
+                     max_consecutive_errors=args.max_errors, transport=LocalTransport(server), delay=0.0,
+                     agent_kwargs=agent_kwargs, recorder=recorder)
+        return
+
+    if args.sessions > 1:
+        evaluate_concurrent(agent_name=args.agent, hands=args.hands, sessions=args.sessions,
+                            rate_limit=args.rate_limit or None, username=args.username, password=args.password,
+                            verbose=args.verbose, timeout=args.timeout, retries=args.retries,
+                            max_consecutive_errors=args.max_errors, agent_kwargs=agent_kwargs, recorder=recorder)
+    else:
+        evaluate(agent_name=args.agent, hands=args.hands, username=args.username, password=args.password, verbose=args.verbose,
+                 timeout=args.timeout, retries=args.retries, max_consecutive_errors=args.max_errors,
+                 agent_kwargs=agent_kwargs, recorder=recorder)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,315 @@
+import argparse
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from .action_parser import ActionParser
+from .rebel_agent import summarize_decisions
+
+# Hand histories of Slumbot sessions, and an offline replay harness on top of them.
+#
+# The log is one append-only binary file: a header (MAGIC + format version), then one
+# length-prefixed record per finished hand, so a crashed session loses at most the hand
+# being written and appending never rewrites anything. Record layout (little-endian):
+#   record length (bytes after this field)
+#   HAND: time (ms), winnings, all-in adjusted winnings, client_pos, hole cards (2),
+#         bot hole cards (2, NO_CARD when not shown), board (5, NO_CARD padded),
+#         number of board cards, number of decisions, length of the action string
+#   the full action string (ascii)
+#   per decision, DECISION: length of the action string when we were asked to act, street,
+#         latency (ms), search iterations (0 for agents that don't search), length of our
+#         action, then our action (ascii)
+# Cards are one byte each (rank * 4 + suit, like rebel.hands). A decision point is fully
+# given by the action prefix, the hole cards and the board cut to its street, which is all
+# replay() needs to put any agent back in the same spot.
+#
+# load_columns() only reads the fixed HAND part of every record into numpy arrays, for
+# quick scans (winnings, decisions per hand) over long sessions.
+
+MAGIC = b'SBHH'
+FORMAT_VERSION = 1
+FILE_HEADER = struct.Struct('<4sH')
+RECORD_LEN = struct.Struct('<I')
+HAND = struct.Struct('<qifB2B2B5BBBH')
+HAND_FIELDS = len(HAND.unpack(bytes(HAND.size)))
+DECISION = struct.Struct('<HBfIB')
+NO_CARD = 255
+
+RANKS = '23456789TJQKA'
+SUITS = 'shdc'
+BOARD_CARDS_BY_STREET = [0, 3, 4, 5]
+
+Decision = namedtuple('Decision', ['prefix_len', 'street', 'latency_ms', 'iterations', 'action'])
+HandRecord = namedtuple('HandRecord', ['time_ms', 'winnings', 'adjusted_winnings', 'client_pos', 'hole_cards',
+                                       'bot_hole_cards', 'board', 'action', 'decisions'])
+
+
+def card_byte(card):
+    return RANKS.index(card[0]) * 4 + SUITS.index(card[1])
+
+
+def card_str(b):
+    return RANKS[b // 4] + SUITS[b % 4]
+
+
+def _cards(cards, n):
+    cards = list(cards or [])
+    return [card_byte(c) for c in cards] + [NO_CARD] * (n - len(cards))
+
+
+def encode_hand(hand):
+    """
+    Bytes of one record (without the length prefix) for a HandRecord.
+    """
+    action = hand.action.encode('ascii')
+    parts = [HAND.pack(int(hand.time_ms), int(hand.winnings), float(hand.adjusted_winnings), int(hand.client_pos),
+                       *_cards(hand.hole_cards, 2), *_cards(hand.bot_hole_cards, 2), *_cards(hand.board, 5),
+                       len(hand.board), len(hand.decisions), len(action)),
+             action]
+    for d in hand.decisions:
+        a = d.action.encode('ascii')
+        parts.append(DECISION.pack(d.prefix_len, d.street, d.latency_ms, min(int(d.iterations), 0xFFFFFFFF), len(a)))
+        parts.append(a)
+    return b''.join(parts)
+
+
+def decode_hand(buf, offset=0):
+    fields = HAND.unpack_from(buf, offset)
+    time_ms, winnings, adjusted, client_pos = fields[:4]
+    hole, bot, board = fields[4:6], fields[6:8], fields[8:13]
+    n_board, n_decisions, action_len = fields[13:]
+    offset += HAND.size
+    action = bytes(buf[offset:offset + action_len]).decode('ascii')
+    offset += action_len
+    decisions = []
+    for _ in range(n_decisions):
+        prefix_len, street, latency_ms, iterations, n = DECISION.unpack_from(buf, offset)
+        offset += DECISION.size
+        decisions.append(Decision(prefix_len, street, latency_ms, iterations,
+                                  bytes(buf[offset:offset + n]).decode('ascii')))
+        offset += n
+    return HandRecord(time_ms, winnings, adjusted, client_pos, [card_str(c) for c in hole],
+                      [card_str(c) for c in bot if c != NO_CARD] or None,
+                      [card_str(c) for c in board[:n_board]], action, decisions)
+
+
+class HandHistoryWriter:
+    """
+    Appends hands to a log file (created with its header if missing). Thread-safe, so the
+    concurrent eval sessions can share one writer. Every record is flushed when written.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.hands = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not new:
+            _check_header(path)
+        self._f = open(path, 'ab')
+        if new:
+            self._f.write(FILE_HEADER.pack(MAGIC, FORMAT_VERSION))
+            self._f.flush()
+
+    def write(self, hand):
+        data = encode_hand(hand)
+        with self._lock:
+            self._f.write(RECORD_LEN.pack(len(data)) + data)
+            self._f.flush()
+            self.hands += 1
+
+    def record(self, winnings, adjusted_winnings, client_pos, hole_cards, bot_hole_cards, board, action, decisions):
+        self.write(HandRecord(int(time.time() * 1000), winnings, adjusted_winnings, client_pos, hole_cards,
+                              bot_hole_cards, board, action, decisions))
+
+    def close(self):
+        with self._lock:
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _check_header(path):
+    with open(path, 'rb') as f:
+        magic, version = FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"{path} is not a version {FORMAT_VERSION} hand history")
+
+
+def _records(path):
+    """
+    (buffer, offset) of every complete record. A truncated last record (session killed
+    mid-write) is skipped.
+    """
+    _check_header(path)
+    with open(path, 'rb') as f:
+        buf = f.read()
+    offset = FILE_HEADER.size
+    while offset + RECORD_LEN.size <= len(buf):
+        (n,) = RECORD_LEN.unpack_from(buf, offset)
+        offset += RECORD_LEN.size
+        if offset + n > len(buf):
+            break
+        yield buf, offset
+        offset += n
+
+
+def read_hands(path):
+    """
+    Yields every HandRecord in the log, oldest first.
+    """
+    for buf, offset in _records(path):
+        yield decode_hand(buf, offset)
+
+
+def load_columns(path):
+    """
+    Fixed fields of every hand as numpy arrays: time_ms, winnings, adjusted_winnings,
+    client_pos, board_len, num_decisions.
+    """
+    rows = [HAND.unpack_from(buf, offset) for buf, offset in _records(path)]
+    rows = np.array(rows, dtype=np.float64).reshape(-1, HAND_FIELDS)
+    return {'time_ms': rows[:, 0].astype(np.int64), 'winnings': rows[:, 1].astype(np.int64),
+            'adjusted_winnings': rows[:, 2], 'client_pos': rows[:, 3].astype(np.int8),
+            'board_len': rows[:, 13].astype(np.int8), 'num_decisions': rows[:, 14].astype(np.int32)}
+
+
+def action_type(action):
+    # 'f', 'k', 'c' or 'b' (any size)
+    return action[:1]
+
+
+def decision_state(hand, decision):
+    """
+    (state, hole_cards, board) as eval.play_hand hands them to agent.get_action at this
+    decision, with a fresh parser (call agent.reset_hand() first for a new hand).
+    """
+    prefix = hand.action[:decision.prefix_len]
+    parser = ActionParser()
+    parser.update(prefix)
+    state = parser.state()
+    state['action_full'] = prefix
+    state['parser'] = parser
+    state['client_pos'] = hand.client_pos
+    return state, list(hand.hole_cards), hand.board[:BOARD_CARDS_BY_STREET[decision.street]]
+
+
+def replay(path, agent, max_hands=None, verbose=False):
+    """
+    Feeds every logged decision through agent (in order, so per-hand state like beliefs
+    builds up as it did live) and compares with the logged action. Returns a dict with
+    the agent's latency summary now and as logged, and agreement: exact action, action
+    type (fold / check-call / bet), and per street.
+    """
+    replayed, logged = [], []
+    exact = same_type = 0
+    per_street = np.zeros((4, 3), dtype=np.int64) # decisions, exact, same type
+    size_errors = []
+    hands = 0
+    for hand in read_hands(path):
+        if max_hands is not None and hands >= max_hands:
+            break
+        hands += 1
+        if hasattr(agent, 'reset_hand'):
+            agent.reset_hand()
+        for d in hand.decisions:
+            state, hole_cards, board = decision_state(hand, d)
+            start = time.perf_counter()
+            action = agent.get_action(state, hole_cards, board)
+            latency = time.perf_counter() - start
+            log = getattr(agent, 'decision_log', None)
+            replayed.append((d.street, log[-1][1] if log else 0, latency))
+            logged.append((d.street, d.iterations, d.latency_ms / 1000.0))
+
+            per_street[d.street, 0] += 1
+            if action == d.action:
+                exact += 1
+                per_street[d.street, 1] += 1
+            if action_type(action) == action_type(d.action):
+                same_type += 1
+                per_street[d.street, 2] += 1
+                if action_type(action) == 'b':
+                    size_errors.append(abs(int(action[1:]) - int(d.action[1:])) / int(d.action[1:]))
+            if verbose:
+                print(f"{hand.action[:d.prefix_len] or '-'} {hand.hole_cards} {board}: "
+                      f"logged {d.action}, replayed {action} ({latency * 1000.0:.1f} ms)")
+
+    n = len(replayed)
+    return {'hands': hands, 'decisions': n, 'replayed': summarize_decisions(replayed),
+            'logged': summarize_decisions(logged),
+            'exact_agreement': exact / n if n else 0.0, 'type_agreement': same_type / n if n else 0.0,
+            'bet_size_error': float(np.mean(size_errors)) if size_errors else 0.0,
+            'per_street': [{'decisions': int(s[0]), 'exact': s[1] / s[0] if s[0] else 0.0,
+                            'type': s[2] / s[0] if s[0] else 0.0} for s in per_street]}
+
+
+def print_latency(name, d):
+    if d['count'] == 0:
+        return
+    print(f"{name:<19}mean {d['mean_ms']:.1f}, p50 {d['p50_ms']:.1f}, p90 {d['p90_ms']:.1f}, "
+          f"p99 {d['p99_ms']:.1f}, max {d['max_ms']:.1f} (iterations mean {d['mean_iterations']:.1f})")
+
+
+def print_replay(result):
+    print(f"Replayed:          {result['decisions']} decisions from {result['hands']} hands")
+    print_latency("Logged ms:", result['logged'])
+    print_latency("Replayed ms:", result['replayed'])
+    print(f"Agreement:         exact {100.0 * result['exact_agreement']:.1f}%, "
+          f"action type {100.0 * result['type_agreement']:.1f}% "
+          f"(bet sizes off by {100.0 * result['bet_size_error']:.1f}% on average)")
+    for street, s in zip(['preflop', 'flop', 'turn', 'river'], result['per_street']):
+        if s['decisions']:
+            print(f"  {street:<8} {s['decisions']:>6} decisions, exact {100.0 * s['exact']:.1f}%, "
+                  f"type {100.0 * s['type']:.1f}%")
+
+
+def print_log_summary(path):
+    cols = load_columns(path)
+    n = len(cols['winnings'])
+    print(f"{path}: {n} hands, {int(cols['num_decisions'].sum())} decisions")
+    if n == 0:
+        return
+    print(f"Total winnings:    {int(cols['winnings'].sum())}")
+    print(f"Avg bb/100:        {cols['winnings'].mean():.2f}")
+    print(f"All-in adj bb/100: {cols['adjusted_winnings'].mean():.2f}")
+    print(f"Showdowns:         {int((cols['board_len'] == 5).sum())}")
+    decisions = [(d.street, d.iterations, d.latency_ms / 1000.0) for h in read_hands(path) for d in h.decisions]
+    print_latency("Decision ms:", summarize_decisions(decisions))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a hand history log, or replay it through an agent")
+    parser.add_argument("path", type=str, help="Hand history file (eval.py --history)")
+    parser.add_argument("--replay", action="store_true", help="Replay the logged decisions through --agent")
+    parser.add_argument("--agent", type=str, default="rebel", choices=["rebel", "random"])
+    parser.add_argument("--hands", type=int, default=None, help="Replay at most this many hands")
+    parser.add_argument("--time-budget", type=float, default=None, help="ReBeL search budget per decision (ms, anytime)")
+    parser.add_argument("--cfr-iterations", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true", help="Print every replayed decision")
+    args = parser.parse_args()
+
+    print_log_summary(args.path)
+    if not args.replay:
+        return
+
+    from .eval import make_agent
+    agent_kwargs = {}
+    if args.time_budget is not None:
+        agent_kwargs["time_budget"] = args.time_budget / 1000.0
+        agent_kwargs["cfr_iterations"] = 100000
+    if args.cfr_iterations is not None:
+        agent_kwargs["cfr_iterations"] = args.cfr_iterations
+    print()
+    print_replay(replay(args.path, make_agent(args.agent, agent_kwargs), args.hands, args.verbose))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from treys import Card, Evaluator
+
+from .action_parser import ActionParser
+from .client import latency_summary
+from .agent import RandomAgent
+
+# Local stand-in for slumbot.com: same login / new_hand / act JSON API and action strings
+# (see sample_api.py), so SlumbotClient, eval.py and the agents run against it unchanged.
+#   - In-process: SlumbotClient(transport=LocalTransport(LocalSlumbotServer()))
+#   - On localhost: python -m poker_bots.slumbot.local_server --port 8000, then
+#     SlumbotClient(transport=HTTPTransport(host='127.0.0.1:8000', scheme='http'))
+# The opponent is any slumbot Agent (get_action(state, hole_cards, board) -> action string);
+# every session gets its own, since agents keep per-hand state.
+
+BOARD_CARDS_BY_STREET = [0, 3, 4, 5]
+RANKS = '23456789TJQKA'
+SUITS = 'shdc'
+
+
+class _Hand:
+    def __init__(self, client_pos, client_cards, bot_cards, board):
+        self.client_pos = client_pos # 0 = client is BB, 1 = client is SB (acts first preflop)
+        self.client_cards = client_cards
+        self.bot_cards = bot_cards
+        self.board = board # all 5 cards, revealed by street
+        self.action = ''
+        self.parser = ActionParser() # kept in sync with action
+        self.done = False
+
+
+class _Session:
+    def __init__(self, token, opponent):
+        self.token = token
+        self.opponent = opponent
+        self.lock = threading.Lock() # the session's hand and opponent
+        self.hand = None
+        self.num_hands = 0
+        self.total_winnings = 0
+
+
+class LocalSlumbotServer:
+    """
+    In-process Slumbot game server.
+    Deals from a seeded RNG, enforces the betting rules through an ActionParser per hand,
+    lets the opponent act whenever it is its turn and settles folds and showdowns (treys).
+    Blinds 50/100, 20,000-chip stacks reset every hand; client_pos alternates every hand.
+    Every endpoint takes and returns the same dicts as the real API.
+    opponent_factory: makes the opponent agent of each new session (default RandomAgent).
+    """
+    def __init__(self, opponent_factory=None, seed=None, users=None):
+        self.opponent_factory = opponent_factory or RandomAgent
+        self.rng = random.Random(seed)
+        self.users = users # {username: password}; None accepts any login
+        self.sessions = {}
+        self.evaluator = Evaluator()
+        self.deck = [r + s for r in RANKS for s in SUITS]
+        self.opponent_errors = 0
+        # The http mode serves requests from several threads. This lock only covers the
+        # session table, the RNG and the counters; each session's hand has its own lock, so
+        # one session's opponent thinking never holds up the others.
+        self.lock = threading.Lock()
+
+    # --- API endpoints ---
+
+    def login(self, data):
+        username = data.get('username')
+        password = data.get('password')
+        if self.users is not None and self.users.get(username) != password:
+            return {'error_msg': 'Invalid username or password'}
+        return {'token': self._new_session().token}
+
+    def new_hand(self, data):
+        session = self._get_session(data.get('token'), create=True)
+        if session is None:
+            return {'error_msg': 'Unknown token'}
+        with session.lock:
+            # Slumbot alternates the blinds, starting with the client in the big blind
+            client_pos = session.num_hands % 2
+            with self.lock:
+                cards = self.rng.sample(self.deck, 9)
+            hand = _Hand(client_pos, cards[0:2], cards[2:4], cards[4:9])
+            session.hand = hand
+            session.num_hands += 1
+
+            if hasattr(session.opponent, 'reset_hand'):
+                session.opponent.reset_hand()
+            self._play_opponent(session)
+            return self._response(session, old_action='')
+
+    def act(self, data):
+        session = self._get_session(data.get('token'))
+        if session is None:
+            return {'error_msg': 'Unknown token'}
+        with session.lock:
+            hand = session.hand
+            if hand is None or hand.done:
+                return {'error_msg': 'No hand in progress'}
+            incr = data.get('incr', '')
+
+            if hand.parser.pos != hand.client_pos:
+                return {'error_msg': 'Not your turn'}
+            error = self._check(hand, incr)
+            if error:
+                return {'error_msg': f"Illegal action: {error}"}
+
+            old_action = hand.action
+            self._apply(session, incr)
+            self._play_opponent(session)
+            return self._response(session, old_action=old_action)
+
+    def handle(self, endpoint, data):
+        if endpoint == 'login':
+            return self.login(data)
+        if endpoint == 'new_hand':
+            return self.new_hand(data)
+        if endpoint == 'act':
+            return self.act(data)
+        return {'error_msg': f'Unknown endpoint {endpoint}'}
+
+    # --- Game logic ---
+
+    def _new_session(self):
+        opponent = self.opponent_factory() # may be slow (model loading), outside the lock
+        with self.lock:
+            token = str(uuid.UUID(int=self.rng.getrandbits(128)))
+            session = _Session(token, opponent)
+            self.sessions[token] = session
+        return session
+
+    def _get_session(self, token, create=False):
+        with self.lock:
+            session = self.sessions.get(token)
+        if session is None and create and not token:
+            session = self._new_session()
+        return session
+
+    def _check(self, hand, incr):
+        # Validates incr on a copy of the hand's parser; returns the error or None
+        trial = hand.parser.copy()
+        trial.update(hand.action + incr)
+        return trial.error
+
+    def _apply(self, session, incr):
+        hand = session.hand
+        street = hand.parser.st
+        hand.action += incr
+        hand.parser.update(hand.action)
+        if hand.parser.done:
+            hand.done = True
+        elif hand.parser.st > street:
+            # Street finished: the protocol puts a '/' between streets
+            hand.action += '/'
+            hand.parser.update(hand.action)
+
+    def _play_opponent(self, session):
+        hand = session.hand
+        bot_pos = 1 - hand.client_pos
+        while not hand.done:
+            if hand.parser.pos != bot_pos:
+                return
+            # The opponent gets its own parser copy, so it can't disturb the server's
+            state = hand.parser.state()
+            state['action_full'] = hand.action
+            state['parser'] = hand.parser.copy()
+            state['client_pos'] = bot_pos
+            board = hand.board[:BOARD_CARDS_BY_STREET[state['st']]]
+            incr = session.opponent.get_action(state, list(hand.bot_cards), board)
+            if self._check(hand, incr):
+                # A broken opponent policy shouldn't kill the run: check/call instead
+                with self.lock:
+                    self.opponent_errors += 1
+                incr = 'k' if state['last_bet_size'] == 0 else 'c'
+            self._apply(session, incr)
+
+    def _client_winnings(self, hand):
+        parser = hand.parser
+        if hand.action.endswith('f'):
+            # The folder loses what it had in; the bettor gets it
+            folder = parser.last_action[0]
+            lost = parser.contrib[folder]
+            return -lost if folder == hand.client_pos else lost
+        total = parser.total_last_bet_to
+        mine = self.evaluator.evaluate([Card.new(c) for c in hand.board], [Card.new(c) for c in hand.client_cards])
+        theirs = self.evaluator.evaluate([Card.new(c) for c in hand.board], [Card.new(c) for c in hand.bot_cards])
+        if mine < theirs:
+            return total
+        if theirs < mine:
+            return -total
+        return 0
+
+    def _response(self, session, old_action):
+        hand = session.hand
+        street = hand.parser.st
+        r = {
+            'old_action': old_action,
+            'action': hand.action,
+            'client_pos': hand.client_pos,
+            'hole_cards': list(hand.client_cards),
+            'token': session.token,
+        }
+        if not hand.done:
+            r['board'] = hand.board[:BOARD_CARDS_BY_STREET[street]]
+            return r
+
+        winnings = self._client_winnings(hand) # treys' Evaluator is read-only, safe to share
+        session.total_winnings += winnings
+        r['winnings'] = winnings
+        r['session_num_hands'] = session.num_hands
+        r['session_total'] = session.total_winnings
+        if hand.action.endswith('f'):
+            r['board'] = hand.board[:BOARD_CARDS_BY_STREET[street]]
+        else:
+            # Showdown (all-ins run the board out): cards are shown
+            r['board'] = list(hand.board)
+            r['bot_hole_cards'] = list(hand.bot_cards)
+        return r
+
+
+class LocalResponse:
+    """
+    The parts of requests.Response that SlumbotClient uses.
+    """
+    def __init__(self, body, status_code=200):
+        self.status_code = status_code
+        self._body = body
+        self.headers = {}
+
+    def json(self):
+        return self._body
+
+    @property
+    def text(self):
+        return json.dumps(self._body)
+
+
+class LocalTransport:
+    """
+    Drop-in replacement for client.HTTPTransport that calls a LocalSlumbotServer directly.
+    """
+    def __init__(self, server=None):
+        self.server = server if server is not None else LocalSlumbotServer()
+        self.latencies = deque(maxlen=100000)
+        self.num_requests = 0
+        self.num_retries = 0
+
+    def post(self, endpoint, data, idempotent=True):
+        start = time.perf_counter()
+        body = self.server.handle(endpoint, dict(data))
+        self.latencies.append(time.perf_counter() - start)
+        self.num_requests += 1
+        return LocalResponse(body)
+
+    def latency_summary(self):
+        return latency_summary(self.latencies, self.num_retries)
+
+    def close(self):
+        pass
+
+
+def make_http_server(server, host='127.0.0.1', port=8000):
+    """
+    Serves a LocalSlumbotServer at http://host:port/slumbot/api/<endpoint>.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1' # keep-alive, like the real server
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            try:
+                data = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                data = None
+            prefix = '/slumbot/api/'
+            if data is None or not self.path.startswith(prefix):
+                body, status = {'error_msg': 'Bad request'}, 400
+            else:
+                body, status = server.handle(self.path[len(prefix):], data), 200
+            out = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local Slumbot-compatible server')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--opponent', type=str, default='random', choices=['random', 'rebel'])
+    args = parser.parse_args()
+
+    if args.opponent == 'rebel':
+        from .rebel_agent import ReBeLAgent
+        opponent_factory = ReBeLAgent
+    else:
+        opponent_factory = RandomAgent
+    httpd = make_http_server(LocalSlumbotServer(opponent_factory, seed=args.seed), args.host, args.port)
+    print(f"Local Slumbot server on http://{args.host}:{args.port}/slumbot/api")
+    httpd.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 import argparse
 import sys
 from .client import SlumbotClient
+from .action_parser import ActionParser
 from .agent import RandomAgent
 from .rebel_agent import ReBeLAgent
 
@@ -29,6 +30,7 @@ def main():
             
         try:
             r = client.new_hand()
+            parser = ActionParser()
             
             while True:
                 if 'winnings' in r:
@@ -43,10 +45,14 @@ def main():
                 
                 print(f"Board: {board}, Hole: {hole_cards}, Action: {action_str}")
                 
-                state = client.parse_action(action_str)
+                parser.update(action_str)
+                state = parser.state()
                 if 'error' in state:
                     print(f"Error parsing action: {state['error']}")
                     break
+                state['action_full'] = action_str
+                state['parser'] = parser
+                state['client_pos'] = r.get('client_pos')
                     
                 my_action = agent.get_action(state, hole_cards, board)
                 print(f"Agent Action: {my_action}")
@@ -0,0 +1,272 @@
+import argparse
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from .hands import CARD_INDEX, DECK, NUM_CARDS, NUM_HANDS, blocked_mask
+from .showdown import compute_strengths, live_mass, showdown_values
+
+# Card abstraction: the 1326 combos are grouped into num_buckets buckets per street, so the
+# value net and the search can work on (num_buckets,) vectors instead of (1326,).
+#
+# A hand on a board is described by its equity distribution: river equity vs a uniform random
+# hand over random runouts of the board, summarized by num_quantiles quantiles. For 1D
+# distributions the earth mover's distance is the L1 distance between quantile functions,
+# so k-means runs on the quantile vectors with L1 assignment (and mean centroids).
+#
+# What gets stored (rebel/data/abstraction.npz, built offline by main()):
+#   preflop:          (1326,) int16 bucket of every combo
+#   flop/turn/river:  (num_buckets, num_quantiles) float32 centroids
+# Postflop bucket maps depend on the board, so CardAbstraction computes them on demand
+# (runouts seeded by the board, so the same board always gets the same map) and caches them.
+# Buckets are sorted by mean equity: bucket 0 is the weakest.
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+ABSTRACTION_PATH = os.path.join(DATA_DIR, 'abstraction.npz')
+STREETS = ('preflop', 'flop', 'turn', 'river')
+STREET_OF_BOARD = {0: 'preflop', 3: 'flop', 4: 'turn', 5: 'river'}
+UNIFORM = np.ones(NUM_HANDS)
+
+
+def river_equity(board):
+    """
+    (1326,) equity of every combo vs a uniform random hand on a 5-card board (ties half),
+    nan for combos blocked by the board.
+    win - lose = showdown value and win + lose + tie = live mass, so equity = (live + v) / 2 live.
+    """
+    s = compute_strengths(board)
+    live = live_mass(UNIFORM, board)
+    v = showdown_values(s, UNIFORM)
+    eq = np.full(NUM_HANDS, np.nan)
+    ok = s >= 0
+    eq[ok] = (live[ok] + v[ok]) / (2.0 * live[ok])
+    return eq
+
+
+def equity_quantiles(board, num_quantiles=10, runouts=50, rng=None):
+    """
+    (1326, num_quantiles) quantiles of each hand's river equity over random runouts of board
+    (0, 3, 4 or 5 cards). nan rows for hands blocked by the board.
+    The turn has few enough rivers that all of them are used when runouts allows.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    board = list(board)
+    missing = 5 - len(board)
+    if missing == 0:
+        eq = river_equity(board)
+        return np.repeat(eq[:, None], num_quantiles, axis=1)
+
+    rest = [c for c in DECK if c not in board]
+    if missing == 1 and runouts >= len(rest):
+        completions = [[c] for c in rest]
+    else:
+        completions = [[rest[i] for i in rng.choice(len(rest), missing, replace=False)] for _ in range(runouts)]
+
+    eqs = np.empty((len(completions), NUM_HANDS))
+    for i, extra in enumerate(completions):
+        eqs[i] = river_equity(board + extra) # nan for hands holding a runout card
+    eqs[:, blocked_mask(board)] = np.nan
+
+    # Midpoint quantile levels, so a single value maps to all-equal quantiles
+    levels = (np.arange(num_quantiles) + 0.5) / num_quantiles
+    out = np.full((NUM_HANDS, num_quantiles), np.nan)
+    ok = ~blocked_mask(board)
+    out[ok] = np.nanquantile(eqs[:, ok], levels, axis=0).T
+    return out
+
+
+def _l1_distances(X, C, chunk=20000):
+    # (N, K) mean |x - c| over quantiles, chunked to bound memory
+    out = np.empty((len(X), len(C)))
+    for i in range(0, len(X), chunk):
+        out[i:i + chunk] = np.abs(X[i:i + chunk, None, :] - C[None, :, :]).mean(axis=2)
+    return out
+
+
+def kmeans_emd(X, k, iters=25, rng=None, verbose=False):
+    """
+    k-means on quantile vectors X (N, Q) under L1 (EMD for 1D distributions).
+    k-means++ init. Returns (centroids (k, Q), labels (N,)), centroids sorted by mean.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    X = np.asarray(X, dtype=np.float64)
+    k = min(k, len(X))
+    centroids = [X[rng.integers(len(X))]]
+    dist = _l1_distances(X, np.array(centroids))[:, 0]
+    for _ in range(1, k):
+        p = dist ** 2
+        p = p / p.sum() if p.sum() > 0 else None
+        centroids.append(X[rng.choice(len(X), p=p)])
+        dist = np.minimum(dist, _l1_distances(X, np.array(centroids[-1:]))[:, 0])
+    C = np.array(centroids)
+
+    for it in range(iters):
+        labels = _l1_distances(X, C).argmin(axis=1)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(C)
+        np.add.at(sums, labels, X)
+        new_C = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], C)
+        shift = np.abs(new_C - C).mean()
+        C = new_C
+        if verbose:
+            print(f"    iter {it + 1}: shift {shift:.5f}")
+        if shift < 1e-6:
+            break
+
+    C = C[np.argsort(C.mean(axis=1))]
+    return C, _l1_distances(X, C).argmin(axis=1)
+
+
+def build_abstraction(num_buckets=50, num_quantiles=10, boards=100, runouts=50,
+                      preflop_runouts=500, seed=0, verbose=True):
+    """
+    Offline clustering. Preflop clusters all 1326 combos directly; each postflop street
+    clusters the hands of `boards` random boards. Returns the dict stored in abstraction.npz.
+    """
+    rng = np.random.default_rng(seed)
+    out = {'num_buckets': num_buckets, 'num_quantiles': num_quantiles, 'runouts': runouts}
+
+    if verbose: print("preflop")
+    X = equity_quantiles([], num_quantiles, preflop_runouts, rng)
+    _, labels = kmeans_emd(X, num_buckets, rng=rng)
+    out['preflop'] = labels.astype(np.int16)
+
+    for street, n in (('flop', 3), ('turn', 4), ('river', 5)):
+        if verbose: print(street)
+        rows = []
+        for _ in range(boards):
+            board = [DECK[i] for i in rng.choice(NUM_CARDS, n, replace=False)]
+            X = equity_quantiles(board, num_quantiles, runouts, rng)
+            rows.append(X[~np.isnan(X[:, 0])])
+        C, _ = kmeans_emd(np.concatenate(rows), num_buckets, rng=rng)
+        out[street] = C.astype(np.float32)
+    return out
+
+
+class CardAbstraction:
+    """
+    Bucket maps plus projection of per-hand vectors into buckets and back.
+    Every method takes the board (treys ints, 0/3/4/5 cards); hands blocked by the board
+    have bucket -1 and are dropped by project / zeroed by lift.
+    """
+    def __init__(self, path=ABSTRACTION_PATH, cache_size=64):
+        if not os.path.exists(path):
+            print(f"Building card abstraction ({path})...")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            np.savez(path, **build_abstraction())
+        data = np.load(path)
+        self.num_buckets = int(data['num_buckets'])
+        self.num_quantiles = int(data['num_quantiles'])
+        self.runouts = int(data['runouts'])
+        self.preflop = data['preflop'].astype(np.int64)
+        self.centroids = {s: data[s].astype(np.float64) for s in STREETS[1:]}
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def buckets(self, board):
+        """
+        (1326,) int64 bucket of every combo on this board, -1 if blocked. Cached per board.
+        """
+        key = tuple(sorted(board))
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        if len(key) == 0:
+            b = self.preflop.copy()
+        else:
+            # Seeded by the board so the map never changes between calls
+            rng = np.random.default_rng([CARD_INDEX[c] for c in key])
+            X = equity_quantiles(list(key), self.num_quantiles, self.runouts, rng)
+            b = np.full(NUM_HANDS, -1, dtype=np.int64)
+            ok = ~np.isnan(X[:, 0])
+            b[ok] = _l1_distances(X[ok], self.centroids[STREET_OF_BOARD[len(key)]]).argmin(axis=1)
+        b.setflags(write=False)
+
+        self._cache[key] = b
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return b
+
+    def project(self, r, board):
+        """
+        (1326,) per-hand mass (a range) -> (num_buckets,) float32 mass per bucket.
+        """
+        b = self.buckets(board)
+        ok = b >= 0
+        return np.bincount(b[ok], weights=np.asarray(r, dtype=np.float64)[ok],
+                           minlength=self.num_buckets).astype(np.float32)
+
+    def project_mean(self, x, weights, board):
+        """
+        (..., 1326) per-hand quantity -> (..., num_buckets) weighted mean over each bucket's
+        hands (weights: a range). Buckets with no weight get the plain mean.
+        """
+        b = self.buckets(board)
+        ok = b >= 0
+        x = np.asarray(x, dtype=np.float64)
+        w = np.asarray(weights, dtype=np.float64) * ok
+        onehot = np.zeros((NUM_HANDS, self.num_buckets))
+        onehot[np.flatnonzero(ok), b[ok]] = 1.0
+        wsum = w @ onehot
+        count = onehot.sum(axis=0)
+        weighted = (x * w) @ onehot
+        plain = (x * ok) @ onehot
+        mean = np.divide(weighted, wsum, out=np.zeros_like(weighted), where=wsum > 1e-12)
+        fallback = np.divide(plain, count, out=np.zeros_like(plain), where=count > 0)
+        return np.where(wsum > 1e-12, mean, fallback).astype(np.float32)
+
+    def lift(self, x, board):
+        """
+        (..., num_buckets) per-bucket quantity (values, action probabilities) -> (..., 1326):
+        every hand gets its bucket's entry, blocked hands get 0.
+        """
+        b = self.buckets(board)
+        out = np.take(np.asarray(x), np.maximum(b, 0), axis=-1)
+        out[..., b < 0] = 0
+        return out
+
+    def lift_range(self, mass, board, prior=None):
+        """
+        (num_buckets,) bucket mass -> (1326,) range, split inside each bucket in proportion to
+        prior (default: uniform over the bucket's live hands).
+        """
+        b = self.buckets(board)
+        ok = b >= 0
+        prior = np.ones(NUM_HANDS) if prior is None else np.asarray(prior, dtype=np.float64)
+        prior = prior * ok
+        totals = np.bincount(b[ok], weights=prior[ok], minlength=self.num_buckets)
+        out = np.zeros(NUM_HANDS, dtype=np.float32)
+        share = np.divide(prior[ok], totals[b[ok]], out=np.zeros(ok.sum()), where=totals[b[ok]] > 0)
+        out[ok] = np.asarray(mass)[b[ok]] * share
+        return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the NLHE card abstraction (equity-distribution buckets)')
+    parser.add_argument('--buckets', type=int, default=50)
+    parser.add_argument('--quantiles', type=int, default=10)
+    parser.add_argument('--boards', type=int, default=100, help='Random boards clustered per postflop street')
+    parser.add_argument('--runouts', type=int, default=50, help='Runouts per hand for flop/turn equity distributions')
+    parser.add_argument('--preflop-runouts', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', type=str, default=ABSTRACTION_PATH)
+    args = parser.parse_args()
+
+    data = build_abstraction(args.buckets, args.quantiles, args.boards, args.runouts,
+                             args.preflop_runouts, args.seed)
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    np.savez(args.out, **data)
+    print(f"Wrote {args.out}")
+
+    abstraction = CardAbstraction(args.out)
+    for n in (0, 3, 4, 5):
+        board = [DECK[i] for i in np.random.default_rng(args.seed + n).choice(NUM_CARDS, n, replace=False)]
+        b = abstraction.buckets(board)
+        used = len(np.unique(b[b >= 0]))
+        print(f"  {STREET_OF_BOARD[n]:8s}: {used}/{abstraction.num_buckets} buckets used on a sample board")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+import numpy as np
+
+from .hands import NUM_HANDS, blocked_mask
+
+# Public beliefs for one hand: each position's reach, the probability of every combo
+# producing the public actions so far (0 = BB, 1 = SB, like NLHEState).
+#
+# Bayes' rule on a public action a by position p with policy sigma(a | h):
+#     reach[p][h] *= sigma(a | h)
+# and a board card zeroes every combo holding it, for both positions in one multiply.
+# Ranges (what the search and the value net get) are the reach rows normalized.
+# Because reach is only ever multiplied, the ranges are the same whatever order the
+# actions and board cards were seen in, so they carry over from street to street.
+
+
+class BeliefTracker:
+    """
+    Reach of both positions through one hand.
+    floor: added to every policy before an update, so an action the modeled policy says a
+    hand never takes only makes it unlikely, not impossible (models are imperfect).
+    """
+    def __init__(self, floor=0.0):
+        self.floor = floor
+        self.reset()
+
+    def reset(self):
+        self.reach = np.ones((2, NUM_HANDS))
+        self.board = []
+
+    def observe_board(self, board):
+        """
+        Card removal for the board cards not seen yet (board: the whole board so far).
+        """
+        new = [c for c in board if c not in self.board]
+        if new:
+            self.reach *= ~blocked_mask(new)
+            self.board = self.board + new
+
+    def update(self, pos, policy):
+        """
+        Bayes update for an action by pos: policy is that action's (1326,) probability per
+        hand. An update that would wipe out the whole range (an action the policy never
+        takes with any hand in it) is ignored, it carries no usable information.
+        """
+        posterior = self.reach[pos] * (np.asarray(policy, dtype=np.float64) + self.floor)
+        if posterior.sum() > 1e-300:
+            self.reach[pos] = posterior
+
+    def range(self, pos, dtype=np.float32):
+        r = self.reach[pos]
+        s = r.sum()
+        return (r / s if s > 0 else r).astype(dtype)
+
+    def ranges(self, me, dtype=np.float32):
+        """
+        (my range, opponent's range) for the player at position me, normalized.
+        """
+        return self.range(me, dtype), self.range(1 - me, dtype)
@@ -0,0 +1,185 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from .evaluator import evaluate_batch
+from .game import NLHEState, BetAbstraction, DEFAULT_BET_ABSTRACTION
+from .hands import CARD_MASK, HAND_CARDS, NUM_CARDS, NUM_HANDS
+from .chance import HAND_PERM
+from .search import NLHECFRSolver
+
+# Preflop blueprint: a strategy for every abstract preflop history, solved offline, so the
+# agent's preflop decisions are table lookups instead of searches.
+#
+# The whole preflop betting tree (BetAbstraction actions, at most max_raises raises) is
+# solved once with NLHECFRSolver from uniform ranges. Its leaves are valued with a pairwise
+# all-in equity matrix: exact for called all-ins, and for the leaves where the flop comes
+# it values the hand as checked down (no postflop play), which is crude but needs no
+# trained value net and makes the table cheap to rebuild for another bet abstraction.
+#
+# Stored in rebel/data/preflop_blueprint.npz:
+#   histories: (H, max_len) int8 abstract action ids, padded with -1
+#   strategy:  (H, num_actions, 1326) float16, action probabilities per hand (0 = not in tree)
+#   fractions: the BetAbstraction it was solved for
+# Row lookup is a dict on the history tuple, then strategy[row, :, hand] is the policy.
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+BLUEPRINT_PATH = os.path.join(DATA_DIR, 'preflop_blueprint.npz')
+
+
+def build_equity_matrix(samples=300, seed=0, chunk=500, verbose=True):
+    """
+    (1326, 1326) float32 all-in equity of hand h vs hand o over random boards (ties half),
+    0.5 where they share a card. Pairs equal up to a suit permutation are one Monte Carlo
+    estimate; E[o, h] = 1 - E[h, o].
+    """
+    rng = np.random.default_rng(seed)
+    overlap = (CARD_MASK.astype(np.int32) @ CARD_MASK.T.astype(np.int32)) > 0
+    h, o = np.nonzero(np.triu(~overlap, 1))
+
+    # Canonical ordered pair: the smallest (perm(h), perm(o)) over all suit permutations
+    key = h * NUM_HANDS + o
+    for p in range(1, len(HAND_PERM)):
+        key = np.minimum(key, HAND_PERM[p, h] * NUM_HANDS + HAND_PERM[p, o])
+    classes, inverse = np.unique(key, return_inverse=True)
+    if verbose:
+        print(f"{len(h)} hand pairs, {len(classes)} up to suits, {samples} boards each")
+
+    eq = np.empty(len(classes))
+    for start in range(0, len(classes), chunk):
+        reps = classes[start:start + chunk]
+        mine = HAND_CARDS[reps // NUM_HANDS]
+        opp = HAND_CARDS[reps % NUM_HANDS]
+        n = len(reps)
+        # 5 random board cards per sample from the 48 not held: used cards sort last
+        keys = rng.random((n, samples, NUM_CARDS))
+        used = np.concatenate([mine, opp], axis=1)
+        np.put_along_axis(keys, np.broadcast_to(used[:, None, :], (n, samples, 4)), 2.0, axis=2)
+        board = np.argpartition(keys, 5, axis=2)[:, :, :5]
+        s0 = evaluate_batch(np.concatenate([np.broadcast_to(mine[:, None], (n, samples, 2)), board], axis=2).reshape(-1, 7))
+        s1 = evaluate_batch(np.concatenate([np.broadcast_to(opp[:, None], (n, samples, 2)), board], axis=2).reshape(-1, 7))
+        win = ((s0 < s1) + 0.5 * (s0 == s1)).reshape(n, samples)
+        eq[start:start + n] = win.mean(axis=1)
+        if verbose and (start // chunk) % 20 == 0:
+            print(f"  {start + n}/{len(classes)} classes")
+
+    E = np.full((NUM_HANDS, NUM_HANDS), 0.5, dtype=np.float32)
+    E[h, o] = eq[inverse]
+    E[o, h] = 1.0 - eq[inverse]
+    return E
+
+
+class PreflopBlueprintSolver(NLHECFRSolver):
+    """
+    NLHECFRSolver whose leaves (flop reached, or all-in called) are valued with an equity
+    matrix: cfv[h] = stake * sum over o of r_opp(o) * (2 E[h, o] - 1). Overlapping pairs
+    have E = 0.5, so card removal comes for free.
+    """
+    def __init__(self, equity_matrix, iterations=1000, max_raises=4):
+        super().__init__(None, iterations=iterations, max_raises=max_raises)
+        self.payoff = (2.0 * np.asarray(equity_matrix, dtype=np.float64) - 1.0).T
+
+    def _leaf_values(self, reach, values):
+        if not self.leaves:
+            return
+        R = np.array([reach[i][1 - p] for i in self.leaves for p in (0, 1)])
+        stakes = np.repeat([self.nodes[i].contrib[0] for i in self.leaves], 2)
+        v = stakes[:, None] * (R @ self.payoff)
+        for k, i in enumerate(self.leaves):
+            values[i] = (v[2 * k], v[2 * k + 1])
+
+
+def solve_blueprint(solver, bet_abstraction=DEFAULT_BET_ABSTRACTION):
+    """
+    Solves the preflop tree from the first decision with uniform ranges and returns the
+    arrays stored in preflop_blueprint.npz.
+    """
+    state = NLHEState(bet_abstraction)
+    uniform = np.full(NUM_HANDS, 1.0 / NUM_HANDS)
+    solver.solve(state, uniform, uniform, [], compute_values=False)
+
+    histories, rows = [], []
+    for i in solver.decisions:
+        node = solver.nodes[i]
+        full = np.zeros((bet_abstraction.num_actions, NUM_HANDS), dtype=np.float16)
+        full[node.actions] = solver.average_strategy(i)
+        histories.append(node.history)
+        rows.append(full)
+    max_len = max(len(h) for h in histories)
+    padded = np.full((len(histories), max_len), -1, dtype=np.int8)
+    for k, h in enumerate(histories):
+        padded[k, :len(h)] = h
+    return {'histories': padded, 'strategy': np.stack(rows),
+            'fractions': np.array(bet_abstraction.fractions, dtype=np.float64),
+            'iterations': solver.iterations_run, 'max_raises': solver.max_raises}
+
+
+class PreflopBlueprint:
+    """
+    Lookup side of the blueprint. strategy(history, legal_actions) gives the same
+    {action: (1326,)} dict the search returns, or None for histories outside the table
+    (more raises than it was solved for), where the caller searches as usual.
+    """
+    def __init__(self, path=BLUEPRINT_PATH):
+        data = np.load(path)
+        self.fractions = tuple(float(f) for f in data['fractions'])
+        self.table = data['strategy']
+        self.ids = {tuple(int(a) for a in row if a >= 0): k for k, row in enumerate(data['histories'])}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def matches(self, bet_abstraction):
+        return tuple(bet_abstraction.fractions) == self.fractions
+
+    def history_id(self, history):
+        return self.ids.get(tuple(history))
+
+    def strategy(self, history, legal_actions):
+        k = self.history_id(history)
+        if k is None:
+            return None
+        # Actual stacks can make the legal set differ a little from the solved tree's:
+        # renormalize over what's legal, uniform for hands with nothing left
+        out = {a: self.table[k, a].astype(np.float32) for a in legal_actions}
+        total = np.sum(list(out.values()), axis=0)
+        none = total <= 0
+        total[none] = 1.0
+        return {a: np.where(none, 1.0 / len(out), v / total).astype(np.float32) for a, v in out.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Solve the preflop blueprint table')
+    parser.add_argument('--iterations', type=int, default=5000)
+    parser.add_argument('--max-raises', type=int, default=6)
+    parser.add_argument('--fractions', type=float, nargs='+', default=list(DEFAULT_BET_ABSTRACTION.fractions),
+                        help='BetAbstraction pot fractions (must match the agent)')
+    parser.add_argument('--equity-samples', type=int, default=300, help='Boards per hand pair for the equity matrix')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', type=str, default=BLUEPRINT_PATH)
+    args = parser.parse_args()
+
+    start = time.time()
+    E = build_equity_matrix(args.equity_samples, args.seed)
+    print(f"Equity matrix in {time.time() - start:.1f}s")
+
+    start = time.time()
+    solver = PreflopBlueprintSolver(E, args.iterations, args.max_raises)
+    data = solve_blueprint(solver, BetAbstraction(args.fractions))
+    print(f"Solved {len(data['histories'])} preflop histories ({len(solver.nodes)} nodes) "
+          f"in {time.time() - start:.1f}s, {solver.iterations_run} iterations")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    np.savez_compressed(args.out, **data)
+    print(f"Wrote {args.out} ({os.path.getsize(args.out) / 1024:.0f} KB)")
+
+    blueprint = PreflopBlueprint(args.out)
+    root = blueprint.strategy([], NLHEState(BetAbstraction(args.fractions)).legal_actions())
+    print("SB opening frequencies (combo-weighted): " +
+          ", ".join(f"{a}: {float(v.mean()):.2f}" for a, v in root.items()))
+
+
+if __name__ == '__main__':
+    main()
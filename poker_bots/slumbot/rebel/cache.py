@@ -0,0 +1,195 @@
+import hashlib
+import math
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .chance import CARD_PERM, HAND_PERM, INVERSE_PERM
+from .hands import CARD_INDEX
+
+# Transposition cache of solved subgames, so a public state the agent has already solved
+# (preflop and early flop spots repeat all the time) is a lookup instead of a search.
+#
+# The key is a canonical form of the public state:
+#   - abstract action history (NLHEState.history)
+#   - pot and both stacks, bucketed on a log scale (pot_step: 5% buckets by default), since
+#     exact bet sizes get mapped to the abstraction anyway
+#   - board up to suit isomorphism: the board is relabelled by the suit permutation that
+#     makes it smallest, and the ranges with it. Several permutations tie whenever a suit
+#     is missing from the board (every flop and turn), so among those the one making the
+#     quantized ranges smallest wins, which makes the key the same for every suit relabelling
+#   - a fingerprint of both (relabelled) ranges: each combo's mass relative to the range's
+#     max, quantized to range_levels levels, hashed. Near-identical ranges share a key.
+#   - the solver settings (settings_fingerprint: bet abstraction, value net weights,
+#     iterations, time budget), since a strategy's action ids only mean anything under the
+#     bet abstraction it was solved with. Agents with other settings just never hit each
+#     other's entries, in memory or in a saved file.
+# Strategies are stored in the canonical suit labelling (float16) and relabelled back on
+# lookup, so e.g. a flop of spades and one of hearts with the same ranks share an entry.
+#
+# Bounded LRU (OrderedDict, like CardAbstraction's bucket cache), thread-safe so concurrent
+# eval sessions can share one instance, with save() / load() to keep it between sessions.
+
+FORMAT_VERSION = 2
+
+
+def canonical_board_perms(board):
+    """
+    Suit permutation ids (into chance.SUIT_PERMS) mapping board to its canonical form: the
+    smallest sorted tuple of card indices over all relabellings. More than one whenever the
+    board leaves a suit out.
+    """
+    b = np.array([CARD_INDEX[c] for c in board], dtype=np.int64)
+    images = [tuple(row) for row in np.sort(CARD_PERM[:, b], axis=1)]
+    best = min(images)
+    return [p for p, image in enumerate(images) if image == best]
+
+
+def quantize_range(r, levels=16):
+    """
+    (1326,) uint8: each combo's mass relative to the range's max, in `levels` levels.
+    Combos with no mass stay distinct from combos that round down to 0.
+    """
+    r = np.asarray(r, dtype=np.float64)
+    top = r.max()
+    if top <= 0:
+        return np.zeros(len(r), dtype=np.uint8)
+    return np.ceil(r / top * levels).astype(np.uint8)
+
+
+def model_fingerprint(model):
+    """
+    Hash of a torch module's weights, so caches only mix strategies from the same value net.
+    """
+    h = hashlib.blake2b(digest_size=12)
+    for name, t in sorted(model.state_dict().items()):
+        h.update(name.encode())
+        h.update(t.detach().cpu().numpy().tobytes())
+    return h.hexdigest()
+
+
+def settings_fingerprint(**settings):
+    """
+    Short hash of solver settings (plain values: numbers, strings, tuples) for
+    SubgameCache.get / put.
+    """
+    return hashlib.blake2b(repr(sorted(settings.items())).encode(), digest_size=8).hexdigest()
+
+
+def _log_bucket(x, step):
+    return int(round(math.log(max(float(x), 1.0)) / math.log1p(step)))
+
+
+class SubgameCache:
+    """
+    Bounded LRU of root strategies {action: (1326,)} by canonical public state.
+    get() / put() take the same arguments as the search (ranges of the player to act and
+    the opponent, board, pot, stacks, history), plus the solver's settings_fingerprint.
+    path: file to load from now and save() to.
+    """
+    def __init__(self, capacity=20000, path=None, range_levels=16, pot_step=0.05):
+        self.capacity = capacity
+        self.path = path
+        self.range_levels = range_levels
+        self.pot_step = pot_step
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def key(self, r0, r1, board, pot, stacks, history, settings=''):
+        """
+        (key, perm): the canonical key and the suit permutation id taking this board to
+        the canonical one. settings: settings_fingerprint of the solver.
+        """
+        q0 = quantize_range(r0, self.range_levels)
+        q1 = quantize_range(r1, self.range_levels)
+        # Relabel ranges into the canonical suits: rc[perm(h)] = r[h]. Among the perms that
+        # minimize the board, take the one whose relabelled ranges are smallest
+        best = None
+        for p in canonical_board_perms(board):
+            to_canon = HAND_PERM[INVERSE_PERM[p]]
+            image = (q0[to_canon].tobytes(), q1[to_canon].tobytes())
+            if best is None or image < best[0]:
+                best = (image, p)
+        (b0, b1), perm = best
+        fp0 = hashlib.blake2b(b0, digest_size=12).hexdigest()
+        fp1 = hashlib.blake2b(b1, digest_size=12).hexdigest()
+        canon_board = tuple(sorted(CARD_PERM[perm, [CARD_INDEX[c] for c in board]].tolist()))
+        money = (_log_bucket(pot, self.pot_step),) + tuple(_log_bucket(s, self.pot_step) for s in stacks)
+        return (settings, tuple(history), canon_board, money, fp0, fp1), perm
+
+    def get(self, r0, r1, board, pot, stacks, history, settings=''):
+        """
+        Cached strategy {action: (1326,) float32} in this board's suit labelling, or None.
+        """
+        key, perm = self.key(r0, r1, board, pot, stacks, history, settings)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Stored canonically: s[h] = stored[perm(h)]
+        from_canon = HAND_PERM[perm]
+        return {a: v[from_canon].astype(np.float32) for a, v in entry.items()}
+
+    def put(self, r0, r1, board, pot, stacks, history, strategy, settings=''):
+        key, perm = self.key(r0, r1, board, pot, stacks, history, settings)
+        to_canon = HAND_PERM[INVERSE_PERM[perm]]
+        entry = {a: np.asarray(v)[to_canon].astype(np.float16) for a, v in strategy.items()}
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'size': len(self._entries), 'capacity': self.capacity, 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0, 'evictions': self.evictions}
+
+    def save(self, path=None):
+        """
+        Writes the entries (oldest first) to path (default: the one given at construction).
+        """
+        path = path or self.path
+        if path is None:
+            raise ValueError("No path to save the subgame cache to")
+        with self._lock:
+            data = {'version': FORMAT_VERSION, 'range_levels': self.range_levels, 'pot_step': self.pot_step,
+                    'entries': list(self._entries.items())}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def load(self, path):
+        """
+        Adds the entries saved at path. Files written with other key settings are ignored
+        (their keys would never match).
+        """
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        if (data.get('version') != FORMAT_VERSION or data.get('range_levels') != self.range_levels
+                or data.get('pot_step') != self.pot_step):
+            print(f"Ignoring subgame cache {path}: saved with different settings")
+            return
+        with self._lock:
+            for key, entry in data['entries'][-self.capacity:]:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
@@ -0,0 +1,195 @@
+import itertools
+from math import comb
+
+import numpy as np
+import torch
+
+from .features import get_nlhe_features_batch
+from .hands import DECK, CARD_INDEX, CARD_MASK, HAND_CARDS, HAND_INDEX, NUM_CARDS, NUM_HANDS, blocked_mask
+
+# Chance nodes: dealing the next street's card(s).
+#
+# Every child board is evaluated in one batch (one value net forward pass for all of them),
+# and children that are the same up to a suit permutation are only evaluated once. A suit
+# permutation pi can be used when it maps the board onto itself and leaves both ranges
+# unchanged; then the child dealt pi(c) has the values of the child dealt c with the hands
+# relabelled by pi. Only suits the board doesn't pin down can be swapped: with suit-symmetric
+# ranges a monotone turn has 22 distinct rivers instead of 48, and preflop 1755 flops instead
+# of 22100; a rainbow flop gets nothing. Ranges that aren't symmetric (the usual case in play)
+# just mean every child is evaluated.
+#
+# Values are counterfactual (times the opponent's live reach), like the CFR solver's. With
+# k cards dealt from the N unseen cards, averaging over (my hand, opp hand, cards) gives
+#   cfv[h] = sum over c not touching h of cfv_c[h] / C(N - 4, k)
+# where cfv_c uses the opponent range with c's combos removed.
+
+SUIT_PERMS = np.array(list(itertools.permutations(range(4))), dtype=np.int64) # (24, 4)
+# CARD_PERM[p, c] = card c with its suit relabelled by permutation p
+CARD_PERM = (np.arange(NUM_CARDS)[None, :] // 4) * 4 + SUIT_PERMS[:, np.arange(NUM_CARDS) % 4]
+# HAND_PERM[p, h] = hand h with both cards relabelled
+HAND_PERM = HAND_INDEX[CARD_PERM[:, HAND_CARDS[:, 0]], CARD_PERM[:, HAND_CARDS[:, 1]]]
+INVERSE_PERM = np.array([np.flatnonzero((SUIT_PERMS == np.argsort(p)).all(axis=1))[0] for p in SUIT_PERMS])
+
+
+def board_symmetries(board, ranges=(), tol=1e-9):
+    """
+    Ids (into SUIT_PERMS) of the suit permutations that map the board onto itself and leave
+    every range (1326,) unchanged up to tol (relative to the range's max). Always has the identity.
+    """
+    b = np.array(sorted(CARD_INDEX[c] for c in board), dtype=np.int64)
+    out = []
+    for p in range(len(SUIT_PERMS)):
+        if len(b) and not np.array_equal(np.sort(CARD_PERM[p, b]), b):
+            continue
+        if all(np.abs(r[HAND_PERM[p]] - r).max() <= tol * max(np.abs(r).max(), 1e-30) for r in ranges):
+            out.append(p)
+    return out
+
+
+class ChanceExpansion:
+    """
+    The children of one chance node: deal num_cards (1 for turn / river, 3 for the flop)
+    to the board, every combination or max_children sampled ones.
+      children:  canonical card tuples (treys ints), one per class of symmetric deals
+      boards:    board + child for each of them, what the value net gets
+    combine() turns per-child counterfactual values back into the parent's.
+    """
+    def __init__(self, board, num_cards=1, ranges=(), max_children=None, rng=None):
+        self.board = list(board)
+        self.num_cards = num_cards
+        rng = rng if rng is not None else np.random.default_rng()
+        used = set(CARD_INDEX[c] for c in self.board)
+        rest = [c for c in range(NUM_CARDS) if c not in used]
+        unseen = len(rest)
+
+        total = comb(unseen, num_cards)
+        if max_children is not None and max_children < total:
+            # Sample distinct deals
+            deals = set()
+            while len(deals) < max_children:
+                deals.add(tuple(sorted(rng.choice(rest, num_cards, replace=False).tolist())))
+            deals = sorted(deals)
+        else:
+            deals = list(itertools.combinations(rest, num_cards))
+
+        # Group deals by canonical form under the usable symmetries
+        perms = board_symmetries(self.board, [np.asarray(r, dtype=np.float64) for r in ranges])
+        classes = {}
+        for deal in deals:
+            d = np.array(deal, dtype=np.int64)
+            images = [tuple(sorted(CARD_PERM[p, d].tolist())) for p in perms]
+            k = min(range(len(perms)), key=lambda i: images[i])
+            # perms[k] maps deal -> canonical, so its inverse maps canonical -> deal
+            classes.setdefault(images[k], []).append(INVERSE_PERM[perms[k]])
+
+        canon = sorted(classes)
+        self.children = [tuple(DECK[c] for c in cards) for cards in canon]
+        self.boards = [self.board + list(cards) for cards in self.children]
+        self.num_deals = len(deals)
+        # One row per deal: which child evaluation it reuses and how hands get relabelled
+        self.member_child = np.array([i for i, cards in enumerate(canon) for _ in classes[cards]], dtype=np.int64)
+        member_perm = np.array([p for cards in canon for p in classes[cards]], dtype=np.int64)
+        # Deal = perm(canonical), so the deal's value of hand x is the canonical's at perm^-1(x)
+        self.member_hands = HAND_PERM[INVERSE_PERM[member_perm]] # (M, 1326)
+        self.child_blocked = np.array([CARD_MASK[:, [CARD_INDEX[c] for c in cards]].any(axis=1)
+                                       for cards in self.children]) # (C, 1326)
+        member_blocked = self.child_blocked[self.member_child] # canonical's blocked hands ...
+        self.member_live = ~np.take_along_axis(member_blocked, self.member_hands, axis=1) # ... relabelled
+
+        # Hands that survive each deal, and the C(N-2, k) / C(N-4, k) scaling from the mean
+        count = self.member_live.sum(axis=0).astype(np.float64)
+        scale = comb(unseen - 2, num_cards) / comb(unseen - 4, num_cards) if unseen - 4 >= num_cards else 0.0
+        self.scale = np.divide(scale, count, out=np.zeros(NUM_HANDS), where=count > 0)
+        self.scale[blocked_mask(self.board)] = 0.0
+
+    def __len__(self):
+        return len(self.children)
+
+    def child_ranges(self, r):
+        """
+        (..., 1326) ranges -> (C, ..., 1326): each child's copy with its dealt combos removed.
+        """
+        r = np.asarray(r, dtype=np.float64)
+        live = ~self.child_blocked
+        return r[None, ...] * live.reshape((len(self),) + (1,) * (r.ndim - 1) + (NUM_HANDS,))
+
+    def combine(self, child_cfv):
+        """
+        (C, ..., 1326) counterfactual values per child -> (..., 1326) at the chance node.
+        """
+        x = np.asarray(child_cfv, dtype=np.float64)[self.member_child] # (M, ..., 1326)
+        idx = self.member_hands.reshape((len(self.member_hands),) + (1,) * (x.ndim - 2) + (NUM_HANDS,))
+        x = np.take_along_axis(x, np.broadcast_to(idx, x.shape), axis=-1)
+        live = self.member_live.reshape(idx.shape)
+        return (x * live).sum(axis=0) * self.scale
+
+
+def live_mass_children(R, expansion):
+    """
+    Opponent live mass on every child board: R (C, ..., 1326) child ranges (already without
+    the child's combos) -> same shape, 0 for hands blocked by the board or the child.
+    """
+    R = np.asarray(R, dtype=np.float64) * ~blocked_mask(expansion.board)
+    per_card = R @ CARD_MASK.astype(np.float64)
+    live = R.sum(axis=-1, keepdims=True) - per_card[..., HAND_CARDS[:, 0]] - per_card[..., HAND_CARDS[:, 1]] + R
+    live = live * ~expansion.child_blocked.reshape((len(expansion),) + (1,) * (R.ndim - 2) + (NUM_HANDS,))
+    live[..., blocked_mask(expansion.board)] = 0.0
+    return live
+
+
+def evaluate_children(value_net, expansion, R0, R1, pot, stacks, history, device='cpu', abstraction=None):
+    """
+    Value net on every (range pair, child board) in one forward pass.
+    R0, R1: (L, 1326) reach of the two players at L states that share this chance node's
+    board (e.g. the street-end leaves of a subgame). Returns (L, 2, 1326) counterfactual
+    values at the chance node.
+    pot / stacks / history: one per state (lists of length L).
+    """
+    L = len(R0)
+    C = len(expansion)
+    CR0 = expansion.child_ranges(R0) # (C, L, 1326)
+    CR1 = expansion.child_ranges(R1)
+
+    # Normalize ranges for NN
+    def normalize(x):
+        s = x.sum(axis=-1, keepdims=True)
+        return np.divide(x, s, out=np.zeros_like(x), where=s > 1e-12)
+    N0, N1 = normalize(CR0), normalize(CR1)
+
+    feats = []
+    for l in range(L):
+        a, b = N0[:, l], N1[:, l]
+        if abstraction is not None:
+            a = np.stack([abstraction.project(a[i], expansion.boards[i]) for i in range(C)])
+            b = np.stack([abstraction.project(b[i], expansion.boards[i]) for i in range(C)])
+        feats.append(get_nlhe_features_batch(a, b, expansion.boards, pot[l], stacks[l], history[l]))
+    with torch.no_grad():
+        out = value_net(torch.cat(feats).to(device)).cpu().numpy().astype(np.float64)
+    out = out.reshape(L, C, 2, -1)
+    if abstraction is not None:
+        out = np.stack([np.stack([abstraction.lift(out[l, i], expansion.boards[i]) for i in range(C)])
+                        for l in range(L)])
+    V = out.transpose(1, 0, 2, 3) # (C, L, 2, 1326)
+
+    # Per-hand values -> counterfactual with each child's live opponent mass
+    live = np.stack([live_mass_children(CR1, expansion), live_mass_children(CR0, expansion)], axis=2)
+    return expansion.combine(V * live) # (L, 2, 1326)
+
+
+def expand_values(value_net, r0, r1, board, pot, stacks, history, device='cpu', abstraction=None,
+                  max_children=None, rng=None):
+    """
+    Per-hand values {0: (1326,), 1: (1326,)} of one public state at the start of the next
+    street, averaged over every next card (3 for the flop) with one batched net call.
+    """
+    num_cards = 3 if len(board) == 0 else 1
+    r0 = np.asarray(r0, dtype=np.float64) * ~blocked_mask(board)
+    r1 = np.asarray(r1, dtype=np.float64) * ~blocked_mask(board)
+    expansion = ChanceExpansion(board, num_cards, (r0, r1), max_children, rng)
+    cfv = evaluate_children(value_net, expansion, r0[None], r1[None], [pot], [stacks], [history], device, abstraction)[0]
+    out = {}
+    for p, opp in ((0, r1), (1, r0)):
+        per_card = CARD_MASK.T.astype(np.float64) @ opp
+        live = opp.sum() - per_card[HAND_CARDS[:, 0]] - per_card[HAND_CARDS[:, 1]] + opp
+        out[p] = np.divide(cfv[p], live, out=np.zeros(NUM_HANDS), where=live > 1e-12).astype(np.float32)
+    return out
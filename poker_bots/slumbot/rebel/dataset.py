@@ -0,0 +1,200 @@
+import json
+import os
+import random
+import time
+import uuid
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, IterableDataset, get_worker_info
+
+# On-disk self-play data for value net training.
+#
+# A data directory holds fixed-size shards, each a pair of float16 .npy files
+# (<name>.features.npy (n, feature_dim), <name>.targets.npy (n, target_dim)), and index.jsonl
+# with one line per finished shard:
+#   {"shard": name, "count": n, "feature_dim": ..., "target_dim": ...}
+# Shard files are written under a temporary name and renamed, and only then is the index line
+# appended, so a reader never sees a half-written shard. Appending one short line is atomic,
+# so several generator processes can share a directory (each ShardWriter names its shards
+# with its own prefix), and a trainer can read it while they run.
+#
+# float16 keeps a 1326-combo sample at ~11KB. Values are chips, and float16's 11-bit mantissa
+# is plenty next to the noise in self-play targets.
+
+INDEX_NAME = 'index.jsonl'
+DTYPE = np.float16
+
+
+def read_index(data_dir):
+    """
+    List of index entries (dicts) for the finished shards in data_dir, [] if there are none.
+    """
+    path = os.path.join(data_dir, INDEX_NAME)
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        # A writer could be mid-append: skip a trailing partial line
+        return [json.loads(line) for line in f if line.endswith('\n')]
+
+
+def shard_paths(data_dir, name):
+    return (os.path.join(data_dir, f'{name}.features.npy'),
+            os.path.join(data_dir, f'{name}.targets.npy'))
+
+
+class ShardWriter:
+    """
+    Buffers samples in preallocated float16 arrays and writes a shard every shard_size
+    samples. close() (or leaving a with block) writes the last, partial one.
+    Dims are taken from the first sample.
+    """
+    def __init__(self, data_dir, shard_size=4096, prefix=None):
+        self.data_dir = data_dir
+        self.shard_size = shard_size
+        self.prefix = prefix or uuid.uuid4().hex[:8]
+        os.makedirs(data_dir, exist_ok=True)
+        self.features = None
+        self.targets = None
+        self.count = 0 # samples in the current buffer
+        self.shards_written = 0
+        self.samples_written = 0
+
+    def add(self, features, targets):
+        features = _to_numpy(features)
+        targets = _to_numpy(targets)
+        if self.features is None:
+            self.features = np.empty((self.shard_size, len(features)), dtype=DTYPE)
+            self.targets = np.empty((self.shard_size, len(targets)), dtype=DTYPE)
+        self.features[self.count] = features
+        self.targets[self.count] = targets
+        self.count += 1
+        if self.count == self.shard_size:
+            self.flush()
+
+    def flush(self):
+        if self.count == 0:
+            return
+        name = f'{self.prefix}-{self.shards_written:06d}'
+        for path, arr in zip(shard_paths(self.data_dir, name), (self.features, self.targets)):
+            tmp = path + '.tmp'
+            with open(tmp, 'wb') as f:
+                np.save(f, arr[:self.count])
+            os.replace(tmp, path)
+        entry = {'shard': name, 'count': self.count,
+                 'feature_dim': self.features.shape[1], 'target_dim': self.targets.shape[1]}
+        with open(os.path.join(self.data_dir, INDEX_NAME), 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+        self.shards_written += 1
+        self.samples_written += self.count
+        self.count = 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _to_numpy(x):
+    if isinstance(x, torch.Tensor):
+        x = x.detach().cpu().numpy()
+    return np.asarray(x)
+
+
+class ShardDataset(IterableDataset):
+    """
+    Streams (features, targets) float32 tensors out of a shard directory in shuffled order,
+    without loading it into memory:
+      - shards are split between DataLoader workers, and visited in a random order
+      - each worker keeps open_shards shards memory-mapped at once and reads them in
+        random blocks of block_size rows, interleaved
+      - rows go through a shuffle buffer of shuffle_buffer samples before being yielded
+    loop=True re-reads the index after each pass (picking up shards written since) and never
+    ends, waiting for a first shard if the directory is still empty. That is the mode for
+    training next to a running generator.
+    """
+    def __init__(self, data_dir, shuffle_buffer=8192, open_shards=4, block_size=256, loop=False, seed=None):
+        self.data_dir = data_dir
+        self.shuffle_buffer = shuffle_buffer
+        self.open_shards = open_shards
+        self.block_size = block_size
+        self.loop = loop
+        self.seed = seed
+
+    def _shards(self, worker, num_workers):
+        entries = read_index(self.data_dir)
+        return [e for k, e in enumerate(entries) if k % num_workers == worker]
+
+    def _blocks(self, entry, rng):
+        # (features, targets) blocks of one shard, in random order
+        feat_path, targ_path = shard_paths(self.data_dir, entry['shard'])
+        features = np.load(feat_path, mmap_mode='r')
+        targets = np.load(targ_path, mmap_mode='r')
+        starts = list(range(0, entry['count'], self.block_size))
+        rng.shuffle(starts)
+        for s in starts:
+            e = s + self.block_size
+            yield np.asarray(features[s:e], dtype=np.float32), np.asarray(targets[s:e], dtype=np.float32)
+
+    def _rows(self, entries, rng):
+        # Interleave blocks from up to open_shards shards at a time
+        pending = list(entries)
+        rng.shuffle(pending)
+        active = []
+        while pending or active:
+            while pending and len(active) < self.open_shards:
+                active.append(self._blocks(pending.pop(), rng))
+            k = rng.randrange(len(active))
+            block = next(active[k], None)
+            if block is None:
+                active.pop(k)
+                continue
+            yield from zip(*block)
+
+    def __iter__(self):
+        info = get_worker_info()
+        worker, num_workers = (info.id, info.num_workers) if info is not None else (0, 1)
+        seed = self.seed if self.seed is not None else random.randrange(1 << 30)
+        rng = random.Random(seed * 1000 + worker)
+
+        buffer = []
+        while True:
+            entries = self._shards(worker, num_workers)
+            if not entries and self.loop:
+                time.sleep(1.0) # generator hasn't finished a shard yet
+                continue
+            for features, targets in self._rows(entries, rng):
+                if len(buffer) < self.shuffle_buffer:
+                    buffer.append((features, targets))
+                    continue
+                # Swap a random buffered sample out for the new one
+                k = rng.randrange(len(buffer))
+                out, buffer[k] = buffer[k], (features, targets)
+                yield torch.from_numpy(out[0]), torch.from_numpy(out[1])
+            if not self.loop:
+                break
+        rng.shuffle(buffer)
+        for features, targets in buffer:
+            yield torch.from_numpy(features), torch.from_numpy(targets)
+
+
+def make_loader(data_dir, batch_size=32, num_workers=2, prefetch_factor=4, loop=True, **kwargs):
+    """
+    DataLoader over a ShardDataset: num_workers processes read shards in parallel, each
+    keeping prefetch_factor batches ready. kwargs go to ShardDataset.
+    """
+    dataset = ShardDataset(data_dir, loop=loop, **kwargs)
+    extra = {'prefetch_factor': prefetch_factor, 'persistent_workers': True} if num_workers > 0 else {}
+    return DataLoader(dataset, batch_size=batch_size, num_workers=num_workers,
+                      pin_memory=torch.cuda.is_available(), **extra)
+
+
+def dataset_stats(data_dir):
+    entries = read_index(data_dir)
+    samples = sum(e['count'] for e in entries)
+    size = sum(os.path.getsize(p) for e in entries for p in shard_paths(data_dir, e['shard']))
+    return {'shards': len(entries), 'samples': samples, 'bytes': size}
@@ -0,0 +1,231 @@
+import argparse
+import itertools
+import os
+import time
+
+import numpy as np
+from treys import Evaluator
+
+from .hands import CARD_INDEX, DECK, NUM_CARDS
+
+# Lookup-table hand evaluator, batch-friendly, giving exactly treys' ranks (1 = royal flush ...
+# 7462 = 7-5-4-3-2 offsuit, lower is better) for 5, 6 and 7 card hands.
+#
+# Cards are indices 0..51 (rank * 4 + suit, see hands.py). Two tables per hand size:
+#   - non-flush: best hand for a rank multiset (counts per rank, each <= 4). The multiset is
+#     perfect-hashed to its ordinal among all multisets of that size (stars and bars),
+#     so lookup is 13 table adds and one gather, no search.
+#   - flush: best flush / straight flush for a 13-bit mask of the suited ranks.
+# A hand's rank is min(flush, non-flush) when some suit has 5+ cards, else the non-flush one.
+#
+# The tables are built once from treys itself (a few seconds) and saved as .npy under data/,
+# then memory-mapped on load.
+
+NUM_RANKS = 13
+MAX_COUNT = 4
+HAND_SIZES = (5, 6, 7)
+WORST_RANK = 7462
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+FLUSH_PATH = os.path.join(DATA_DIR, 'eval_flush.npy')
+def _rank_path(n): return os.path.join(DATA_DIR, f'eval_ranks{n}.npy')
+
+
+def _num_multisets():
+    # N[k, m] = ways to put m cards on k ranks with at most 4 per rank
+    N = np.zeros((NUM_RANKS + 1, 8), dtype=np.int64)
+    N[0, 0] = 1
+    for k in range(1, NUM_RANKS + 1):
+        for m in range(8):
+            N[k, m] = sum(N[k - 1, m - c] for c in range(min(m, MAX_COUNT) + 1))
+    return N
+
+_N = _num_multisets()
+
+# OFFSET[r, m, c]: how many multisets come before one that puts c cards on rank r when m cards
+# are still left for ranks r..12. Hash = sum over ranks, the ordinal in lexicographic order.
+_OFFSET = np.zeros((NUM_RANKS, 8, MAX_COUNT + 1), dtype=np.int64)
+for _r in range(NUM_RANKS):
+    for _m in range(8):
+        for _c in range(1, MAX_COUNT + 1):
+            _OFFSET[_r, _m, _c] = _OFFSET[_r, _m, _c - 1] + (_N[NUM_RANKS - 1 - _r, _m - _c + 1] if _m - _c + 1 >= 0 else 0)
+
+
+def rank_hash(counts):
+    """
+    counts: (B, 13) cards per rank, each row summing to the same n. Returns (B,) int64 in
+    [0, number of multisets of size n).
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    left = counts.sum(axis=1, keepdims=True) - np.cumsum(counts, axis=1) + counts # cards for ranks r..12
+    return _OFFSET[np.arange(NUM_RANKS), left, counts].sum(axis=1)
+
+
+def _multisets(n):
+    # every count vector of size n, in hash order (lexicographic)
+    def rec(r, left):
+        if r == NUM_RANKS - 1:
+            if left <= MAX_COUNT:
+                yield (left,)
+            return
+        for c in range(min(left, MAX_COUNT) + 1):
+            for rest in rec(r + 1, left - c):
+                yield (c,) + rest
+    return rec(0, n)
+
+
+def build_rank_table(n, evaluator=None):
+    """
+    treys rank of the best non-flush hand for every rank multiset of n cards.
+    """
+    evaluator = evaluator or Evaluator()
+    table = np.zeros(_N[NUM_RANKS, n], dtype=np.int16)
+    for i, counts in enumerate(_multisets(n)):
+        # Deal suits round-robin: each rank gets distinct suits and no suit gets 5 cards
+        cards, s = [], 0
+        for r, c in enumerate(counts):
+            for _ in range(c):
+                cards.append(DECK[r * 4 + s % 4])
+                s += 1
+        table[i] = evaluator.evaluate(cards[:2], cards[2:])
+    assert i == len(table) - 1 and (table > 0).all()
+    return table
+
+
+def build_flush_table(evaluator=None):
+    """
+    treys rank of the best flush / straight flush for every 13-bit rank mask with 5+ bits
+    (0 for masks with fewer bits, those never get looked up).
+    """
+    evaluator = evaluator or Evaluator()
+    table = np.zeros(1 << NUM_RANKS, dtype=np.int16)
+    for n in (5, 6, 7):
+        for ranks in itertools.combinations(range(NUM_RANKS), n):
+            cards = [DECK[r * 4] for r in ranks] # all spades
+            table[sum(1 << r for r in ranks)] = evaluator.evaluate(cards[:2], cards[2:])
+    return table
+
+
+_tables = {}
+
+
+def _load(name, path, build):
+    if name not in _tables:
+        if not os.path.exists(path):
+            os.makedirs(DATA_DIR, exist_ok=True)
+            np.save(path, build())
+        _tables[name] = np.load(path, mmap_mode='r')
+    return _tables[name]
+
+
+def rank_table(n):
+    return _load(('ranks', n), _rank_path(n), lambda: build_rank_table(n))
+
+
+def flush_table():
+    return _load('flush', FLUSH_PATH, build_flush_table)
+
+
+def evaluate_batch(cards):
+    """
+    cards: (B, n) card indices (0..51), n in 5..7, no duplicates within a row.
+    Returns (B,) int16 treys ranks, lower is better.
+    """
+    cards = np.asarray(cards, dtype=np.int64)
+    n = cards.shape[1]
+    if n not in HAND_SIZES:
+        raise ValueError(f"Can only evaluate 5 to 7 cards, got {n}")
+    B = len(cards)
+    ranks = cards >> 2
+    suits = cards & 3
+    rows = np.arange(B)[:, None]
+
+    # Per-row histograms with one flat bincount
+    counts = np.bincount((rows * NUM_RANKS + ranks).ravel(), minlength=B * NUM_RANKS).reshape(B, NUM_RANKS)
+    best = np.asarray(rank_table(n))[rank_hash(counts)]
+
+    suit_counts = np.bincount((rows * 4 + suits).ravel(), minlength=B * 4).reshape(B, 4)
+    flush_suit = suit_counts.argmax(axis=1)
+    has_flush = suit_counts[np.arange(B), flush_suit] >= 5
+    if has_flush.any():
+        # At most one suit can have 5+ of 7 cards; only those rows get the flush lookup
+        f = np.flatnonzero(has_flush)
+        suited = suits[f] == flush_suit[f, None]
+        masks = ((1 << ranks[f]) * suited).sum(axis=1)
+        best[f] = np.minimum(best[f], np.asarray(flush_table())[masks])
+    return best
+
+
+def to_indices(card_ints):
+    """
+    treys card ints (any shape, nested lists ok) -> int64 array of card indices.
+    """
+    arr = np.asarray(card_ints, dtype=np.int64)
+    return _TREYS_TO_INDEX[(arr >> 8) & 0xF, (arr >> 12) & 0xF]
+
+# treys int: rank in bits 8-11, one-hot suit in bits 12-15 (s=1, h=2, d=4, c=8)
+_TREYS_TO_INDEX = np.full((16, 16), -1, dtype=np.int64)
+for _card, _idx in CARD_INDEX.items():
+    _TREYS_TO_INDEX[(_card >> 8) & 0xF, (_card >> 12) & 0xF] = _idx
+
+
+class LUTEvaluator:
+    """
+    Drop-in for treys.Evaluator.evaluate(board, hand) on treys ints, plus batch versions.
+    """
+    def evaluate(self, board, hand):
+        return int(evaluate_batch(to_indices(list(hand) + list(board))[None, :])[0])
+
+    def evaluate_batch(self, cards):
+        return evaluate_batch(cards)
+
+    def evaluate_hands(self, board, hand_cards):
+        """
+        One board (treys ints) against many hands: hand_cards (B, 2) card indices.
+        """
+        board_idx = np.broadcast_to(to_indices(list(board)), (len(hand_cards), len(board)))
+        return evaluate_batch(np.concatenate([np.asarray(hand_cards, dtype=np.int64), board_idx], axis=1))
+
+
+def benchmark(num_hands=1000000, batch=100000, n=7, check=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    # Random n-card hands without replacement: first n of a random permutation of the deck
+    cards = np.argsort(rng.random((num_hands, NUM_CARDS)), axis=1)[:, :n]
+    evaluate_batch(cards[:10]) # load the tables
+
+    start = time.perf_counter()
+    out = np.concatenate([evaluate_batch(cards[i:i + batch]) for i in range(0, num_hands, batch)])
+    elapsed = time.perf_counter() - start
+    print(f"LUT:   {num_hands / elapsed:,.0f} hands/sec ({n} cards, batch {batch})")
+
+    treys = Evaluator()
+    hands = [[DECK[c] for c in row] for row in cards[:check]]
+    start = time.perf_counter()
+    ref = [treys.evaluate(h[:2], h[2:]) for h in hands]
+    elapsed = time.perf_counter() - start
+    print(f"treys: {check / elapsed:,.0f} hands/sec")
+    mismatches = int((np.array(ref) != out[:check]).sum())
+    print(f"Mismatches vs treys on {check} hands: {mismatches}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build / benchmark the lookup-table hand evaluator')
+    parser.add_argument('--build', action='store_true', help='Rebuild the tables from treys')
+    parser.add_argument('--hands', type=int, default=1000000)
+    parser.add_argument('--batch', type=int, default=100000)
+    parser.add_argument('--cards', type=int, default=7, choices=HAND_SIZES)
+    args = parser.parse_args()
+
+    if args.build:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        evaluator = Evaluator()
+        for n in HAND_SIZES:
+            np.save(_rank_path(n), build_rank_table(n, evaluator))
+            print(f"Wrote {_rank_path(n)}")
+        np.save(FLUSH_PATH, build_flush_table(evaluator))
+        print(f"Wrote {FLUSH_PATH}")
+    benchmark(args.hands, args.batch, args.cards)
+
+
+if __name__ == '__main__':
+    main()
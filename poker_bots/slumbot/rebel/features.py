@@ -1,27 +1,17 @@
 import torch
 import numpy as np
-from treys import Card
+from .hands import CARD_INDEX, cards_to_indices
 
 def get_card_index(card_int):
     """
-    Maps treys card int to 0-51 index.
+    Maps treys card int to 0-51 index (rank * 4 + suit), see hands.py.
     """
-    rank = Card.get_rank_int(card_int) # 0-12
-    suit_int = Card.get_suit_int(card_int) # 1, 2, 4, 8
-    
-    # Map suit power of 2 to 0-3
-    if suit_int == 1: suit_idx = 0
-    elif suit_int == 2: suit_idx = 1
-    elif suit_int == 4: suit_idx = 2
-    elif suit_int == 8: suit_idx = 3
-    else: suit_idx = 0 # Should not happen
-    
-    return rank * 4 + suit_idx
+    return CARD_INDEX[card_int]
 
 def get_nlhe_features(r0, r1, board_cards, pot, stacks, history):
     """
     Construct input tensor.
-    r0, r1: (1326,) probabilities
+    r0, r1: (1326,) probabilities, or (num_buckets,) bucket masses in abstraction space
     board_cards: list of ints
     pot: float
     stacks: list of 2 floats
@@ -34,10 +24,8 @@ def get_nlhe_features(r0, r1, board_cards, pot, stacks, history):
     # 2. Board
     # 52-dim one-hot of board cards
     board_vec = torch.zeros(52)
-    for c in board_cards:
-        idx = get_card_index(c)
-        if 0 <= idx < 52:
-            board_vec[idx] = 1.0
+    if len(board_cards) > 0:
+        board_vec[torch.from_numpy(cards_to_indices(board_cards))] = 1.0
         
     # 3. Pot/Stacks
     # Normalize by Big Blind (100)
@@ -52,3 +40,23 @@ def get_nlhe_features(r0, r1, board_cards, pot, stacks, history):
         hist_vec[i] = float(a)
         
     return torch.cat([r0_t, r1_t, board_vec, meta, hist_vec])
+
+def get_nlhe_features_batch(R0, R1, boards, pot, stacks, history):
+    """
+    Features for B states that differ only in ranges and board (e.g. the children of a
+    chance node): R0, R1 (B, n), boards: B lists of treys ints. Same layout as
+    get_nlhe_features, returns (B, 2n + 105).
+    """
+    R0 = torch.as_tensor(np.asarray(R0), dtype=torch.float32)
+    R1 = torch.as_tensor(np.asarray(R1), dtype=torch.float32)
+    B = R0.shape[0]
+    board_vec = torch.zeros(B, 52)
+    rows = [i for i, b in enumerate(boards) for _ in b]
+    if rows:
+        cols = cards_to_indices([c for b in boards for c in b])
+        board_vec[torch.tensor(rows), torch.from_numpy(cols)] = 1.0
+    meta = torch.tensor([pot / 100.0] + [s / 100.0 for s in stacks], dtype=torch.float32).expand(B, 3)
+    hist_vec = torch.zeros(50)
+    for i, a in enumerate(history[-50:]):
+        hist_vec[i] = float(a)
+    return torch.cat([R0, R1, board_vec, meta, hist_vec.expand(B, 50)], dim=1)
@@ -1,5 +1,8 @@
-from treys import Card, Evaluator
+from treys import Card
 import copy
+import numpy as np
+from .hands import HANDS
+from .evaluator import LUTEvaluator
 
 class GameConstants:
     # 0=Preflop, 1=Flop, 2=Turn, 3=River
@@ -13,46 +16,23 @@ class GameConstants:
     STACK_SIZE = 20000
 
 class NLHERules:
-    evaluator = Evaluator()
+    evaluator = LUTEvaluator() # same ranks as treys.Evaluator, table lookups
 
     @staticmethod
-    def get_legal_actions(history, pot, current_bets, stack_sizes):
+    def get_legal_actions(history, pot, current_bets, stack_sizes, abstraction=None):
         """
-        Returns list of abstract actions:
-        0: FOLD
+        Returns list of abstract actions for the player to act (see BetAbstraction):
+        0: FOLD (only when facing a bet)
         1: CHECK/CALL
-        2: MIN_RAISE / POT_FRACTION (simplified)
-        3: ALL_IN
+        2..: pot-fraction raises that fit in the stack and beat the min raise
+        last: ALL_IN
+        current_bets: this street's chips in, [player to act, opponent]
+        stack_sizes: chips behind, [player to act, opponent]
         """
-        # This is a simplification. Real NLHE has continuous action space.
-        # We will abstract to: Fold, Check/Call, Pot-Sized Bet/Raise, All-In.
-        
-        # Determine if we can check
-        # We can check if bets are equal.
-        can_check = (current_bets[0] == current_bets[1])
-        
-        actions = []
-        
-        # Fold is always legal unless we can check?
-        # If we can check, checking is strictly better than folding usually, but fold is legal.
-        # But typically we map Fold->Check if Check is valid.
-        if not can_check:
-            actions.append(0) # Fold
-        
-        actions.append(1) # Check/Call
-        
-        # Bet/Raise
-        # Simplified abstraction: 
-        # - Pot Size Bet (or Raise to Pot)
-        # - All In
-        
-        # Logic to calculate legal bet amounts is complex.
-        # For this prototype, we just allow "Bet" (mapped to Pot Size) and "All-In".
-        
-        actions.append(2) # Pot Bet
-        actions.append(3) # All In
-        
-        return actions
+        state = NLHEState.at_street_start([], pot, stack_sizes, history, abstraction)
+        state.street_contrib = [current_bets[0], current_bets[1]]
+        state.last_bet_size = abs(current_bets[1] - current_bets[0])
+        return state.legal_actions()
 
     @staticmethod
     def get_winner(hand_p0, hand_p1, board):
@@ -61,7 +41,7 @@ class NLHERules:
         board: List of 3, 4, or 5 ints
         """
         # Evaluate
-        # treys.evaluate returns a score (lower is better)
+        # evaluate returns a treys score (lower is better)
         s0 = NLHERules.evaluator.evaluate(board, hand_p0)
         s1 = NLHERules.evaluator.evaluate(board, hand_p1)
         
@@ -84,11 +64,257 @@ class NLHERules:
 
     @staticmethod
     def get_all_hands():
-        # Returns list of all 1326 starting hand combinations (as tuples of 2 ints)
-        deck = [Card.new(r+s) for r in '23456789TJQKA' for s in 'shdc']
-        hands = []
-        for i in range(len(deck)):
-            for j in range(i+1, len(deck)):
-                hands.append((deck[i], deck[j]))
-        return hands
+        # Returns list of all 1326 starting hand combinations (as tuples of 2 ints).
+        # Precomputed once in hands.py and shared; don't modify it.
+        return HANDS
+
+
+
+class BetAbstraction:
+    """
+    Abstract actions: 0 fold, 1 check/call, then one raise per pot fraction, all-in last.
+    The default (1.0,) is the 4-action set the search has always used:
+    0 fold, 1 check/call, 2 pot, 3 all-in.
+    A raise of fraction f goes to: opponent's street bet + f * (pot after calling),
+    at least a min raise, and fractions that would reach all-in are dropped for the all-in.
+    """
+    def __init__(self, fractions=(1.0,)):
+        self.fractions = tuple(fractions)
+        self.num_actions = 3 + len(self.fractions)
+        self.allin_action = self.num_actions - 1
+
+    def bet_to(self, state, action):
+        """
+        Street bet-to (chips, same meaning as Slumbot's bNNN) of raise action 2..allin.
+        """
+        me = state.to_act
+        allin_to = state.street_contrib[me] + state.stacks[me]
+        if action == self.allin_action:
+            return allin_to
+        target = state.street_contrib[1 - me] + int(round(self.fractions[action - 2] * (state.pot + state.to_call)))
+        return min(max(target, state.min_bet_to()), allin_to)
+
+    def legal_actions(self, state):
+        actions = [0, 1] if state.to_call > 0 else [1]
+        if state.can_raise():
+            me = state.to_act
+            allin_to = state.street_contrib[me] + state.stacks[me]
+            last = None
+            for a in range(2, self.allin_action):
+                b = self.bet_to(state, a)
+                if b < allin_to and b != last:
+                    actions.append(a)
+                    last = b
+            actions.append(self.allin_action)
+        return actions
+
+    def nearest(self, state, bet_to):
+        """
+        Legal raise action whose size is closest to an exact bet-to (e.g. the opponent's).
+        """
+        raises = [a for a in self.legal_actions(state) if a >= 2]
+        if not raises:
+            return self.allin_action
+        return min(raises, key=lambda a: abs(self.bet_to(state, a) - bet_to))
+
+
+DEFAULT_BET_ABSTRACTION = BetAbstraction()
+BOARD_CARDS = [0, 3, 4, 5] # board size on each street
+
+
+class NLHEState:
+    """
+    Heads-up NLHE public state with exact chip tracking, same rules as Slumbot
+    (action_parser.ActionParser): blinds 50/100, 20,000 stacks, position 0 = BB, 1 = SB,
+    SB acts first preflop and BB first after.
+
+    apply() / apply_exact() change the state in place and push a small undo record,
+    undo() pops it, so a tree search walks one state object instead of copying.
+    Board cards are dealt by the caller with deal() (also undoable) when a street starts.
+    history holds the abstract action ids (see BetAbstraction), exact bets are mapped to
+    the nearest abstract size.
+    """
+    __slots__ = ('street', 'to_act', 'contrib', 'street_contrib', 'last_bet_size', 'closes_street',
+                 'done', 'folder', 'board', 'history', 'abstraction', '_undo')
+
+    def __init__(self, abstraction=None):
+        self.abstraction = abstraction if abstraction is not None else DEFAULT_BET_ABSTRACTION
+        self.street = GameConstants.STREET_PREFLOP
+        self.to_act = 1
+        self.contrib = [GameConstants.BIG_BLIND, GameConstants.SMALL_BLIND] # whole hand
+        self.street_contrib = [GameConstants.BIG_BLIND, GameConstants.SMALL_BLIND]
+        self.last_bet_size = GameConstants.BIG_BLIND - GameConstants.SMALL_BLIND # min raise is max(this, BB)
+        self.closes_street = False # next check / call ends the street
+        self.done = False
+        self.folder = -1
+        self.board = []
+        self.history = []
+        self._undo = []
+
+    @classmethod
+    def at_street_start(cls, board, pot, stacks, history=(), abstraction=None):
+        """
+        State at the start of the street given by the board, with the pot split evenly
+        and stacks = [player to act (BB), opponent]. For callers that only know the summary.
+        """
+        state = cls(abstraction)
+        state.street = BOARD_CARDS.index(len(board))
+        half = int(pot) // 2
+        state.contrib = [GameConstants.STACK_SIZE - int(stacks[0]), GameConstants.STACK_SIZE - int(stacks[1])]
+        if state.contrib[0] + state.contrib[1] != int(pot):
+            state.contrib = [half, int(pot) - half]
+        state.to_act = 0
+        state.street_contrib = [0, 0]
+        state.last_bet_size = 0
+        state.board = list(board)
+        state.history = list(history)
+        return state
+
+    @classmethod
+    def from_parser(cls, parser, board=(), abstraction=None):
+        """
+        Replays an ActionParser's actions (pos, street, char, bet-to) into a state.
+        """
+        state = cls(abstraction)
+        for _, _, c, bet_to in parser.actions:
+            state.apply_exact(c, bet_to)
+        state.board = list(board)
+        state._undo = []
+        return state
+
+    def copy(self):
+        other = NLHEState.__new__(NLHEState)
+        for k in NLHEState.__slots__:
+            setattr(other, k, getattr(self, k))
+        other.contrib = list(self.contrib)
+        other.street_contrib = list(self.street_contrib)
+        other.board = list(self.board)
+        other.history = list(self.history)
+        other._undo = []
+        return other
+
+    @property
+    def pot(self):
+        return self.contrib[0] + self.contrib[1]
+
+    @property
+    def stacks(self):
+        return [GameConstants.STACK_SIZE - self.contrib[0], GameConstants.STACK_SIZE - self.contrib[1]]
+
+    @property
+    def to_call(self):
+        return self.street_contrib[1 - self.to_act] - self.street_contrib[self.to_act]
+
+    @property
+    def needs_cards(self):
+        # Cards the board is missing for the current street (0 during betting)
+        return BOARD_CARDS[self.street] - len(self.board)
+
+    def min_bet_to(self):
+        return self.street_contrib[1 - self.to_act] + max(self.last_bet_size, GameConstants.BIG_BLIND)
+
+    def can_raise(self):
+        me = self.to_act
+        return not self.done and self.stacks[me] > self.to_call and self.stacks[1 - me] > 0
+
+    def legal_actions(self):
+        return [] if self.done else self.abstraction.legal_actions(self)
+
+    def bet_to(self, action):
+        return self.abstraction.bet_to(self, action)
+
+    def action_string(self, action):
+        """
+        Slumbot incr for an abstract action.
+        """
+        if action == 0:
+            return 'f'
+        if action == 1:
+            return 'k' if self.to_call == 0 else 'c'
+        return f"b{self.bet_to(action)}"
+
+    def to_array(self):
+        """
+        Fixed-size int64 summary for batching: street, to_act, contrib, street_contrib,
+        last_bet_size, done, folder.
+        """
+        return np.array([self.street, self.to_act, self.contrib[0], self.contrib[1], self.street_contrib[0],
+                         self.street_contrib[1], self.last_bet_size, self.done, self.folder], dtype=np.int64)
+
+    # --- Transitions ---
+
+    def apply(self, action):
+        """
+        Applies a legal abstract action.
+        """
+        if action == 0:
+            self._apply('f', None, 0)
+        elif action == 1:
+            self._apply('k' if self.to_call == 0 else 'c', None, 1)
+        else:
+            self._apply('b', self.bet_to(action), action)
+
+    def apply_exact(self, c, bet_to=None):
+        """
+        Applies a Slumbot action: 'k', 'c', 'f' or 'b' with its street bet-to.
+        """
+        if c == 'b':
+            self._apply(c, bet_to, self.abstraction.nearest(self, bet_to))
+        else:
+            self._apply(c, None, 0 if c == 'f' else 1)
+
+    def deal(self, cards):
+        self._undo.append(('deal', len(cards)))
+        self.board.extend(cards)
+
+    def undo(self):
+        record = self._undo.pop()
+        if record[0] == 'deal':
+            del self.board[len(self.board) - record[1]:]
+            return
+        (_, self.street, self.to_act, c0, c1, s0, s1, self.last_bet_size,
+         self.closes_street, self.done, self.folder) = record
+        self.contrib[0], self.contrib[1] = c0, c1
+        self.street_contrib[0], self.street_contrib[1] = s0, s1
+        self.history.pop()
+
+    def _apply(self, c, bet_to, abstract_action):
+        self._undo.append(('act', self.street, self.to_act, self.contrib[0], self.contrib[1],
+                           self.street_contrib[0], self.street_contrib[1], self.last_bet_size,
+                           self.closes_street, self.done, self.folder))
+        self.history.append(abstract_action)
+        me = self.to_act
+        if c == 'f':
+            self.folder = me
+            self.done = True
+        elif c == 'b':
+            added = bet_to - self.street_contrib[me]
+            self.last_bet_size = bet_to - self.street_contrib[1 - me]
+            self.contrib[me] += added
+            self.street_contrib[me] = bet_to
+            self.to_act = 1 - me
+            self.closes_street = True
+        else:
+            if c == 'c':
+                added = self.street_contrib[1 - me] - self.street_contrib[me]
+                self.contrib[me] += added
+                self.street_contrib[me] += added
+                self.last_bet_size = 0
+                if self.stacks[0] == 0 or self.stacks[1] == 0:
+                    self.done = True # All-in called: showdown after the runout
+                    return
+            if self.closes_street:
+                self._end_street()
+            else:
+                self.to_act = 1 - me
+                self.closes_street = True
 
+    def _end_street(self):
+        if self.street == GameConstants.STREET_RIVER:
+            self.done = True
+            return
+        self.street += 1
+        self.to_act = 0
+        self.street_contrib = [0, 0]
+        self.last_bet_size = 0
+        self.closes_street = False
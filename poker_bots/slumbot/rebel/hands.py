@@ -0,0 +1,57 @@
+import numpy as np
+from treys import Card
+
+# Precomputed hole-card index shared by all NLHE code (search, features, agent).
+# Card index = rank * 4 + suit, rank 0..12 (2..A), suit order s, h, d, c.
+# This is also the order of DECK, so DECK[card_index] is the treys int.
+# Hands are every pair i < j of DECK in lexicographic order (the old get_all_hands order).
+
+RANKS = '23456789TJQKA'
+SUITS = 'shdc'
+NUM_CARDS = 52
+NUM_HANDS = 1326
+
+DECK = [Card.new(r + s) for r in RANKS for s in SUITS]
+CARD_INDEX = {c: i for i, c in enumerate(DECK)} # treys int -> 0..51
+
+HANDS = [(DECK[i], DECK[j]) for i in range(NUM_CARDS) for j in range(i + 1, NUM_CARDS)] # treys int pairs
+HAND_CARDS = np.array([(i, j) for i in range(NUM_CARDS) for j in range(i + 1, NUM_CARDS)], dtype=np.int64) # (1326, 2)
+
+# HAND_INDEX[a, b] = hand index of cards a and b (either order), -1 on the diagonal
+HAND_INDEX = np.full((NUM_CARDS, NUM_CARDS), -1, dtype=np.int64)
+HAND_INDEX[HAND_CARDS[:, 0], HAND_CARDS[:, 1]] = np.arange(NUM_HANDS)
+HAND_INDEX[HAND_CARDS[:, 1], HAND_CARDS[:, 0]] = np.arange(NUM_HANDS)
+
+# CARD_MASK[h, c] = hand h holds card c
+CARD_MASK = np.zeros((NUM_HANDS, NUM_CARDS), dtype=bool)
+CARD_MASK[np.arange(NUM_HANDS), HAND_CARDS[:, 0]] = True
+CARD_MASK[np.arange(NUM_HANDS), HAND_CARDS[:, 1]] = True
+
+# Shared by everyone, so nobody gets to modify them
+HAND_CARDS.setflags(write=False)
+HAND_INDEX.setflags(write=False)
+CARD_MASK.setflags(write=False)
+
+
+def card_index(card_int):
+    return CARD_INDEX[card_int]
+
+
+def cards_to_indices(card_ints):
+    return np.array([CARD_INDEX[c] for c in card_ints], dtype=np.int64)
+
+
+def hand_index(card_a, card_b):
+    """
+    Hand index (0..1325) of two treys card ints, in either order.
+    """
+    return int(HAND_INDEX[CARD_INDEX[card_a], CARD_INDEX[card_b]])
+
+
+def blocked_mask(card_ints):
+    """
+    (1326,) bool: hands that share a card with card_ints (e.g. the board).
+    """
+    if len(card_ints) == 0:
+        return np.zeros(NUM_HANDS, dtype=bool)
+    return CARD_MASK[:, cards_to_indices(card_ints)].any(axis=1)
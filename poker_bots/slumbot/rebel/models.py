@@ -3,7 +3,7 @@ import torch.nn as nn
 import torch.nn.functional as F
 
 class NLHEValueNetwork(nn.Module):
-    def __init__(self, input_dim=None, hidden_dim=256):
+    def __init__(self, input_dim=None, hidden_dim=256, num_hands=1326):
         """
         Input Features:
         - P0 Range (1326)
@@ -20,18 +20,22 @@ class NLHEValueNetwork(nn.Module):
         Pot + Stacks = 3 dims.
         History = 50 dims.
         Total ~ 3000.
+
+        num_hands: 1326 for raw combo ranges, or the number of buckets when running
+        in card-abstraction space (abstraction.py), which shrinks input and output ~25x.
         """
         super(NLHEValueNetwork, self).__init__()
         
-        self.input_dim = 1326 + 1326 + 52 + 3 + 50
+        self.num_hands = num_hands
+        self.input_dim = num_hands + num_hands + 52 + 3 + 50
         
         self.fc1 = nn.Linear(self.input_dim, hidden_dim)
         self.fc2 = nn.Linear(hidden_dim, hidden_dim)
         self.fc3 = nn.Linear(hidden_dim, hidden_dim)
         
-        # Output: Value vector for P0 (1326) and P1 (1326)
-        # Predicting value per hand.
-        self.output_head = nn.Linear(hidden_dim, 1326 * 2)
+        # Output: Value vector for P0 (num_hands) and P1 (num_hands)
+        # Predicting value per hand (or per bucket).
+        self.output_head = nn.Linear(hidden_dim, num_hands * 2)
         
     def forward(self, x):
         x = F.relu(self.fc1(x))
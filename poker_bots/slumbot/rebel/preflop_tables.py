@@ -0,0 +1,127 @@
+import argparse
+import os
+
+import numpy as np
+from treys import Card
+
+from .evaluator import evaluate_batch
+from .hands import HANDS, HAND_CARDS, NUM_CARDS, NUM_HANDS
+
+# Per-hand preflop tables over the 1326 combos (hands.py order), built once and shipped as .npy:
+#   strength: the rough rank-based bucket ReBeLAgent has always used, in [0, 1]
+#   equity:   all-in preflop equity vs a uniformly random hand (ties count half)
+# Loaded lazily on first use; if a file is missing it is rebuilt and saved next to this module.
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+STRENGTH_PATH = os.path.join(DATA_DIR, 'preflop_strength.npy')
+EQUITY_PATH = os.path.join(DATA_DIR, 'preflop_equity.npy')
+
+_tables = {}
+
+
+def strength_bucket(hand):
+    """
+    Very rough preflop bucket based only on ranks.
+    Returns float in [0, 1]; higher = stronger.
+    """
+    r1 = Card.get_rank_int(hand[0])  # 0..12 (2..A)
+    r2 = Card.get_rank_int(hand[1])
+    suited = Card.get_suit_int(hand[0]) == Card.get_suit_int(hand[1])
+    ranks = sorted([r1, r2], reverse=True)
+    high, low = ranks
+    # Pair
+    if r1 == r2:
+        return 0.8 + high / 20.0
+    # Broadways
+    if high >= 10 and low >= 8:
+        return 0.65 + (high + low) / 30.0 + (0.05 if suited else 0)
+    # Suited connectors
+    if suited and high - low == 1 and high >= 7:
+        return 0.55
+    # Suited ace
+    if suited and high == 12:
+        return 0.5
+    # Default
+    return 0.3 + (high / 30.0)
+
+
+def build_strength_table():
+    return np.array([strength_bucket(h) for h in HANDS], dtype=np.float32)
+
+
+def _canonical_class(i):
+    # (high rank, low rank, suited) - equity only depends on this, 169 classes
+    a, b = HAND_CARDS[i]
+    ra, rb = a // 4, b // 4
+    return (max(ra, rb), min(ra, rb), (a % 4) == (b % 4))
+
+
+def build_equity_table(samples=20000, seed=0, verbose=True):
+    """
+    Monte Carlo equity of every class vs a uniform random hand over random boards,
+    then copied to all combos of the class. Standard error ~ 0.5 / sqrt(samples).
+    Each class's runouts are evaluated in one batch with the lookup-table evaluator.
+    """
+    rng = np.random.default_rng(seed)
+    classes = {}
+    for i in range(NUM_HANDS):
+        classes.setdefault(_canonical_class(i), []).append(i)
+
+    table = np.zeros(NUM_HANDS, dtype=np.float32)
+    for n, (cls, members) in enumerate(sorted(classes.items())):
+        mine = HAND_CARDS[members[0]]
+        rest = np.setdiff1d(np.arange(NUM_CARDS), mine)
+        # 7 distinct cards per runout: opponent's 2 then the board
+        cards = rest[np.argsort(rng.random((samples, len(rest))), axis=1)[:, :7]]
+        board = cards[:, 2:]
+        s0 = evaluate_batch(np.concatenate([np.broadcast_to(mine, (samples, 2)), board], axis=1))
+        s1 = evaluate_batch(cards)
+        table[members] = ((s0 < s1) + 0.5 * (s0 == s1)).mean()
+        if verbose and (n + 1) % 20 == 0:
+            print(f"  {n + 1}/{len(classes)} classes")
+    return table
+
+
+def _load(name, path, build):
+    if name not in _tables:
+        if os.path.exists(path):
+            table = np.load(path)
+        else:
+            table = build()
+            os.makedirs(DATA_DIR, exist_ok=True)
+            np.save(path, table)
+        table.setflags(write=False)
+        _tables[name] = table
+    return _tables[name]
+
+
+def preflop_strength():
+    """
+    (1326,) float32 rank-based strength bucket per combo. Shared, read-only.
+    """
+    return _load('strength', STRENGTH_PATH, build_strength_table)
+
+
+def preflop_equity():
+    """
+    (1326,) float32 all-in equity vs a uniform random hand per combo. Shared, read-only.
+    """
+    return _load('equity', EQUITY_PATH, lambda: build_equity_table(verbose=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the preflop strength / equity tables')
+    parser.add_argument('--samples', type=int, default=20000, help='Monte Carlo runouts per hand class')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    np.save(STRENGTH_PATH, build_strength_table())
+    print(f"Wrote {STRENGTH_PATH}")
+    print(f"Building equity table ({args.samples} runouts per class)...")
+    np.save(EQUITY_PATH, build_equity_table(args.samples, args.seed))
+    print(f"Wrote {EQUITY_PATH}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,176 +1,119 @@
+import time
 import torch
 import numpy as np
 import random
-from .game import NLHERules, GameConstants
+from .game import NLHERules, NLHEState
+from .chance import ChanceExpansion, evaluate_children
 from .features import get_nlhe_features
+from .hands import NUM_HANDS, blocked_mask, hand_index
+from .showdown import BoardShowdown, hand_strengths, live_mass, live_mass_batch
 
 class NLHESearch:
-    def __init__(self, value_net, device='cpu'):
+    def __init__(self, value_net, device='cpu', abstraction=None, cfr_iterations=0, time_budget=None, max_raises=3,
+                 chance_leaves=False, max_children=None):
         self.value_net = value_net
         self.device = device
-        self.all_hands = NLHERules.get_all_hands() # List of 1326 tuples
+        self.all_hands = NLHERules.get_all_hands() # Shared list of 1326 tuples (hands.py)
+        # Optional CardAbstraction: search in bucket space (value_net built with num_hands=num_buckets)
+        self.abstraction = abstraction
+        # cfr_iterations > 0: solve_subgame runs the depth-limited CFR solver instead of the 1-ply softmax
+        self.cfr_iterations = cfr_iterations
+        self.solver = NLHECFRSolver(value_net, cfr_iterations, time_budget, device, abstraction, max_raises,
+                                    chance_leaves, max_children)
         
-    def solve_subgame(self, r0, r1, board, pot, stacks, history):
+    def solve_subgame(self, r0, r1, board, pot, stacks, history, lift=True, state=None, deadline=None,
+                      compute_values=True):
         """
-        Runs a 1-ply search using the Value Net with softmax action selection.
+        Runs a 1-ply search using the Value Net with softmax action selection, or
+        NLHECFRSolver over the rest of the street when cfr_iterations > 0.
         Returns:
-        - Strategy (Action -> Prob Vector over 1326 hands)
+        - Strategy (Action -> Prob Vector over 1326 hands), one entry per legal action
         - Value (Vector over 1326 hands)
+        state: NLHEState at the decision (game.py), r0 is the range of the player to act.
+        Legal actions and next states come from it, so bets, pot and stacks are exact.
+        Without one, a state at the start of the street is built from pot / stacks / history
+        (stacks = [player to act, opponent]).
+        With an abstraction the ranges are projected to buckets and the whole search runs on
+        (num_buckets,) vectors; lift=True maps strategy and values back to the 1326 hands
+        (every hand gets its bucket's entry), lift=False returns them per bucket.
+        deadline / compute_values: see NLHECFRSolver.solve (CFR only).
         """
-        # Identify legal actions
-        # history for rule check needs to be list of ints?
-        # get_legal_actions(history, pot, current_bets, stack_sizes)
-        # We assume history is sufficient to determine current bets if we tracked them.
-        # For simplicity in this prototype, assume equal bets unless history says otherwise.
-        # But 'history' passed here is simplified list of ints?
-        # Let's just assume we can always Check/Call, Pot, AllIn for now.
-        
-        # Simplified Legal Actions
-        legal = [0, 1, 2, 3] # Fold, Check/Call, Pot, AllIn
-        
-        # We need to query ValueNet for each action's resulting state.
-        # Next State construction is complex (bets update, pot update, etc).
-        # We will approximate:
-        # Action 0 (Fold): Terminal. Value is Pot/2 or 0 depending on who folds.
-        # Action 1 (Check/Call): Next state (Next Round or Showdown?)
-        # Action 2 (Pot): Next state (Opponent to act, pot increased)
-        # Action 3 (AllIn): Next state (Opponent to act, pot increased)
-        
-        # For this prototype, we will just query the Value Net for the CURRENT state
-        # and assume the "Policy" is implicit in the value outputs?
-        # No, ReBeL Value Net outputs Value of the state.
-        # We need Q(s, a).
-        # Q(s, a) = Value(NextState(s, a)).
-        
-        # Batch query for all actions
-        inputs = []
-        
-        # Current Features (for reference, mostly next state matters)
-        # ft_curr = get_nlhe_features(r0, r1, board, pot, stacks, history)
-        
-        # Simulate Next States
-        # 1. Fold
-        # Value is fixed. If I fold, I lose pot. Payoff = -Contribution?
-        # Value = 0 (relative to pot?)
-        # Let's say Value = -Pot/2 (Loss).
-        
-        # 2. Check/Call
-        # Pot same (Check) or Pot increases (Call).
-        # History appends 1.
-        # Next state features?
-        # r0, r1 same.
-        
-        # 3. Pot Bet
-        # Pot increases by Pot.
-        # History appends 2.
-        
-        # 4. All In
-        # Pot increases by Stack.
-        # History appends 3.
-        
-        # We need to construct tensors for Next States.
-        # Note: If it's opponent's turn in next state, the ValueNet returns EV for P0, P1.
-        # We need to handle perspective.
-        
+        if state is None:
+            state = NLHEState.at_street_start(board, pot, stacks, history)
+        if self.cfr_iterations > 0:
+            strategy, values = self.solver.solve(state, r0, r1, board, deadline, compute_values)
+            if self.abstraction is not None and not lift and values is not None:
+                # Bucket-space results (training targets): range-weighted means per bucket
+                keys = list(strategy)
+                strategy = dict(zip(keys, self.abstraction.project_mean(np.stack([strategy[a] for a in keys]), r0, board)))
+                values = {0: self.abstraction.project_mean(values[0], r0, board),
+                          1: self.abstraction.project_mean(values[1], r1, board)}
+            return strategy, values
+
+        if self.abstraction is not None:
+            r0 = self.abstraction.project(r0, board)
+            r1 = self.abstraction.project(r1, board)
+        n = len(r0)
+        me = state.to_act
+        legal = state.legal_actions()
+
+        # Q(s, a) = Value(NextState(s, a)) from the Value Net, for every non-fold action.
+        # Next states come from the betting engine: apply, read the features, undo.
+        # The net returns values for (player to act at the root, opponent).
         next_states = []
+        for a in legal:
+            if a == 0:
+                continue
+            state.apply(a)
+            child_stacks = state.stacks
+            next_states.append(get_nlhe_features(r0, r1, board, state.pot, [child_stacks[me], child_stacks[1 - me]],
+                                                 state.history))
+            state.undo()
+
+        batch = torch.stack(next_states).to(self.device)
+        with torch.no_grad():
+            # Shape (A, 2n) -> (A, 2, n), n = 1326 hands or num_buckets
+            out = self.value_net(batch)
+            out = out.view(-1, 2, n).cpu().numpy() # (Action, Player, Hand)
+
+        # Determine best action per hand, for all n hands (or buckets) at once.
+        # Rows of q: legal actions in order; columns: hands.
+        # Fold value? Let's say -10 for the folder, +10 for the other player.
+        rows_me, rows_opp = [], []
+        if legal[0] == 0:
+            rows_me.append(np.full(n, -10.0, dtype=np.float32))
+            rows_opp.append(np.full(n, 10.0, dtype=np.float32))
+        rows_me.extend(out[:, 0])
+        rows_opp.extend(out[:, 1])
+        q = np.stack(rows_me) # (A, n) float32
         
-        # Dummy "Next State" Logic
-        # (Real implementation needs full game engine)
-        
-        for a in [1, 2, 3]:
-            # Construct features
-            # Just append 'a' to history and update pot roughly
-            new_hist = history + [a]
-            new_pot = pot
-            if a == 2: new_pot *= 2
-            if a == 3: new_pot += 20000
-            
-            ft = get_nlhe_features(r0, r1, board, new_pot, stacks, new_hist)
-            next_states.append(ft)
-            
-        # Query
-        if next_states:
-            batch = torch.stack(next_states).to(self.device)
-            with torch.no_grad():
-                # Shape (3, 2652) -> (3, 2, 1326)
-                # Output head is 2652 dims.
-                out = self.value_net(batch)
-                out = out.view(-1, 2, 1326) # (Batch, Player, Hand)
-                
-            # Extract Values
-            # vals[action_idx][player_idx][hand_idx]
-            vals_call = out[0].cpu().numpy()
-            vals_pot = out[1].cpu().numpy()
-            vals_allin = out[2].cpu().numpy()
-        else:
-            # Should not happen
-            pass
-            
-        # Construct Q-Values for P0 (assuming we are P0)
-        # Fold: 0 (Simplified)
-        # Call: vals_call[0]
-        # Pot: vals_pot[0]
-        # AllIn: vals_allin[0]
-        
-        # Determine best action per hand
-        strategy = {
-            0: np.zeros(1326),
-            1: np.zeros(1326),
-            2: np.zeros(1326),
-            3: np.zeros(1326)
-        }
-        
-        # Maximize Value
-        # Fold value? Let's say -10.
-        fold_val = np.full(1326, -10.0) 
-        
-        # Compare
-        # For each hand i: softmax over q_vals for a smoother policy.
+        # Softmax over actions (axis 0) for a smoother policy, clipped for stability
         temp = 1.0
-        for i in range(1326):
-            q_vals = np.array([
-                fold_val[i],
-                vals_call[0][i],
-                vals_pot[0][i],
-                vals_allin[0][i]
-            ])
-            # Softmax with clipping for stability
-            q_clip = np.clip(q_vals / max(1e-3, temp), -50, 50)
-            exp_q = np.exp(q_clip - q_clip.max())
-            probs = exp_q / exp_q.sum()
-            for a_idx, p in enumerate(probs):
-                strategy[a_idx][i] = p
+        q_clip = np.clip(q / max(1e-3, temp), -50, 50)
+        exp_q = np.exp(q_clip - q_clip.max(axis=0, keepdims=True))
+        probs = exp_q / exp_q.sum(axis=0, keepdims=True)
             
-        # Value of this node (for training parent)
-        node_values_p0 = np.zeros(1326)
-        node_values_p1 = np.zeros(1326) # Opponent value?
+        # Value of this node (for training parent): expected value under the softmax strategy
+        node_values_p0 = (probs * q).sum(axis=0)
         
-        for i in range(1326):
-            q_vals = np.array([fold_val[i], vals_call[0][i], vals_pot[0][i], vals_allin[0][i]])
-            # Expected value under the softmax strategy
-            p = np.array([strategy[a][i] for a in range(4)])
-            node_values_p0[i] = np.dot(p, q_vals)
-            
-            # For P1, use the same mixture to estimate expected value
-            # Fold gives P1 win; others from value net
-            opp_q = np.array([
-                10.0,                    # if P0 folds
-                vals_call[1][i],
-                vals_pot[1][i],
-                vals_allin[1][i],
-            ])
-            node_values_p1[i] = np.dot(p, opp_q)
+        # For P1, use the same mixture to estimate expected value
+        opp_q = np.stack(rows_opp)
+        node_values_p1 = (probs * opp_q).sum(axis=0)
+
+        if self.abstraction is not None and lift:
+            probs = self.abstraction.lift(probs, board)
+            node_values_p0 = self.abstraction.lift(node_values_p0, board)
+            node_values_p1 = self.abstraction.lift(node_values_p1, board)
+        strategy = {a: probs[i] for i, a in enumerate(legal)}
                 
         return strategy, {0: node_values_p0, 1: node_values_p1}
 
     def get_action_from_strategy(self, strategy, hand_card_ints):
         # hand_card_ints: tuple of 2 ints
-        # Find index in self.all_hands
+        # O(1) lookup in the precomputed 52x52 hand index (either card order)
         try:
-            # Sort needed because all_hands are generated sorted
-            key = tuple(sorted(hand_card_ints))
-            idx = self.all_hands.index(key)
-        except ValueError:
+            idx = hand_index(hand_card_ints[0], hand_card_ints[1])
+        except KeyError:
             # Fallback
             idx = 0
         
@@ -183,3 +126,272 @@ class NLHESearch:
             return random.choice(actions)
             
         return random.choices(actions, weights=probs)[0]
+
+
+class _SubgameNode:
+    # kind: 'decision', 'fold', 'showdown', 'leaf' (value net on the current board) or
+    # 'chance' (street over, value net on every next board, chance.py)
+    # player / folder are solver players: 0 = player to act at the root, 1 = opponent
+    __slots__ = ('kind', 'player', 'actions', 'children', 'contrib', 'stacks', 'pot', 'history', 'folder')
+
+    def __init__(self, kind, state, root_pos):
+        self.kind = kind
+        self.player = 0 if state.to_act == root_pos else 1
+        self.actions = []
+        self.children = []
+        c = state.contrib
+        self.contrib = (c[root_pos], c[1 - root_pos])
+        st = state.stacks
+        self.stacks = [st[root_pos], st[1 - root_pos]]
+        self.pot = state.pot
+        self.history = list(state.history)
+        self.folder = -1 if state.folder < 0 else (0 if state.folder == root_pos else 1)
+
+
+class NLHECFRSolver:
+    """
+    Depth-limited range-vs-range CFR over the rest of the current street (same design as
+    the Leduc CFRSolver), vectorized over all 1326 combos:
+      - the street's betting tree is built once per solve with NLHEState.apply / undo
+        (BetAbstraction actions, at most max_raises raises inside the subgame)
+      - every iteration is a top-down pass (reach ranges), one batched evaluation of all
+        leaves / terminals, and a bottom-up pass (values, regrets)
+      - street-end leaves (and all-ins before the river) are valued by NLHEValueNetwork in
+        one forward pass per iteration; river showdowns use showdown.py, folds live_mass,
+        so card removal is exact everywhere
+      - regret matching+ with linearly weighted averages (CFR+), which converges much
+        faster than the vanilla CFR the Leduc solver uses
+      - chance_leaves=True: street-end leaves become chance nodes instead, the value net
+        is evaluated on every next board (all turn / river cards, max_children sampled
+        flops, suit-isomorphic ones once) in the same single forward pass
+    Values are chips won over the whole hand. Internally they are counterfactual
+    (times the opponent's live reach); solve() returns per-hand expected values.
+    Stops after `iterations` or `time_budget` seconds, whichever comes first.
+    """
+    def __init__(self, value_net, iterations=100, time_budget=None, device='cpu', abstraction=None, max_raises=3,
+                 chance_leaves=False, max_children=None, rng=None):
+        self.value_net = value_net
+        self.iterations = iterations
+        self.time_budget = time_budget
+        self.device = device
+        self.abstraction = abstraction # CardAbstraction if the net works on buckets
+        self.max_raises = max_raises
+        self.chance_leaves = chance_leaves
+        # Children per chance node. None: every turn / river card, but 50 sampled flops
+        # (there are 19600 of them)
+        self.max_children = max_children
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.expansion = None
+        self.nodes = []
+        self.iterations_run = 0
+        self.build_time = 0.0
+        self.solve_time = 0.0
+
+    # --- Tree ---
+
+    def _build(self, state, root_pos, root_street, raises):
+        idx = len(self.nodes)
+        if state.done:
+            kind = 'fold' if state.folder >= 0 else ('showdown' if len(self.board) == 5 else 'leaf')
+        elif state.street != root_street:
+            kind = 'chance' if self.chance_leaves else 'leaf'
+        else:
+            kind = 'decision'
+        node = _SubgameNode(kind, state, root_pos)
+        self.nodes.append(node)
+        if kind != 'decision':
+            return idx
+
+        for a in state.legal_actions():
+            if a >= 2 and raises >= self.max_raises and idx != 0:
+                continue
+            state.apply(a)
+            child = self._build(state, root_pos, root_street, raises + (a >= 2))
+            state.undo()
+            node.actions.append(a)
+            node.children.append(child)
+        return idx
+
+    # --- Solve ---
+
+    def solve(self, state, r0, r1, board, deadline=None, compute_values=True):
+        """
+        state: NLHEState at the root decision (not modified). r0: range of the player to act,
+        r1: opponent's, (1326,) each. board: treys ints.
+        Returns (average root strategy {action: (1326,)}, {0: (1326,), 1: (1326,)} values
+        of the root player / opponent under the average strategy).
+
+        Anytime: iterations stop early once the next one (plus the final values pass)
+        wouldn't fit before the deadline (time.perf_counter() seconds), which defaults to
+        time_budget after the call. At least one iteration always runs.
+        compute_values=False skips the values pass (values come back as None) when only
+        the strategy is needed, e.g. to act.
+        """
+        start = time.perf_counter()
+        if deadline is None and self.time_budget is not None:
+            deadline = start + self.time_budget
+        if state.done:
+            raise ValueError("Can't solve a subgame from a terminal state")
+        self.board = list(board)
+        live = ~blocked_mask(self.board)
+        r0 = np.asarray(r0, dtype=np.float64) * live
+        r1 = np.asarray(r1, dtype=np.float64) * live
+
+        self.nodes = []
+        self._build(state.copy(), state.to_act, state.street, 0)
+        self.decisions = [i for i, nd in enumerate(self.nodes) if nd.kind == 'decision']
+        self.leaves = [i for i, nd in enumerate(self.nodes) if nd.kind == 'leaf']
+        self.showdowns = [i for i, nd in enumerate(self.nodes) if nd.kind == 'showdown']
+        self.folds = [i for i, nd in enumerate(self.nodes) if nd.kind == 'fold']
+        self.chance = [i for i, nd in enumerate(self.nodes) if nd.kind == 'chance']
+        if self.chance:
+            # Symmetries from the root ranges: CFR keeps strategies (so leaf reaches) symmetric too
+            num_cards = 3 if len(self.board) == 0 else 1
+            max_children = self.max_children if self.max_children is not None else (50 if num_cards == 3 else None)
+            self.expansion = ChanceExpansion(self.board, num_cards, (r0, r1), max_children, self.rng)
+        if self.showdowns:
+            self.showdown = BoardShowdown(hand_strengths(self.board))
+        self.regrets = {i: np.zeros((len(self.nodes[i].actions), NUM_HANDS)) for i in self.decisions}
+        self.strategy_sum = {i: np.zeros((len(self.nodes[i].actions), NUM_HANDS)) for i in self.decisions}
+
+        loop_start = time.perf_counter()
+        self.build_time = loop_start - start
+        self.iterations_run = 0
+        last = loop_start
+        for t in range(1, self.iterations + 1):
+            self._iterate(r0, r1, t)
+            self.iterations_run = t
+            if deadline is not None:
+                now = time.perf_counter()
+                # Pessimistic: the slower of the average and the latest iteration
+                per_iteration = max((now - loop_start) / t, now - last)
+                last = now
+                # Room for one more iteration, and for the values pass if there is one
+                if now + per_iteration * (2 if compute_values else 1) > deadline:
+                    break
+        self.solve_time = time.perf_counter() - start
+
+        strategy = self.average_strategy(0)
+        root = self.nodes[0]
+        strategy = {a: strategy[k].astype(np.float32) for k, a in enumerate(root.actions)}
+        if not compute_values:
+            return strategy, None
+
+        values = self._iterate(r0, r1, None)
+        out = {}
+        for p in (0, 1):
+            opp_live = live_mass((r1, r0)[p], self.board)
+            out[p] = np.divide(values[p], opp_live, out=np.zeros(NUM_HANDS), where=opp_live > 1e-12).astype(np.float32)
+        self.solve_time = time.perf_counter() - start
+        return strategy, out
+
+    def _current_strategy(self, i):
+        pos = np.maximum(self.regrets[i], 0)
+        total = pos.sum(axis=0, keepdims=True)
+        return np.where(total > 1e-12, pos / np.maximum(total, 1e-12), 1.0 / len(pos))
+
+    def average_strategy(self, i):
+        s = self.strategy_sum[i]
+        total = s.sum(axis=0, keepdims=True)
+        return np.where(total > 1e-12, s / np.maximum(total, 1e-12), 1.0 / len(s))
+
+    def _iterate(self, r0, r1, t):
+        """
+        One CFR+ iteration at weight t, or (t=None) an evaluation pass of the average strategy.
+        Returns the root's counterfactual values.
+        """
+        nodes = self.nodes
+        reach = [None] * len(nodes)
+        strategy = {}
+        reach[0] = (r0, r1)
+        for i in self.decisions: # pre-order: parents first
+            node = nodes[i]
+            sigma = self.average_strategy(i) if t is None else self._current_strategy(i)
+            strategy[i] = sigma
+            p = node.player
+            for k, c in enumerate(node.children):
+                rr = list(reach[i])
+                rr[p] = reach[i][p] * sigma[k]
+                reach[c] = rr
+
+        values = [None] * len(nodes)
+        self._fold_values(reach, values)
+        self._showdown_values(reach, values)
+        self._leaf_values(reach, values)
+        self._chance_values(reach, values)
+
+        for i in reversed(self.decisions): # children first
+            node = nodes[i]
+            p, q = node.player, 1 - node.player
+            sigma = strategy[i]
+            child_p = np.stack([values[c][p] for c in node.children]) # (A, 1326)
+            v_p = (sigma * child_p).sum(axis=0)
+            # The opponent's values already carry this player's strategy through its reach
+            v_q = np.sum([values[c][q] for c in node.children], axis=0)
+            values[i] = (v_p, v_q) if p == 0 else (v_q, v_p)
+            if t is not None:
+                self.regrets[i] = np.maximum(self.regrets[i] + child_p - v_p, 0)
+                self.strategy_sum[i] += t * sigma * reach[i][p]
+        return values[0]
+
+    def _fold_values(self, reach, values):
+        if not self.folds:
+            return
+        # live opponent mass for both players of every fold node in one batch
+        R = np.array([reach[i][1 - p] for i in self.folds for p in (0, 1)])
+        live = live_mass_batch(R, self.board)
+        for k, i in enumerate(self.folds):
+            node = self.nodes[i]
+            lost = node.contrib[node.folder]
+            payoff = [lost, lost]
+            payoff[node.folder] = -lost
+            values[i] = (payoff[0] * live[2 * k], payoff[1] * live[2 * k + 1])
+
+    def _showdown_values(self, reach, values):
+        if not self.showdowns:
+            return
+        R = np.array([reach[i][1 - p] for i in self.showdowns for p in (0, 1)])
+        stakes = np.repeat([self.nodes[i].contrib[0] for i in self.showdowns], 2)
+        v = self.showdown.values(R, stakes)
+        for k, i in enumerate(self.showdowns):
+            values[i] = (v[2 * k], v[2 * k + 1])
+
+    def _leaf_values(self, reach, values):
+        if not self.leaves:
+            return
+        feats = []
+        for i in self.leaves:
+            node = self.nodes[i]
+            r = []
+            for p in (0, 1):
+                x = reach[i][p]
+                s = x.sum()
+                x = x / s if s > 1e-12 else x # Normalize ranges for NN
+                if self.abstraction is not None:
+                    x = self.abstraction.project(x, self.board)
+                r.append(x)
+            feats.append(get_nlhe_features(r[0], r[1], self.board, node.pot, node.stacks, node.history))
+        with torch.no_grad():
+            out = self.value_net(torch.stack(feats).to(self.device)).cpu().numpy().astype(np.float64)
+        out = out.reshape(len(self.leaves), 2, -1)
+        if self.abstraction is not None:
+            out = self.abstraction.lift(out, self.board)
+
+        # The net predicts per-hand values; CFR wants them times the live opponent reach
+        R = np.array([reach[i][1 - p] for i in self.leaves for p in (0, 1)])
+        live = live_mass_batch(R, self.board).reshape(len(self.leaves), 2, NUM_HANDS)
+        cfv = out * live
+        for k, i in enumerate(self.leaves):
+            values[i] = (cfv[k, 0], cfv[k, 1])
+
+    def _chance_values(self, reach, values):
+        if not self.chance:
+            return
+        nodes = [self.nodes[i] for i in self.chance]
+        cfv = evaluate_children(self.value_net, self.expansion,
+                                np.array([reach[i][0] for i in self.chance]),
+                                np.array([reach[i][1] for i in self.chance]),
+                                [nd.pot for nd in nodes], [nd.stacks for nd in nodes], [nd.history for nd in nodes],
+                                self.device, self.abstraction)
+        for k, i in enumerate(self.chance):
+            values[i] = (cfv[k, 0], cfv[k, 1])
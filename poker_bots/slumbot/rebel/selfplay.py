@@ -0,0 +1,213 @@
+import argparse
+import multiprocessing as mp
+import time
+import uuid
+
+import numpy as np
+import torch
+
+from .beliefs import BeliefTracker
+from .dataset import ShardWriter, dataset_stats
+from .features import get_nlhe_features
+from .game import NLHEState, DEFAULT_BET_ABSTRACTION
+from .hands import DECK, hand_index
+from .search import NLHESearch
+from .train import make_model
+
+# Self-play data generation on real game states.
+#
+# Both seats are played by the search. Every decision is a sample: the public belief state
+# (both players' ranges, board, pot, stacks, history) and the per-hand values the search
+# computes for it, the same (features, target) layout as train.self_play_sample. Ranges start
+# uniform and are updated by Bayes' rule after every action (r[h] *= policy(action | h)),
+# and by card removal when board cards come, so samples come from states the agent can
+# actually reach instead of random ones.
+#
+# generate_parallel runs num_workers processes, each with its own model copy and its own
+# ShardWriter into the same directory (dataset.py), and prints per-worker throughput from
+# shared counters while they run.
+
+# Per-worker counters in the shared array
+HANDS, DECISIONS, SAMPLES, SEARCH_SECONDS, START = range(5)
+NUM_COUNTERS = 5
+
+
+def play_hand(search, rng, abstraction=None, explore=0.1, emit=None):
+    """
+    Plays one hand with the search acting for both positions (0 = BB, 1 = SB).
+    emit(features, target) is called for every decision. explore: chance of taking a
+    uniformly random legal action instead of sampling the policy (beliefs are still updated
+    with the policy, as ReBeL does, so they stay what an opponent would infer).
+    Returns (decisions, search seconds).
+    """
+    deck = [DECK[i] for i in rng.permutation(len(DECK))]
+    holes = [deck[0:2], deck[2:4]]
+    runout = deck[4:9]
+    state = NLHEState(DEFAULT_BET_ABSTRACTION)
+    beliefs = BeliefTracker()
+    decisions = 0
+    search_time = 0.0
+
+    while not state.done:
+        if state.needs_cards > 0:
+            state.deal(runout[len(state.board):len(state.board) + state.needs_cards])
+            beliefs.observe_board(state.board) # card removal
+            continue
+
+        me = state.to_act
+        board = list(state.board)
+        stacks = state.stacks
+        stacks = [float(stacks[me]), float(stacks[1 - me])]
+        r_me, r_opp = beliefs.ranges(me, np.float64)
+        start = time.perf_counter()
+        strategy, values = search.solve_subgame(r_me, r_opp, board, float(state.pot), stacks,
+                                                state.history, state=state)
+        search_time += time.perf_counter() - start
+        decisions += 1
+
+        if emit is not None:
+            v_me, v_opp = values[0], values[1]
+            if abstraction is not None:
+                v_me = abstraction.project_mean(v_me, r_me, board)
+                v_opp = abstraction.project_mean(v_opp, r_opp, board)
+                r_me = abstraction.project(r_me, board)
+                r_opp = abstraction.project(r_opp, board)
+            features = get_nlhe_features(r_me, r_opp, board, float(state.pot), stacks, state.history)
+            emit(features, np.concatenate([v_me, v_opp]))
+
+        # Act with the real hand
+        actions = list(strategy)
+        if rng.random() < explore:
+            action = actions[rng.integers(len(actions))]
+        else:
+            idx = hand_index(*holes[me])
+            probs = np.array([strategy[a][idx] for a in actions], dtype=np.float64)
+            probs = probs / probs.sum() if probs.sum() > 0 else np.full(len(actions), 1.0 / len(actions))
+            action = actions[rng.choice(len(actions), p=probs)]
+
+        # Bayes: what the opponent learns about my range from this action
+        beliefs.update(me, strategy[action])
+        state.apply(action)
+
+    return decisions, search_time
+
+
+def _worker(worker_id, num_hands, data_dir, prefix, config, counters, seed):
+    torch.set_num_threads(1) # one core per worker, the processes are the parallelism
+    torch.manual_seed(seed)
+    rng = np.random.default_rng(seed)
+
+    abstraction = None
+    if config.get('abstraction'):
+        from .abstraction import CardAbstraction
+        abstraction = CardAbstraction()
+    model = make_model(abstraction, config['model_path'])
+    model.eval()
+    search = NLHESearch(model, abstraction=abstraction, cfr_iterations=config['cfr_iterations'],
+                        time_budget=config.get('time_budget'), chance_leaves=config.get('chance_leaves', False))
+
+    row = worker_id * NUM_COUNTERS
+    counters[row + START] = time.time()
+    with ShardWriter(data_dir, config['shard_size'], prefix=f"{prefix}-w{worker_id}") as writer:
+        def emit(features, target):
+            writer.add(features, target)
+            counters[row + SAMPLES] += 1
+        for _ in range(num_hands):
+            decisions, search_time = play_hand(search, rng, abstraction, config['explore'], emit)
+            counters[row + HANDS] += 1
+            counters[row + DECISIONS] += decisions
+            counters[row + SEARCH_SECONDS] += search_time
+
+
+def worker_stats(counters, num_workers, now=None):
+    """
+    Per-worker throughput from the shared counters: list of dicts with hands, samples,
+    hands/s, samples/s and the share of wall time spent in the search.
+    """
+    now = now or time.time()
+    out = []
+    for w in range(num_workers):
+        c = counters[w * NUM_COUNTERS:(w + 1) * NUM_COUNTERS]
+        elapsed = now - c[START] if c[START] > 0 else 0.0
+        rate = lambda x: x / elapsed if elapsed > 0 else 0.0
+        out.append({'worker': w, 'hands': int(c[HANDS]), 'decisions': int(c[DECISIONS]), 'samples': int(c[SAMPLES]),
+                    'hands_per_sec': rate(c[HANDS]), 'samples_per_sec': rate(c[SAMPLES]),
+                    'search_share': c[SEARCH_SECONDS] / elapsed if elapsed > 0 else 0.0})
+    return out
+
+
+def print_stats(stats):
+    for s in stats:
+        print(f"  worker {s['worker']}: {s['hands']} hands, {s['samples']} samples, "
+              f"{s['hands_per_sec']:.2f} hands/s, {s['samples_per_sec']:.2f} samples/s, "
+              f"{100.0 * s['search_share']:.0f}% in search")
+    print(f"  total: {sum(s['hands'] for s in stats)} hands, {sum(s['samples'] for s in stats)} samples, "
+          f"{sum(s['samples_per_sec'] for s in stats):.2f} samples/s")
+
+
+def generate_parallel(data_dir, num_hands, num_workers=None, model_path="rebel_nlhe.pt", cfr_iterations=25,
+                      time_budget=None, explore=0.1, abstraction=False, chance_leaves=False, shard_size=4096,
+                      seed=0, report_every=10.0):
+    """
+    Plays num_hands self-play hands over num_workers processes (default: one per core),
+    writing every decision to shards in data_dir. abstraction: True to work in
+    CardAbstraction bucket space (each worker loads its own). Returns worker_stats at the end.
+    """
+    num_workers = num_workers or mp.cpu_count()
+    config = {'model_path': model_path, 'cfr_iterations': cfr_iterations, 'time_budget': time_budget,
+              'explore': explore, 'abstraction': abstraction, 'chance_leaves': chance_leaves,
+              'shard_size': shard_size}
+    # spawn: safe with CUDA and doesn't inherit torch's thread pools
+    ctx = mp.get_context('spawn')
+    counters = ctx.Array('d', num_workers * NUM_COUNTERS, lock=False)
+    prefix = uuid.uuid4().hex[:8]
+    procs = []
+    for w in range(num_workers):
+        n = num_hands // num_workers + (w < num_hands % num_workers)
+        p = ctx.Process(target=_worker, args=(w, n, data_dir, prefix, config, counters, seed + w), daemon=True)
+        p.start()
+        procs.append(p)
+
+    start = time.time()
+    last_report = start
+    while any(p.is_alive() for p in procs):
+        time.sleep(0.5)
+        if report_every and time.time() - last_report >= report_every:
+            last_report = time.time()
+            print(f"[{last_report - start:.0f}s]")
+            print_stats(worker_stats(counters, num_workers))
+    for p in procs:
+        p.join()
+    failed = [w for w, p in enumerate(procs) if p.exitcode != 0]
+    if failed:
+        print(f"Workers {failed} failed")
+
+    stats = worker_stats(counters, num_workers)
+    print(f"Done in {time.time() - start:.1f}s")
+    print_stats(stats)
+    print(f"Dataset: {dataset_stats(data_dir)}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel NLHE self-play data generation')
+    parser.add_argument('--data-dir', type=str, required=True)
+    parser.add_argument('--hands', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=None, help='Default: one per core')
+    parser.add_argument('--model-path', type=str, default="rebel_nlhe.pt")
+    parser.add_argument('--cfr-iterations', type=int, default=25)
+    parser.add_argument('--time-budget', type=float, default=None, help='Search seconds per decision')
+    parser.add_argument('--explore', type=float, default=0.1)
+    parser.add_argument('--abstraction', action='store_true')
+    parser.add_argument('--chance-leaves', action='store_true')
+    parser.add_argument('--shard-size', type=int, default=4096)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--report-every', type=float, default=10.0, help='Seconds between throughput reports')
+    args = parser.parse_args()
+    generate_parallel(args.data_dir, args.hands, args.workers, args.model_path, args.cfr_iterations,
+                      args.time_budget, args.explore, args.abstraction, args.chance_leaves, args.shard_size,
+                      args.seed, args.report_every)
+
+
+if __name__ == '__main__':
+    main()
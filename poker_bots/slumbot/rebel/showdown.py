@@ -0,0 +1,196 @@
+from functools import lru_cache
+
+import numpy as np
+
+from .evaluator import LUTEvaluator, WORST_RANK
+from .hands import HAND_CARDS, CARD_MASK, NUM_HANDS, NUM_CARDS, blocked_mask
+
+# Range-vs-range terminal values for NLHE on a full 5-card board.
+#
+# Naively every (my hand, opp hand) pair is compared: 1326 x 1326 evaluations. Instead every
+# combo is ranked once, sorted by strength, and for each hand the opponent mass that is
+# strictly weaker / stronger is read off cumulative sums. Card removal (the opponent can't
+# hold my cards) is fixed up with one cumulative sum per card: the mass of weaker hands
+# containing card c. O(n log n) for the sort plus O(52 n) for the per-card sums.
+#
+# All values are counterfactual (not normalized by the opponent's total reach), float32,
+# indexed like hands.HANDS, so they drop straight into a CFR solver.
+
+_evaluator = LUTEvaluator()
+
+
+def compute_strengths(board):
+    """
+    (1326,) int32 strength of every combo on a 5-card board (treys ints), higher is better
+    (7463 - treys rank). Combos that use a board card get -1.
+    """
+    live = np.flatnonzero(~blocked_mask(board))
+    s = np.full(NUM_HANDS, -1, dtype=np.int32)
+    # One batched lookup for every live combo; flip treys' order so higher is better
+    s[live] = WORST_RANK + 1 - _evaluator.evaluate_hands(board, HAND_CARDS[live]).astype(np.int32)
+    return s
+
+
+@lru_cache(maxsize=256)
+def _strengths(board_key):
+    s = compute_strengths(list(board_key))
+    s.setflags(write=False)
+    return s
+
+
+def hand_strengths(board):
+    """
+    compute_strengths, cached per board (read-only result). Use compute_strengths directly
+    for one-off boards (rollouts) so they don't push the real ones out of the cache.
+    """
+    return _strengths(tuple(sorted(board)))
+
+
+def _card_cumsums(sorted_r, order):
+    # (n + 1, 52): prefix sums, over hands in strength order, of the mass holding each card
+    per_card = CARD_MASK[order] * sorted_r[:, None]
+    out = np.zeros((NUM_HANDS + 1, NUM_CARDS), dtype=np.float64)
+    np.cumsum(per_card, axis=0, out=out[1:])
+    return out
+
+
+def showdown_values(strengths, r_opp, stake=1.0):
+    """
+    Counterfactual showdown value of every hand against the opponent range r_opp (1326,):
+        v[h] = stake * (live opp mass weaker than h - live opp mass stronger than h)
+    where "live" excludes opponent hands sharing a card with h. Ties are worth 0.
+    stake: chips each player has in the pot (what the winner takes from the loser).
+    Hands blocked by the board (strength -1) get 0.
+    """
+    r = np.asarray(r_opp, dtype=np.float64) * (strengths >= 0)
+    order = np.argsort(strengths, kind='stable')
+    s_sorted = strengths[order]
+    r_sorted = r[order]
+
+    total = np.zeros(NUM_HANDS + 1)
+    np.cumsum(r_sorted, out=total[1:])
+    cards = _card_cumsums(r_sorted, order)
+
+    # [lo, hi) is the block of hands tying with h in sorted order
+    lo = np.searchsorted(s_sorted, strengths, side='left')
+    hi = np.searchsorted(s_sorted, strengths, side='right')
+    c0, c1 = HAND_CARDS[:, 0], HAND_CARDS[:, 1]
+
+    # A hand containing both of my cards is my own combo, which always ties with me,
+    # so subtracting the two card sums never double counts.
+    weaker = total[lo] - cards[lo, c0] - cards[lo, c1]
+    stronger = (total[-1] - total[hi]) - (cards[-1, c0] - cards[hi, c0]) - (cards[-1, c1] - cards[hi, c1])
+
+    v = stake * (weaker - stronger)
+    v[strengths < 0] = 0.0
+    return v.astype(np.float32)
+
+
+def live_mass(r_opp, board=()):
+    """
+    (1326,) opponent mass that doesn't share a card with each of my hands (or the board).
+    """
+    r = np.asarray(r_opp, dtype=np.float64)
+    if len(board) > 0:
+        r = r * ~blocked_mask(board)
+    per_card = CARD_MASK.T.astype(np.float64) @ r # (52,) mass holding each card
+    # My own combo holds both of my cards, so it was subtracted twice
+    live = r.sum() - per_card[HAND_CARDS[:, 0]] - per_card[HAND_CARDS[:, 1]] + r
+    if len(board) > 0:
+        live[blocked_mask(board)] = 0.0
+    return live
+
+
+def fold_values(r_opp, payoff, board=()):
+    """
+    Counterfactual value of every hand when the hand ends in a fold:
+    payoff (chips won, negative if I folded) times the live opponent mass.
+    """
+    return (payoff * live_mass(r_opp, board)).astype(np.float32)
+
+
+# CARD_HANDS[c] = the 51 hands holding card c
+CARD_HANDS = np.nonzero(CARD_MASK.T)[1].reshape(NUM_CARDS, NUM_CARDS - 1)
+
+
+class BoardShowdown:
+    """
+    showdown_values for many opponent ranges on one board, with everything that only
+    depends on the board precomputed: the strength order, tie blocks, and for every card
+    the 51 hands holding it in strength order. Card removal then needs prefix sums over
+    just those 51 hands per card instead of over all 1326.
+    Used by the CFR solver, which evaluates every showdown node each iteration.
+    """
+    def __init__(self, strengths):
+        self.strengths = strengths
+        self.order = np.argsort(strengths, kind='stable')
+        s_sorted = strengths[self.order]
+        self.lo = np.searchsorted(s_sorted, strengths, side='left')
+        self.hi = np.searchsorted(s_sorted, strengths, side='right')
+        self.blocked = strengths < 0
+
+        # Per card: its hands sorted by strength, and for each hand h and each of h's two
+        # cards, how many of that card's hands are strictly weaker / not stronger than h
+        s_card = strengths[CARD_HANDS]
+        card_order = np.argsort(s_card, axis=1, kind='stable')
+        self.card_hands = np.take_along_axis(CARD_HANDS, card_order, axis=1) # (52, 51)
+        s_card = np.take_along_axis(s_card, card_order, axis=1)
+        self.card_lo = np.empty((NUM_HANDS, 2), dtype=np.int64)
+        self.card_hi = np.empty((NUM_HANDS, 2), dtype=np.int64)
+        for j in (0, 1):
+            c = HAND_CARDS[:, j]
+            for card in range(NUM_CARDS):
+                mine = c == card
+                self.card_lo[mine, j] = np.searchsorted(s_card[card], strengths[mine], side='left')
+                self.card_hi[mine, j] = np.searchsorted(s_card[card], strengths[mine], side='right')
+
+    def values(self, R, stakes):
+        """
+        R (T, 1326) opponent ranges, stakes (T,) -> (T, 1326) float64 counterfactual values.
+        """
+        R = np.asarray(R, dtype=np.float64) * ~self.blocked
+        T = len(R)
+        total = np.zeros((T, NUM_HANDS + 1))
+        np.cumsum(R[:, self.order], axis=1, out=total[:, 1:])
+        cards = np.zeros((T, NUM_CARDS, NUM_CARDS)) # (T, card, 0..51 prefix)
+        np.cumsum(R[:, self.card_hands], axis=2, out=cards[:, :, 1:])
+
+        weaker = total[:, self.lo]
+        stronger = total[:, -1:] - total[:, self.hi]
+        for j in (0, 1):
+            c = HAND_CARDS[:, j]
+            weaker = weaker - cards[:, c, self.card_lo[:, j]]
+            stronger = stronger - (cards[:, c, -1] - cards[:, c, self.card_hi[:, j]])
+        v = np.asarray(stakes, dtype=np.float64)[:, None] * (weaker - stronger)
+        v[:, self.blocked] = 0.0
+        return v
+
+
+def showdown_values_batch(strengths, R, stakes):
+    """
+    showdown_values for T opponent ranges on the same board at once:
+    R (T, 1326), stakes (T,) -> (T, 1326) float64.
+    """
+    return BoardShowdown(strengths).values(R, stakes)
+
+
+def live_mass_batch(R, board=()):
+    """
+    live_mass for T ranges at once: R (T, 1326) -> (T, 1326) float64.
+    """
+    R = np.asarray(R, dtype=np.float64)
+    blocked = blocked_mask(board)
+    R = R * ~blocked
+    per_card = R @ CARD_MASK.astype(np.float64) # (T, 52)
+    live = R.sum(axis=1, keepdims=True) - per_card[:, HAND_CARDS[:, 0]] - per_card[:, HAND_CARDS[:, 1]] + R
+    live[:, blocked] = 0.0
+    return live
+
+
+def range_vs_range(board, r0, r1, stake):
+    """
+    Showdown values for both players: {0: (1326,), 1: (1326,)}, same layout as
+    NLHESearch.solve_subgame's values.
+    """
+    s = hand_strengths(board)
+    return {0: showdown_values(s, r1, stake), 1: showdown_values(s, r0, stake)}
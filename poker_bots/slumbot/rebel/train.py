@@ -1,19 +1,28 @@
+import argparse
 import torch
 import numpy as np
 import random
 import os
+import time
 from .game import NLHERules, GameConstants
 from .models import NLHEValueNetwork
 from .search import NLHESearch
 from .features import get_nlhe_features
+from .hands import DECK, blocked_mask
+from .dataset import ShardWriter, make_loader, dataset_stats
 
 class ReplayBuffer:
+    # Ring buffer: once full, each push overwrites the oldest sample in O(1)
     def __init__(self, capacity=1000):
+        self.capacity = capacity
         self.data = []
+        self.pos = 0
     def push(self, features, targets):
-        self.data.append((features, targets))
-        if len(self.data) > 1000:
-            self.data.pop(0)
+        if len(self.data) < self.capacity:
+            self.data.append((features, targets))
+        else:
+            self.data[self.pos] = (features, targets)
+        self.pos = (self.pos + 1) % self.capacity
     def sample(self, batch_size):
         batch = random.sample(self.data, min(len(self.data), batch_size))
         feats, targs = zip(*batch)
@@ -21,70 +30,182 @@ class ReplayBuffer:
     def __len__(self):
         return len(self.data)
 
-def train(epochs=5, steps_per_epoch=10):
+def make_model(abstraction=None, model_path=None, device='cpu'):
+    num_hands = abstraction.num_buckets if abstraction is not None else 1326
+    model = NLHEValueNetwork(num_hands=num_hands).to(device)
+    # Check if model exists
+    if model_path is not None and os.path.exists(model_path):
+        print("Loading existing model...")
+        model.load_state_dict(torch.load(model_path, map_location=device))
+    return model
+
+def self_play_sample(search, abstraction=None):
+    """
+    One training sample from a random public state: (features, target) tensors on the CPU,
+    target = concatenated per-hand values of both players from the search.
+    """
+    # Random street and board
+    board = random.sample(DECK, random.choice([0, 3, 4, 5]))
+
+    # Init random beliefs (no mass on combos the board blocks)
+    live = ~blocked_mask(board)
+    r0 = np.random.dirichlet(np.ones(1326), size=1)[0] * live
+    r1 = np.random.dirichlet(np.ones(1326), size=1)[0] * live
+    r0, r1 = r0 / r0.sum(), r1 / r1.sum()
+
+    # Random short history (actions 0-3)
+    hist_len = random.randint(0, 6)
+    history = [random.randint(0, 3) for _ in range(hist_len)]
+    pot = float(random.randint(150, 2000))
+    stacks = [20000.0 - pot/2, 20000.0 - pot/2]
+
+    # Run Search (values stay per bucket when using an abstraction)
+    strat, values = search.solve_subgame(r0, r1, board, pot, stacks, history, lift=False)
+
+    # Prepare Training Data
+    if abstraction is not None:
+        r0 = abstraction.project(r0, board)
+        r1 = abstraction.project(r1, board)
+    ft = get_nlhe_features(r0, r1, board, pot, stacks, history)
+
+    # Target: Concatenate P0 and P1 values
+    # values[0] is (num_hands,), values[1] is (num_hands,)
+    target = np.concatenate([values[0], values[1]])
+    return ft, torch.tensor(target, dtype=torch.float32)
+
+def train_step(model, optimizer, feats, targs):
+    preds = model(feats)
+    loss = torch.mean((preds - targs) ** 2)
+
+    optimizer.zero_grad()
+    loss.backward()
+    optimizer.step()
+    return loss.item()
+
+def train(epochs=5, steps_per_epoch=10, abstraction=None, model_path="rebel_nlhe.pt", cfr_iterations=25,
+          chance_leaves=False, data_dir=None, buffer_size=1000):
+    """
+    abstraction: optional CardAbstraction; the net then trains on bucket-space ranges and
+    values (pass a different model_path, the shapes don't match the per-combo model).
+    cfr_iterations: CFR iterations per training subgame (0 = 1-ply softmax targets).
+    chance_leaves: value street-end leaves on every next board (chance.py) instead of the
+    current one. Slower, but the targets then don't rely on the net being street-aware.
+    data_dir: also write every sample to shards there (dataset.py), so they outlive the
+    in-memory ReplayBuffer and can be trained on later with train_from_shards.
+    """
     device = 'cuda' if torch.cuda.is_available() else 'cpu'
     print(f"Training on {device}")
-    
-    model = NLHEValueNetwork().to(device)
+
+    model = make_model(abstraction, model_path, device)
     optimizer = torch.optim.Adam(model.parameters(), lr=1e-4)
-    buffer = ReplayBuffer()
-    search = NLHESearch(model, device=device)
-    
-    # Check if model exists
-    if os.path.exists("rebel_nlhe.pt"):
-        print("Loading existing model...")
-        model.load_state_dict(torch.load("rebel_nlhe.pt", map_location=device))
-    
+    buffer = ReplayBuffer(buffer_size)
+    search = NLHESearch(model, device=device, abstraction=abstraction, cfr_iterations=cfr_iterations,
+                        chance_leaves=chance_leaves)
+    writer = ShardWriter(data_dir) if data_dir is not None else None
+
     model.train()
-    
+
     for epoch in range(epochs):
         print(f"Epoch {epoch+1}/{epochs}")
-        
+
         # 1. Self Play Data Gen
         # Generate random states
         for _ in range(steps_per_epoch):
-            # Init random beliefs
-            r0 = np.random.dirichlet(np.ones(1326), size=1)[0]
-            r1 = np.random.dirichlet(np.ones(1326), size=1)[0]
-            
-            board = [] # Empty board for now
-            # Random short history (actions 0-3)
-            hist_len = random.randint(0, 6)
-            history = [random.randint(0, 3) for _ in range(hist_len)]
-            pot = float(random.randint(150, 2000))
-            stacks = [20000.0 - pot/2, 20000.0 - pot/2]
-            
-            # Run Search
-            strat, values = search.solve_subgame(r0, r1, board, pot, stacks, history)
-            
-            # Prepare Training Data
-            ft = get_nlhe_features(r0, r1, board, pot, stacks, history).to(device)
-            
-            # Target: Concatenate P0 and P1 values
-            # values[0] is (1326,), values[1] is (1326,)
-            target = np.concatenate([values[0], values[1]])
-            target_t = torch.tensor(target, dtype=torch.float32).to(device)
-            
-            buffer.push(ft, target_t)
-            
+            ft, target_t = self_play_sample(search, abstraction)
+            if writer is not None:
+                writer.add(ft, target_t)
+            buffer.push(ft.to(device), target_t.to(device))
+
         # 2. Train
         if len(buffer) > 10:
             for _ in range(5): # Gradient steps
                 feats, targs = buffer.sample(32)
-                feats = feats.to(device)
-                targs = targs.to(device)
-                
-                preds = model(feats)
-                loss = torch.mean((preds - targs) ** 2)
-                
-                optimizer.zero_grad()
-                loss.backward()
-                optimizer.step()
-            
-            print(f"Loss: {loss.item():.4f}")
-        
-    torch.save(model.state_dict(), "rebel_nlhe.pt")
-    print("Model saved to rebel_nlhe.pt")
+                loss = train_step(model, optimizer, feats.to(device), targs.to(device))
+
+            print(f"Loss: {loss:.4f}")
+
+    if writer is not None:
+        writer.close()
+        print(f"Wrote {writer.samples_written} samples to {data_dir}")
+    torch.save(model.state_dict(), model_path)
+    print(f"Model saved to {model_path}")
+
+def generate(data_dir, num_samples, abstraction=None, model_path="rebel_nlhe.pt", cfr_iterations=25,
+             chance_leaves=False, shard_size=4096):
+    """
+    Self-play only: writes num_samples samples to shards in data_dir, using the current
+    model_path for the search. Run it next to train_from_shards (separate processes).
+    """
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    model = make_model(abstraction, model_path, device)
+    model.eval()
+    search = NLHESearch(model, device=device, abstraction=abstraction, cfr_iterations=cfr_iterations,
+                        chance_leaves=chance_leaves)
+    start = time.time()
+    with ShardWriter(data_dir, shard_size) as writer:
+        for i in range(num_samples):
+            writer.add(*self_play_sample(search, abstraction))
+            if (i + 1) % 100 == 0:
+                print(f"{i + 1}/{num_samples} samples ({(i + 1) / (time.time() - start):.1f}/s)")
+    print(f"Wrote {num_samples} samples ({writer.shards_written} shards) to {data_dir}")
+
+def train_from_shards(data_dir, steps=1000, batch_size=32, abstraction=None, model_path="rebel_nlhe.pt",
+                      num_workers=2, save_every=500, lr=1e-4):
+    """
+    Trains on the shards in data_dir with a streaming, shuffling loader, picking up shards
+    a running generate() adds. Saves to model_path every save_every steps.
+    """
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    print(f"Training on {device} from {data_dir} {dataset_stats(data_dir)}")
+    model = make_model(abstraction, model_path, device)
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    model.train()
+
+    loader = make_loader(data_dir, batch_size=batch_size, num_workers=num_workers)
+    losses = []
+    for step, (feats, targs) in enumerate(loader, start=1):
+        losses.append(train_step(model, optimizer, feats.to(device, non_blocking=True),
+                                 targs.to(device, non_blocking=True)))
+        if step % 100 == 0:
+            print(f"Step {step}/{steps}: loss {np.mean(losses[-100:]):.4f}")
+        if step % save_every == 0 or step == steps:
+            torch.save(model.state_dict(), model_path)
+        if step == steps:
+            break
+    print(f"Model saved to {model_path}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the NLHE value net')
+    parser.add_argument('--data-dir', type=str, default=None,
+                        help='Shard directory: with --generate write to it, otherwise train from it')
+    parser.add_argument('--generate', type=int, default=0, metavar='N', help='Only generate N self-play samples')
+    parser.add_argument('--steps', type=int, default=1000, help='Gradient steps when training from shards')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=2, help='Loader processes when training from shards')
+    parser.add_argument('--shard-size', type=int, default=4096)
+    parser.add_argument('--cfr-iterations', type=int, default=25)
+    parser.add_argument('--chance-leaves', action='store_true')
+    parser.add_argument('--abstraction', action='store_true', help='Work in card-abstraction bucket space')
+    parser.add_argument('--model-path', type=str, default="rebel_nlhe.pt",
+                        help='Use a separate one with --abstraction, the shapes differ')
+    args = parser.parse_args()
+
+    abstraction = None
+    if args.abstraction:
+        from .abstraction import CardAbstraction
+        abstraction = CardAbstraction()
+    model_path = args.model_path
+
+    if args.generate:
+        if args.data_dir is None:
+            parser.error('--generate needs --data-dir')
+        generate(args.data_dir, args.generate, abstraction, model_path, args.cfr_iterations,
+                 args.chance_leaves, args.shard_size)
+    elif args.data_dir is not None:
+        train_from_shards(args.data_dir, args.steps, args.batch_size, abstraction, model_path, args.workers)
+    else:
+        train(abstraction=abstraction, model_path=model_path, cfr_iterations=args.cfr_iterations,
+              chance_leaves=args.chance_leaves)
 
 if __name__ == "__main__":
-    train()
+    main()
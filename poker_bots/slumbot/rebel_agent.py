@@ -1,18 +1,64 @@
+import os
 import random
+import time
+from collections import deque
 import torch
 import numpy as np
 from treys import Card
-from .client import SlumbotClient
+from .client import SlumbotClient, latency_summary
+from .action_parser import ActionParser
 from .agent import Agent
 from .rebel.models import NLHEValueNetwork
 from .rebel.search import NLHESearch
-from .rebel.game import NLHERules
+from .rebel.game import NLHERules, NLHEState, DEFAULT_BET_ABSTRACTION, GameConstants, BOARD_CARDS
+from .rebel.beliefs import BeliefTracker
+from .rebel.blueprint import PreflopBlueprint, BLUEPRINT_PATH
+from .rebel.cache import model_fingerprint, settings_fingerprint
+from .rebel.hands import hand_index
+from .rebel.preflop_tables import preflop_strength
+
+# Preflop strength below which the agent never shoves (guardrail in _get_action)
+ALLIN_MIN_STRENGTH = 0.7
+# Share of time_budget the opponent-model solves may use before the main search
+OPPONENT_BUDGET_SHARE = 0.25
 
 
 class ReBeLAgent(Agent):
-    def __init__(self, model_path="rebel_nlhe.pt"):
+    def __init__(self, model_path="rebel_nlhe.pt", abstraction=None, bet_abstraction=None, cfr_iterations=50,
+                 time_budget=None, verbose=False, cache=None, blueprint=True, opponent_model='search',
+                 opponent_iterations=10):
+        """
+        abstraction: optional rebel.abstraction.CardAbstraction; search and value net then
+        run on buckets (the model at model_path must be trained with the same abstraction).
+        bet_abstraction: rebel.game.BetAbstraction, default fold / call / pot / all-in.
+        cfr_iterations: CFR iterations per decision (0 = the old 1-ply softmax search).
+        time_budget: wall-clock seconds per decision. The search is anytime: it stops when
+        the next iteration wouldn't fit and acts on the average strategy so far, so
+        cfr_iterations becomes only a cap (set it high to always use the whole budget).
+        verbose: print iterations and latency of every decision.
+        cache: optional rebel.cache.SubgameCache (can be shared between agents); public
+        states already solved are looked up instead of searched.
+        blueprint: preflop strategy table (rebel/blueprint.py). True loads the shipped one
+        if it was solved for this bet abstraction, False searches preflop too, or pass a
+        PreflopBlueprint. Histories the table doesn't have fall back to search.
+        opponent_model: how the opponent's range is updated after each of its actions.
+        'search': Bayes with the policy a small solve (opponent_iterations CFR iterations,
+        or the blueprint preflop) gives from its seat; 'heuristic': the old hand-strength
+        reweighting. The agent's own range is always updated with its own policy.
+        Every decision is logged in decision_log, see decision_summary().
+        """
+        self.time_budget = time_budget
+        self.verbose = verbose
+        self.cache = cache
+        self._source = 'search' # where the last decision's strategy came from
+        self.decision_log = deque(maxlen=100000) # (street, iterations, latency seconds)
+        self.bet_abstraction = bet_abstraction or DEFAULT_BET_ABSTRACTION
+        if blueprint is True:
+            blueprint = PreflopBlueprint() if os.path.exists(BLUEPRINT_PATH) else None
+        self.blueprint = blueprint if blueprint and blueprint.matches(self.bet_abstraction) else None
         self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        self.model = NLHEValueNetwork().to(self.device)
+        num_hands = abstraction.num_buckets if abstraction is not None else 1326
+        self.model = NLHEValueNetwork(num_hands=num_hands).to(self.device)
 
         try:
             self.model.load_state_dict(torch.load(
@@ -22,88 +68,143 @@ class ReBeLAgent(Agent):
             print("Could not load model, using random initialization")
 
         self.model.eval()
-        self.search = NLHESearch(self.model, device=self.device)
+        self.search = NLHESearch(self.model, device=self.device, abstraction=abstraction,
+                                 cfr_iterations=cfr_iterations)
+        # Cache entries are only valid for the settings they were solved with
+        self.cache_settings = settings_fingerprint(
+            fractions=tuple(self.bet_abstraction.fractions), model=model_fingerprint(self.model),
+            cfr_iterations=cfr_iterations, time_budget=time_budget,
+            buckets=abstraction.num_buckets if abstraction is not None else None)
+        self.opponent_model = opponent_model
+        # Separate solver for modeling the opponent, so it never touches the main one's stats
+        self.opponent_search = NLHESearch(self.model, device=self.device, abstraction=abstraction,
+                                          cfr_iterations=opponent_iterations)
+        self._opponent_solve_time = 0.0 # seconds of the last opponent-model solve
         self.reset_hand()
 
     def reset_hand(self):
-        self.r0 = np.ones(1326) / 1326.0
-        self.r1 = np.ones(1326) / 1326.0
-        self._all_hands = NLHERules.get_all_hands()
-        self._hand_strength = np.array(
-            [self._hand_strength_bucket(h) for h in self._all_hands])
+        # Per-hand action parser: only the new suffix of the action string is parsed each decision
+        self.parser = ActionParser()
+        self._num_seen_actions = 0
+        # Public beliefs of both positions for the whole hand (rebel/beliefs.py), and the
+        # public state replayed one action at a time to know each action's decision point
+        self.beliefs = BeliefTracker(floor=1e-3)
+        self._replay = NLHEState(self.bet_abstraction)
+        self._own_policy = None # public policy of our last decision, applied when our action shows up
+        # Ranges of (me, opponent) for the current decision, float32 like the value net
+        self.r0 = self.beliefs.range(0)
+        self.r1 = self.beliefs.range(1)
+        self._all_hands = NLHERules.get_all_hands() # shared, not rebuilt
+        # Precomputed once (rebel/data/preflop_strength.npy), read-only
+        self._hand_strength = preflop_strength()
 
-    def _hand_strength_bucket(self, hand):
-        """
-        Very rough preflop bucket based only on ranks.
-        Returns float in [0, 1]; higher = stronger.
+    def _update_opponent_belief(self, action):
         """
-        r1 = Card.get_rank_int(hand[0])  # 0..12 (2..A)
-        r2 = Card.get_rank_int(hand[1])
-        suited = Card.get_suit_int(hand[0]) == Card.get_suit_int(hand[1])
-        ranks = sorted([r1, r2], reverse=True)
-        high, low = ranks
-        # Pair
-        if r1 == r2:
-            return 0.8 + high / 20.0
-        # Broadways
-        if high >= 10 and low >= 8:
-            return 0.65 + (high + low) / 30.0 + (0.05 if suited else 0)
-        # Suited connectors
-        if suited and high - low == 1 and high >= 7:
-            return 0.55
-        # Suited ace
-        if suited and high == 12:
-            return 0.5
-        # Default
-        return 0.3 + (high / 30.0)
-
-    def _history_from_action_str(self, action_str):
-        mapping = {'f': 0, 'c': 1, 'k': 1, 'b': 2}
-        hist = []
-        for ch in action_str:
-            if ch in mapping:
-                hist.append(mapping[ch])
-        return hist
-
-    def _update_opponent_belief(self, action_str):
+        Very rough belief shift based on one opponent action (pos, street, char, bet-to).
+        Fallback when there is no modeled policy (opponent_model='heuristic').
         """
-        Very rough belief shift based on opponent's last action.
-        """
-        if not action_str:
-            return
-        last = ''
-        num_buf = ''
-        for ch in action_str[::-1]:
-            if ch == '/':
-                if last:
-                    break
-                continue
-            if ch.isdigit() and not last:
-                num_buf = ch + num_buf
-                continue
-            if ch in ['b', 'c', 'k', 'f']:
-                last = ch
-                break
-        bet_size = 0
-        if last == 'b' and num_buf:
-            try:
-                bet_size = int(num_buf)
-            except:
-                bet_size = 0
+        pos, _, last, bet_to = action
+        bet_size = bet_to or 0
         if last == 'b' and bet_size > 0:
             scale = min(1.0, bet_size / 5000.0)
-            w = 0.5 + scale * 0.5
-            weights = 0.5 * (1.0 - w) + w * self._hand_strength
-        elif last in ['c', 'k']:
-            weights = np.ones_like(self.r1)
+            w = np.float32(0.5 + scale * 0.5)
+            weights = np.float32(0.5) * (1 - w) + w * self._hand_strength
         else:
-            weights = np.ones_like(self.r1)
-        self.r1 = self.r1 * weights
-        s = self.r1.sum()
-        if s > 1e-9:
-            self.r1 /= s
+            weights = np.ones(1326, dtype=np.float32)
+        self.beliefs.update(pos, weights)
+
+    def _opponent_policy(self, state, board, deadline=None):
+        """
+        Modeled policy {action: (1326,)} of the player to act in state (the opponent), or
+        None to fall back to the heuristic. deadline: perf_counter() time the solve has to
+        fit in (anytime, like the main search); when the last solve's time doesn't fit
+        anymore it isn't started at all.
+        """
+        if self.blueprint is not None and state.street == GameConstants.STREET_PREFLOP:
+            policy = self.blueprint.strategy(state.history, state.legal_actions())
+            if policy is not None:
+                return policy
+        if self.opponent_model != 'search':
+            return None
+        start = time.perf_counter()
+        if deadline is not None and start + self._opponent_solve_time > deadline:
+            return None
+        opp = state.to_act
+        r_opp, r_me = self.beliefs.ranges(opp)
+        stacks = state.stacks
+        policy, _ = self.opponent_search.solve_subgame(
+            r_opp, r_me, board, float(state.pot), [float(stacks[opp]), float(stacks[1 - opp])], state.history,
+            state=state, deadline=deadline, compute_values=False
+        )
+        self._opponent_solve_time = time.perf_counter() - start
+        return policy
+
+    def _track_beliefs(self, actions, me, board_ints, deadline=None):
+        """
+        Bayes updates for the actions (pos, street, char, bet-to) since our last decision:
+        ours with the policy we acted on, the opponent's with its modeled policy at the
+        point it acted. Board cards are removed as their street is reached.
+        deadline: for the opponent-model solves; past it they fall back to the heuristic.
+        """
+        for action in actions:
+            pos, _, c, bet_to = action
+            state = self._replay
+            board = board_ints[:BOARD_CARDS[state.street]]
+            self.beliefs.observe_board(board)
+            if pos == me:
+                state.apply_exact(c, bet_to)
+                a = state.history[-1]
+                if self._own_policy is not None and a in self._own_policy:
+                    self.beliefs.update(me, self._own_policy[a])
+                self._own_policy = None
+                continue
+            policy = self._opponent_policy(state, board, deadline)
+            state.apply_exact(c, bet_to)
+            a = state.history[-1] # the abstract action it maps to
+            if policy is not None and a in policy:
+                self.beliefs.update(pos, policy[a])
+            else:
+                self._update_opponent_belief(action)
+
+    def _public_policy(self, strategy, facing_bet):
+        """
+        The policy an observer sees from us: the strategy with the guardrails below
+        applied hand by hand (weak hands' all-ins downgraded, folds without a bet played as
+        checks). Used for our own Bayes update.
+        """
+        policy = {a: np.array(v, dtype=np.float32) for a, v in strategy.items()}
+        allin = self.bet_abstraction.allin_action
+        if allin in policy:
+            weak = self._hand_strength < ALLIN_MIN_STRENGTH
+            raises = [a for a in policy if 2 <= a < allin]
+            to = 1 if facing_bet or not raises else raises[0]
+            if to in policy:
+                policy[to] = policy[to] + policy[allin] * weak
+                policy[allin] = policy[allin] * ~weak
+        if not facing_bet and 0 in policy and 1 in policy:
+            policy[1] = policy[1] + policy[0]
+            policy[0] = np.zeros_like(policy[0])
+        return policy
+
+    def decision_summary(self):
+        """
+        Latency (ms) and CFR iterations over the logged decisions.
+        """
+        return summarize_decisions(self.decision_log)
 
     def get_action(self, state_dict, hole_cards, board):
+        start = time.perf_counter()
+        action = self._get_action(state_dict, hole_cards, board, start)
+        latency = time.perf_counter() - start
+        searched = self.search.cfr_iterations > 0 and self._source == 'search'
+        iterations = self.search.solver.iterations_run if searched else 0
+        self.decision_log.append((state_dict.get('st', 0), iterations, latency))
+        if self.verbose:
+            source = f"after {iterations} iterations" if self._source == 'search' else f"from {self._source}"
+            print(f"[rebel] street {state_dict.get('st', 0)}: {action} {source} in {latency * 1000.0:.1f} ms")
+        return action
+
+    def _get_action(self, state_dict, hole_cards, board, start):
         # hole_cards: ['Ac', '9d']
         c1 = Card.new(hole_cards[0])
         c2 = Card.new(hole_cards[1])
@@ -111,57 +212,80 @@ class ReBeLAgent(Agent):
 
         board_ints = [Card.new(c) for c in board]
 
-        # Estimate Pot more conservatively:
-        # Pot ~ last street total * 2 (assume symmetrical) plus blinds (150).
-        total_last = state_dict['total_last_bet_to']
-        pot = max(150.0, float(total_last * 2))
-        # Remaining stacks (very rough): starting stack - total_last
-        stacks = [max(0.0, 20000.0 - total_last),
-                  max(0.0, 20000.0 - total_last)]
-        # Build crude history from action string
-        action_str = state_dict.get('action_full', '') if isinstance(
-            state_dict, dict) else ''
-        history = self._history_from_action_str(action_str)
-        # Update opponent belief based on last observed action
-        self._update_opponent_belief(action_str)
-
-        # Update Beliefs?
-        # For prototype, we reset beliefs every move (Stateless ReBeL - treating every move as new subgame root)
-        # To do better, we should carry over r0/r1 and update based on opponent action.
+        # Exact pot / stacks / history from the per-hand parser. The caller's parser is
+        # shared when it passes one in the state (eval.py, main.py), otherwise ours catches up.
+        parser = state_dict.get('parser') or self.parser
+        parser.update(state_dict.get('action_full', ''))
+        me = state_dict['pos']
+        # Exact betting state (rebel/game.py): legal actions and bet sizes come from it
+        game_state = NLHEState.from_parser(parser, board_ints, self.bet_abstraction)
+        pot = float(game_state.pot)
+        stacks = [float(game_state.stacks[me]), float(game_state.stacks[1 - me])]
+        history = game_state.history
+
+        # Anytime search: the deadline covers the whole decision (opponent model included),
+        # not just the iterations, minus a little slack for picking the action and timer noise
+        deadline = opponent_deadline = None
+        if self.time_budget is not None:
+            deadline = start + self.time_budget - max(0.003, 0.02 * self.time_budget)
+            opponent_deadline = start + OPPONENT_BUDGET_SHARE * self.time_budget
+
+        # Beliefs carried through the hand: Bayes on every action since our last decision,
+        # card removal for the board (rebel/beliefs.py)
+        self._track_beliefs(parser.actions[self._num_seen_actions:], me, board_ints, opponent_deadline)
+        self._num_seen_actions = len(parser.actions)
+        self.beliefs.observe_board(board_ints)
+        self.r0, self.r1 = self.beliefs.ranges(me)
 
         # Run Search
-        strategy, values = self.search.solve_subgame(
-            self.r0, self.r1, board_ints, pot, stacks, history
-        )
+        strategy = None
+        self._source = 'search'
+        if self.blueprint is not None and game_state.street == GameConstants.STREET_PREFLOP:
+            # O(1) table lookup, no search preflop
+            strategy = self.blueprint.strategy(history, game_state.legal_actions())
+            self._source = 'blueprint' if strategy is not None else 'search'
+        if strategy is None and self.cache is not None:
+            strategy = self.cache.get(self.r0, self.r1, board_ints, pot, stacks, history, self.cache_settings)
+            self._source = 'cache' if strategy is not None else 'search'
+        if strategy is None:
+            strategy, _ = self.search.solve_subgame(
+                self.r0, self.r1, board_ints, pot, stacks, history, state=game_state,
+                deadline=deadline, compute_values=False
+            )
+            if self.cache is not None:
+                self.cache.put(self.r0, self.r1, board_ints, pot, stacks, history, strategy, self.cache_settings)
 
         action_idx = self.search.get_action_from_strategy(strategy, my_hand)
 
-        # 0: Fold, 1: Check/Call, 2: Pot, 3: AllIn
+        # 0: Fold, 1: Check/Call, 2..: pot-fraction raises, last: AllIn (BetAbstraction)
         # Hand-strength-aware guardrails
-        strength = self._hand_strength_bucket(my_hand)
-        facing_bet = state_dict['last_bet_size'] > 0
+        strength = self._hand_strength[hand_index(c1, c2)]
+        facing_bet = game_state.to_call > 0
+        policy = self._public_policy(strategy, facing_bet)
+        allin = self.bet_abstraction.allin_action
         # Avoid punting all-in with trash preflop
-        if action_idx == 3 and strength < 0.7:
-            action_idx = 1 if facing_bet else 2  # downgrade to call/check or small raise
+        if action_idx == allin and strength < ALLIN_MIN_STRENGTH:
+            # downgrade to call/check or the smallest raise
+            raises = [a for a in strategy if 2 <= a < allin]
+            action_idx = 1 if facing_bet or not raises else raises[0]
 
-        if action_idx == 0:
+        if action_idx == 0 and not facing_bet:
             # If we can check, prefer check over fold
-            if state_dict['last_bet_size'] == 0:
-                return 'k'
-            return 'f'
-        elif action_idx == 1:
-            if facing_bet:
-                return 'c'
-            return 'k'
-        elif action_idx == 2:
-            # Pot raise heuristic: raise to ~pot or 3x last bet, capped by stack
-            call_amt = state_dict['last_bet_size']
-            target = state_dict['street_last_bet_to'] + \
-                max(300, max(call_amt * 3, pot))
-            max_street = min(20000, target)
-            return f"b{int(max_street)}"
-        elif action_idx == 3:
-            # All-in capped at stack
-            return f"b{int(stacks[0])}"
-
-        return 'k'
+            action_idx = 1
+        self._own_policy = policy
+        # Exact Slumbot incr: 'f', 'k', 'c' or the bet-to of the abstract raise
+        return game_state.action_string(action_idx)
+
+
+def summarize_decisions(log):
+    """
+    log: iterable of (street, iterations, latency seconds), e.g. ReBeLAgent.decision_log
+    (or several agents' logs chained).
+    """
+    log = list(log)
+    summary = latency_summary([d[2] for d in log])
+    if log:
+        iters = [d[1] for d in log]
+        summary['mean_iterations'] = sum(iters) / len(iters)
+        summary['min_iterations'] = min(iters)
+    return summary